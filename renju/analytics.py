@@ -0,0 +1,298 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+import json
+from argparse import ArgumentParser
+from collections import Counter, deque
+from functools import partial
+from multiprocessing import Pool
+from pathlib import Path
+from typing import (Callable, Dict, Iterable, Iterator, NamedTuple, NoReturn,
+                    Optional, Tuple)
+
+from constants import WIDTH
+from game import (Renju, Snapshot, IllegalMove, PlayerType, EndReason,
+                  PASS_INDEX)
+from archive import Archive, is_archive, sheet_files
+from sheet import read_sheet
+
+# 序盤の手順として数える手数
+OPENING_PLIES = 3
+
+# 表示する序盤の手順の数
+TOP_OPENINGS = 10
+
+# 報告する手数のパーセンタイル
+PERCENTILES = (50, 90, 99)
+
+# 手数の分布をまとめる幅
+LENGTH_BIN = 10
+
+# ワーカー 1 つあたりに先読みしておく対局数。メモリはこの数で頭打ちになる
+WINDOW_PER_JOB = 64
+
+_COLORS = {PlayerType.FIRST: 'black', PlayerType.SECOND: 'white'}
+
+
+class GameRecord(NamedTuple):
+    """読み込んだ 1 局
+
+    Attributes:
+        source(str): スコアシートのファイル名。アーカイブなら 'ファイル名#k'
+        snapshot(Snapshot): 手順と結果
+        recorded(bool): snapshot の結果が記録されたもの（アーカイブか、終局の
+            行があるスコアシート）なら True。そうでなければ打ち直して決める
+    """
+
+    source: str
+    snapshot: Snapshot
+    recorded: bool
+
+
+class GameStats(NamedTuple):
+    """1 局を打ち直した結果
+
+    Attributes:
+        source(str): GameRecord.source
+        turns(int): 手数
+        winner(Optional[PlayerType]): 勝者。決着していなければ None
+        forbidden(bool): 禁手を打って負けたとき True
+        forfeit(bool): 盤上でなく記録上の結果（時間切れ・ソルバのエラーなど）で
+            決着したとき True。禁手負けは含まない
+        opening(Tuple[Tuple[int, int], ...]): 最初の OPENING_PLIES 手
+    """
+
+    source: str
+    turns: int
+    winner: Optional[PlayerType]
+    forbidden: bool
+    forfeit: bool
+    opening: Tuple[Tuple[int, int], ...]
+
+
+def records(paths: Iterable[str]) -> Iterator[GameRecord]:
+    """スコアシート・ディレクトリ・アーカイブから 1 局ずつ読む
+
+    アーカイブは mmap で 1 局ずつ切り出し、スコアシートは 1 ファイルずつ読む
+    ので、一度にメモリに載るのは 1 局ぶんだけ。
+    """
+
+    for path in paths:
+        if Path(path).is_file() and is_archive(path):
+            with Archive(path) as archive:
+                for k, snapshot in enumerate(archive):
+                    yield GameRecord(f'{path}#{k}', snapshot, True)
+            continue
+
+        for file in sheet_files([path]):
+            points, result = read_sheet(file)
+            moves = bytes(PASS_INDEX if x is None else x * WIDTH + y
+                          for x, y in points)
+            if result is None:
+                snapshot = Snapshot(moves=moves, finished=False, winner=None)
+            else:
+                snapshot = Snapshot(moves=moves, finished=True,
+                                    winner=result[0], reason=result[1])
+            yield GameRecord(str(file), snapshot, result is not None)
+
+
+def replay(record: GameRecord, opening_plies: int = OPENING_PLIES
+           ) -> GameStats:
+    """1 局を Renju で打ち直して結果を決める"""
+
+    snapshot = record.snapshot
+    renju = Renju()
+    forbidden = False
+    for index in snapshot.moves:
+        try:
+            if index == PASS_INDEX:
+                renju.pass_turn()
+            else:
+                renju.add_move(index)
+        except IllegalMove:
+            forbidden = True
+            break
+
+    winner = renju.winner if renju.finished else None
+    forfeit = False
+    # ジャッジは禁手を打たれても手順に書かないので、記録された理由で数える
+    if not renju.finished and record.recorded and snapshot.finished:
+        winner = snapshot.winner
+        if snapshot.reason is EndReason.FORBIDDEN:
+            forbidden = True
+        elif snapshot.reason is not EndReason.DRAW:
+            forfeit = True
+
+    opening = tuple(move.point for move in renju.score_sheet[:opening_plies])
+    return GameStats(source=record.source, turns=renju.turn, winner=winner,
+                     forbidden=forbidden, forfeit=forfeit, opening=opening)
+
+
+def _bounded_imap(pool: Pool, func: Callable, items: Iterable,
+                  window: int) -> Iterator:
+    """pool.imap と同じだが、先に投げる仕事を window 個までに抑える
+
+    Pool.imap は入力をすべて先に読んでしまうので、巨大な入力では使えない。
+    """
+
+    pending = deque()
+    for item in items:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def replay_all(items: Iterable[GameRecord], *, jobs: int = 1,
+               opening_plies: int = OPENING_PLIES) -> Iterator[GameStats]:
+    """各対局を打ち直す。jobs が 2 以上ならワーカープロセスで打ち直す"""
+
+    func = partial(replay, opening_plies=opening_plies)
+    if jobs <= 1:
+        yield from map(func, items)
+        return
+
+    with Pool(processes=jobs) as pool:
+        yield from _bounded_imap(pool, func, items, jobs * WINDOW_PER_JOB)
+
+
+class Summary:
+    """GameStats を 1 局ずつ足し込む集計
+
+    持つのは件数と、手数・序盤の手順ごとの頻度だけ。手数は盤のマス数まで、
+    序盤の手順は OPENING_PLIES 手の組み合わせの数までしか増えない。
+    """
+
+    def __init__(self):
+        self.games = 0
+        self.wins = Counter()
+        self.forbidden = 0
+        self.forfeits = 0
+        self.lengths = Counter()
+        self.openings = Counter()
+
+    def add(self, stats: GameStats) -> NoReturn:
+        self.games += 1
+        self.wins[stats.winner] += 1
+        self.forbidden += stats.forbidden
+        self.forfeits += stats.forfeit
+        self.lengths[stats.turns] += 1
+        self.openings[stats.opening] += 1
+
+    def _rate(self, count: int) -> float:
+        return count / self.games if self.games else 0.0
+
+    def length_percentiles(self) -> Dict[str, int]:
+        """手数の分布から求めたパーセンタイル"""
+
+        res = {}
+        total = 0
+        turns = sorted(self.lengths)
+        targets = iter(PERCENTILES)
+        p = next(targets, None)
+        for turn in turns:
+            total += self.lengths[turn]
+            while p is not None and total > self.games * p // 100:
+                res[f'p{p}'] = turn
+                p = next(targets, None)
+        return res
+
+    def report(self, top: int = TOP_OPENINGS) -> dict:
+        """JSON にできる dict にまとめる"""
+
+        turns = sum(turn * count for turn, count in self.lengths.items())
+        bins = Counter()
+        for turn, count in self.lengths.items():
+            bins[turn // LENGTH_BIN * LENGTH_BIN] += count
+
+        return {
+            'games': self.games,
+            'win_rate': {
+                _COLORS[PlayerType.FIRST]: self._rate(
+                    self.wins[PlayerType.FIRST]),
+                _COLORS[PlayerType.SECOND]: self._rate(
+                    self.wins[PlayerType.SECOND]),
+                'undecided': self._rate(self.wins[None]),
+            },
+            'forbidden_loss_rate': self._rate(self.forbidden),
+            'forfeit_rate': self._rate(self.forfeits),
+            'length': {
+                'min': min(self.lengths, default=0),
+                'max': max(self.lengths, default=0),
+                'mean': turns / self.games if self.games else 0.0,
+                **self.length_percentiles(),
+                'histogram': {f'{start}-{start + LENGTH_BIN - 1}': bins[start]
+                              for start in sorted(bins)},
+            },
+            'openings': [
+                {'moves': [list(point) for point in opening],
+                 'games': count, 'rate': self._rate(count)}
+                for opening, count in self.openings.most_common(top)],
+        }
+
+
+def format_report(report: dict) -> str:
+    """report を表示用の文字列にする"""
+
+    length = report['length']
+    lines = [
+        f'games          : {report["games"]}',
+        f'black wins     : {report["win_rate"]["black"]:.1%}',
+        f'white wins     : {report["win_rate"]["white"]:.1%}',
+        f'undecided      : {report["win_rate"]["undecided"]:.1%}',
+        f'forbidden loss : {report["forbidden_loss_rate"]:.1%}',
+        f'forfeits       : {report["forfeit_rate"]:.1%}',
+        f'turns          : min={length["min"]} mean={length["mean"]:.1f} '
+        + ' '.join(f'p{p}={length[f"p{p}"]}' for p in PERCENTILES
+                   if f'p{p}' in length)
+        + f' max={length["max"]}',
+        'turns histogram:',
+    ]
+    lines.extend(f'  {span:>9} : {count}'
+                 for span, count in length['histogram'].items())
+    lines.append('openings       :')
+    lines.extend(
+        f'  {" ".join(f"{x}:{y}" for x, y in opening["moves"]):<20} '
+        f'{opening["games"]:>7} ({opening["rate"]:.1%})'
+        for opening in report['openings'])
+    return '\n'.join(lines)
+
+
+def analyze(paths: Iterable[str], *, jobs: int = 1,
+            opening_plies: int = OPENING_PLIES) -> Summary:
+    """paths の全対局を打ち直して集計する"""
+
+    summary = Summary()
+    for stats in replay_all(records(paths), jobs=jobs,
+                            opening_plies=opening_plies):
+        summary.add(stats)
+    return summary
+
+
+def main() -> NoReturn:
+    parser = ArgumentParser(description='スコアシート・対局アーカイブの集計')
+    parser.add_argument('paths', nargs='+',
+                        help='スコアシート、それを含むディレクトリ、またはアーカイブ')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='打ち直しに使うプロセス数（デフォルトは 1）')
+    parser.add_argument('--opening-plies', type=int, default=OPENING_PLIES,
+                        help='序盤の手順として数える手数')
+    parser.add_argument('--top', type=int, default=TOP_OPENINGS,
+                        help='表示する序盤の手順の数')
+    parser.add_argument('--json', action='store_true',
+                        help='結果を JSON で出力する')
+    args = parser.parse_args()
+
+    report = analyze(args.paths, jobs=args.jobs,
+                     opening_plies=args.opening_plies).report(args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+import mmap
+import struct
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Iterable, Iterator, List, NoReturn, Optional, Union
+
+from game import (Renju, Snapshot, EngineType, PASS_INDEX, create_renju)
+from sheet import read_csv, dump_csv
+
+# 対局アーカイブ
+#
+#   ヘッダ   magic(4) version(u16) 予約(u16) 対局数(u64) 索引の位置(u64)
+#   対局     Snapshot.to_bytes()。先頭 1 バイトに終局の理由・終局フラグ・
+#            勝者、続けて 1 手 1 バイトのマス番号
+#   索引     対局数 + 1 個の u64。k 局目は索引[k] から索引[k + 1] まで
+#
+# 数値はすべてリトルエンディアン。索引を末尾に置くので、対局は先頭から順に
+# 書き足すだけで書ける。
+
+MAGIC = b'RJAR'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sHHQQ')
+_OFFSET = struct.Struct('<Q')
+
+# 入力に渡せるスコアシート: ファイルか、*.txt を含むディレクトリ
+SHEET_PATTERN = '*.txt'
+
+
+def is_archive(file: str) -> bool:
+    """file が対局アーカイブなら True"""
+
+    with open(file, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class ArchiveWriter:
+    """対局アーカイブを書く
+
+    対局は append のたびに末尾へ書き、各対局の位置だけをメモリに持つ。
+    close で索引とヘッダを書いて完成させる。
+
+    Args:
+        file(str): 書き出すファイル
+    """
+
+    def __init__(self, file: str):
+        self._file = open(file, 'wb')
+        self._file.write(_HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+        self._offsets = []
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def append(self, game: Union[Renju, Snapshot]) -> NoReturn:
+        """局面（またはその Snapshot）を 1 局として書き足す"""
+
+        if isinstance(game, Renju):
+            game = game.snapshot()
+        self._offsets.append(self._file.tell())
+        self._file.write(game.to_bytes())
+
+    def close(self) -> NoReturn:
+        if self._file.closed:
+            return
+
+        index = self._file.tell()
+        self._offsets.append(index)
+        self._file.write(b''.join(_OFFSET.pack(offset)
+                                  for offset in self._offsets))
+        self._offsets.pop()
+
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, 0,
+                                      len(self._offsets), index))
+        self._file.close()
+
+    def __enter__(self) -> 'ArchiveWriter':
+        return self
+
+    def __exit__(self, *exc) -> NoReturn:
+        self.close()
+
+
+class Archive:
+    """対局アーカイブを mmap で読む
+
+    ヘッダと索引の 2 か所を引くだけで k 局目の位置がわかるので、他の対局を
+    読まずに任意の対局・局面を取り出せる。
+
+    Args:
+        file(str): 読むファイル
+    """
+
+    def __init__(self, file: str):
+        with open(file, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, count, index = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f'{file} is not a game archive')
+        if version != VERSION:
+            self._mmap.close()
+            raise ValueError(f'unsupported archive version: {version}')
+
+        self._count = count
+        self._index = index
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _span(self, k: int) -> slice:
+        if not 0 <= k < self._count:
+            raise IndexError(f'game {k} out of range')
+
+        start, = _OFFSET.unpack_from(self._mmap, self._index + 8 * k)
+        end, = _OFFSET.unpack_from(self._mmap, self._index + 8 * (k + 1))
+        return slice(start, end)
+
+    def __getitem__(self, k: int) -> Snapshot:
+        """k 局目の手順と結果"""
+
+        return Snapshot.from_bytes(self._mmap[self._span(k)])
+
+    def __iter__(self) -> Iterator[Snapshot]:
+        for k in range(self._count):
+            yield self[k]
+
+    def moves(self, k: int) -> bytes:
+        """k 局目の手順（1 手 1 バイトのマス番号）"""
+
+        span = self._span(k)
+        return self._mmap[span.start + 1:span.stop]
+
+    def turns(self, k: int) -> int:
+        """k 局目の手数"""
+
+        span = self._span(k)
+        return span.stop - span.start - 1
+
+    def position(self, k: int, ply: Optional[int] = None,
+                 engine: EngineType = EngineType.LIST, *,
+                 trusted: bool = True) -> Renju:
+        """k 局目の ply 手目までを打った局面。ply を省くと終局面
+
+        終局面のときは、禁手負けのように手順からはわからない結果も記録どおりに
+        戻す。
+
+        Args:
+            trusted(bool): 記録済みの手順として Renju.load で並べる。False の
+                ときは 1 手ごとに合法判定する
+        """
+
+        game = self[k]
+        if ply is None or ply >= len(game.moves):
+            snapshot = game
+        else:
+            snapshot = Snapshot(moves=game.moves[:max(ply, 0)],
+                                finished=False, winner=None)
+
+        renju = create_renju(engine)
+        if trusted and PASS_INDEX not in snapshot.moves:
+            renju.load(snapshot.moves)
+            if renju.finished == snapshot.finished and \
+                    renju.winner == snapshot.winner and \
+                    renju.reason is snapshot.reason:
+                return renju
+            # 禁手負けなど、最後の手で決まらない結果は restore で記録どおりにする
+        renju.restore(snapshot)
+        return renju
+
+    def close(self) -> NoReturn:
+        self._mmap.close()
+
+    def __enter__(self) -> 'Archive':
+        return self
+
+    def __exit__(self, *exc) -> NoReturn:
+        self.close()
+
+
+def sheet_files(paths: Iterable[str]) -> List[Path]:
+    """ファイルとディレクトリの一覧を、スコアシートのファイルの一覧にする"""
+
+    res = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            res.extend(sorted(path.glob(SHEET_PATTERN)))
+        else:
+            res.append(path)
+    return res
+
+
+def pack(sheets: Iterable[str], file: str, *,
+         trusted: bool = False) -> int:
+    """スコアシート（CSV 形式・追記形式）をアーカイブにまとめる
+
+    Args:
+        trusted(bool): read_csv と同じ
+
+    Returns:
+        int: 書いた対局数
+    """
+
+    with ArchiveWriter(file) as writer:
+        for sheet in sheet_files(sheets):
+            writer.append(read_csv(sheet, trusted=trusted))
+        return len(writer)
+
+
+def unpack(file: str, out: str) -> int:
+    """アーカイブの各対局を CSV 形式のスコアシートに書き出す
+
+    k 局目は out/game_{k:05d}.txt に書く。
+
+    Returns:
+        int: 書いた対局数
+    """
+
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    with Archive(file) as archive:
+        for k in range(len(archive)):
+            dump_csv(out / f'game_{k:05d}.txt', archive.position(k))
+        return len(archive)
+
+
+def main() -> NoReturn:
+    parser = ArgumentParser(description='スコアシートと対局アーカイブの変換')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parser_pack = commands.add_parser(
+        'pack', help='スコアシートをアーカイブにまとめる')
+    parser_pack.add_argument('archive')
+    parser_pack.add_argument('sheets', nargs='+',
+                             help='スコアシートか、それを含むディレクトリ')
+    parser_pack.add_argument('--trusted', action='store_true',
+                             help='検証済みの手順として合法判定を省く')
+
+    parser_unpack = commands.add_parser(
+        'unpack', help='アーカイブを CSV 形式のスコアシートに戻す')
+    parser_unpack.add_argument('archive')
+    parser_unpack.add_argument('out', help='出力先ディレクトリ')
+
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        count = pack(args.sheets, args.archive, trusted=args.trusted)
+    else:
+        count = unpack(args.archive, args.out)
+    print(f'{count} games')
+
+
+if __name__ == '__main__':
+    main()
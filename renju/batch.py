@@ -0,0 +1,205 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+from typing import Iterable, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError('renju.batch requires numpy (pip install numpy)')
+
+from constants import HEIGHT, WIDTH
+from game import Renju, PlayerType, SquareType, compact_move
+from pattern import (LINE_DIRECTIONS, WINDOW_RADIUS, WINDOW_SIZE,
+                     EMPTY, MINE, BLOCKED, BLACK_TABLE, WHITE_TABLE,
+                     FOUR_COUNT, PatternType)
+
+# 盤面の配列でのマスの値
+VACANT, BLACK, WHITE = 0, 1, 2
+
+# 置いた人 -> 配列での石の値・形の表
+_COLORS = {PlayerType.FIRST: BLACK, PlayerType.SECOND: WHITE}
+_TABLES = {
+    PlayerType.FIRST: np.frombuffer(BLACK_TABLE, dtype=np.uint8),
+    PlayerType.SECOND: np.frombuffer(WHITE_TABLE, dtype=np.uint8),
+}
+_SQUARE_VALUES = {
+    SquareType.VACANT: VACANT,
+    SquareType.FIRST: BLACK,
+    SquareType.SECOND: WHITE,
+}
+
+# FOUR_COUNT を PatternType の値で引く配列
+_FOUR_COUNTS = np.zeros(max(PatternType) + 1, dtype=np.uint8)
+for _pattern, _count in FOUR_COUNT.items():
+    _FOUR_COUNTS[_pattern] = _count
+
+
+def to_array(renjus: Iterable[Renju]) -> np.ndarray:
+    """局面を N x 15 x 15 の int8 配列（VACANT / BLACK / WHITE）にする"""
+
+    boards = [[[_SQUARE_VALUES[square] for square in row]
+               for row in renju.board] for renju in renjus]
+    return np.array(boards, dtype=np.int8).reshape(-1, HEIGHT, WIDTH)
+
+
+def children(board: np.ndarray, points: List[Tuple[int, int]],
+             player: PlayerType) -> np.ndarray:
+    """board に player が points のそれぞれを置いた子局面の配列"""
+
+    res = np.repeat(board[np.newaxis], len(points), axis=0)
+    if points:
+        xs, ys = zip(*points)
+        res[np.arange(len(points)), xs, ys] = _COLORS[player]
+    return res
+
+
+def pattern_codes(boards: np.ndarray, player: PlayerType) -> np.ndarray:
+    """各マスに player が置いたときのライン窓を pattern の表の添字にする
+
+    Renju.line_codes と同じく、注目点は player の石、盤外は相手の石として扱う。
+
+    Returns:
+        np.ndarray: N x 4 x 15 x 15 の int32 配列（方向は LINE_DIRECTIONS の順）
+    """
+
+    mine = _COLORS[player]
+    digits = np.where(boards == VACANT, EMPTY,
+                      np.where(boards == mine, MINE, BLOCKED)).astype(np.int32)
+    padded = np.pad(digits, ((0, 0), (WINDOW_RADIUS, WINDOW_RADIUS),
+                             (WINDOW_RADIUS, WINDOW_RADIUS)),
+                    constant_values=BLOCKED)
+
+    res = np.zeros((len(boards), len(LINE_DIRECTIONS), HEIGHT, WIDTH),
+                   dtype=np.int32)
+    for d, (dx, dy) in enumerate(LINE_DIRECTIONS):
+        code = res[:, d]
+        for i in range(WINDOW_SIZE):
+            k = i - WINDOW_RADIUS
+            if k == 0:
+                code += MINE * 3 ** i
+                continue
+            x, y = WINDOW_RADIUS + dx * k, WINDOW_RADIUS + dy * k
+            code += padded[:, x:x + HEIGHT, y:y + WIDTH] * 3 ** i
+    return res
+
+
+def patterns(boards: np.ndarray, player: PlayerType) -> np.ndarray:
+    """各マスに player が置いたときの形（N x 4 x 15 x 15、PatternType の値）"""
+
+    return _TABLES[player][pattern_codes(boards, player)]
+
+
+def pattern_counts(boards: np.ndarray, player: PlayerType) -> np.ndarray:
+    """player が置くと各形になる空点の数を方向ごとに数える
+
+    Returns:
+        np.ndarray: N x 4 x len(PatternType) の配列。[n, d, PatternType.FOUR]
+            は局面 n で方向 d に四ができる空点の数
+    """
+
+    vacant = (boards == VACANT)[:, np.newaxis]
+    shapes = patterns(boards, player)
+    return np.stack([((shapes == t) & vacant).sum(axis=(2, 3))
+                     for t in PatternType], axis=-1)
+
+
+def side_to_move(boards: np.ndarray) -> np.ndarray:
+    """手番（BLACK / WHITE）。石の数が同じなら黒番"""
+
+    black = (boards == BLACK).sum(axis=(1, 2))
+    white = (boards == WHITE).sum(axis=(1, 2))
+    return np.where(black == white, BLACK, WHITE).astype(np.int8)
+
+
+def _renju_from_array(board: np.ndarray) -> Renju:
+    renju = Renju()
+    for x, y in zip(*np.nonzero(board)):
+        player = PlayerType.FIRST if board[x, y] == BLACK \
+            else PlayerType.SECOND
+        renju.put_stone(int(x), int(y), player)
+    return renju
+
+
+def legal_mask(boards: np.ndarray) -> np.ndarray:
+    """手番側の合法手（N x 15 x 15 の bool 配列）
+
+    黒の禁手のうち長連・四四・五の優先は配列のまま判定し、三三の候補点だけ
+    Renju に盤面を写して再帰的な判定をする。
+    """
+
+    vacant = boards == VACANT
+    res = vacant.copy()
+
+    # 初手は中央のみ
+    empty = vacant.all(axis=(1, 2))
+    if empty.any():
+        res[empty] = False
+        res[empty, HEIGHT // 2, WIDTH // 2] = True
+
+    black = (side_to_move(boards) == BLACK) & ~empty
+    if not black.any():
+        return res
+
+    index = np.nonzero(black)[0]
+    shapes = patterns(boards[index], PlayerType.FIRST)
+    five = (shapes == PatternType.FIVE).any(axis=1)
+    overline = (shapes == PatternType.OVERLINE).any(axis=1)
+    fours = _FOUR_COUNTS[shapes].sum(axis=1)
+    threes = (shapes == PatternType.OPEN_THREE).sum(axis=1)
+
+    candidates = vacant[index] & ~five
+    forbidden = candidates & (overline | (fours >= 2))
+    double_threes = candidates & ~forbidden & (threes >= 2)
+
+    for n, x, y in zip(*np.nonzero(double_threes)):
+        renju = _renju_from_array(boards[index[n]])
+        if renju.probe_forbidden(
+                compact_move(int(x), int(y), PlayerType.FIRST)):
+            forbidden[n, x, y] = True
+
+    res[index] &= ~forbidden
+    return res
+
+
+def _runs(stones: np.ndarray, length: int, exact: bool) -> np.ndarray:
+    """length 個並んだ石があるとき True（exact のときはちょうど length 個）"""
+
+    n = len(stones)
+    pad = length
+    padded = np.zeros((n, HEIGHT + 2 * pad, WIDTH + 2 * pad), dtype=bool)
+    padded[:, pad:pad + HEIGHT, pad:pad + WIDTH] = stones
+
+    res = np.zeros(n, dtype=bool)
+    for dx, dy in LINE_DIRECTIONS:
+        # 各マスから (dx, dy) 方向に length 個続くか
+        run = np.ones((n, HEIGHT, WIDTH), dtype=bool)
+        for k in range(length):
+            x, y = pad + dx * k, pad + dy * k
+            run &= padded[:, x:x + HEIGHT, y:y + WIDTH]
+        if exact:
+            # 両端の外側が自石でない
+            x, y = pad - dx, pad - dy
+            run &= ~padded[:, x:x + HEIGHT, y:y + WIDTH]
+            x, y = pad + dx * length, pad + dy * length
+            run &= ~padded[:, x:x + HEIGHT, y:y + WIDTH]
+        res |= run.any(axis=(1, 2))
+    return res
+
+
+def winners(boards: np.ndarray) -> np.ndarray:
+    """勝者（BLACK / WHITE、いなければ VACANT）
+
+    黒はちょうど 5 つ、白は 5 つ以上並んだときに勝ち。
+    """
+
+    black = _runs(boards == BLACK, 5, exact=True)
+    white = _runs(boards == WHITE, 5, exact=False)
+    return np.where(black, BLACK,
+                    np.where(white, WHITE, VACANT)).astype(np.int8)
+
+
+if __name__ == '__main__':
+    pass
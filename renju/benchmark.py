@@ -0,0 +1,305 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+import json
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Callable, Dict, List, NoReturn, Optional, Tuple
+
+from game import Renju, Move, EngineType, create_renju
+from sheet import read_csv, dump_csv
+
+# 付属の棋譜。コーパスの先頭に必ず入れる
+SCORE_SHEET = Path(__file__).parent.parent / 'score_sheet.txt'
+
+# 乱数で作る対局の数とシード。同じ値なら毎回同じコーパスになる
+CORPUS_GAMES = 20
+CORPUS_SEED = 20240101
+
+# 報告するレイテンシのパーセンタイル
+PERCENTILES = (50, 90, 99)
+
+# is_legal_move を調べる、次の手の周りのマス
+PROBE_OFFSETS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+Point = Tuple[int, int]
+
+
+def random_game(rng: random.Random) -> List[Point]:
+    """合法手を一様に選んで終局まで打った手順"""
+
+    renju = Renju()
+    while not renju.finished:
+        # legal_moves は順不同なので、並べてから選ぶ
+        moves = sorted(renju.legal_moves())
+        if not moves:
+            break
+        renju.add_move(rng.choice(moves))
+    return [move.point for move in renju.score_sheet]
+
+
+def build_corpus(games: int = CORPUS_GAMES,
+                 seed: int = CORPUS_SEED) -> List[List[Point]]:
+    """score_sheet.txt と、固定シードの乱数対局からなるコーパス"""
+
+    corpus = [[move.point for move in read_csv(SCORE_SHEET).score_sheet]]
+
+    rng = random.Random(seed)
+    corpus.extend(random_game(rng) for i in range(games))
+    return corpus
+
+
+class Timer:
+    """1 回ごとの所要時間（ナノ秒）を貯める"""
+
+    def __init__(self):
+        self.samples = []
+
+    def call(self, func: Callable, *args):
+        start = time.perf_counter_ns()
+        res = func(*args)
+        self.samples.append(time.perf_counter_ns() - start)
+        return res
+
+    def report(self) -> Dict[str, float]:
+        samples = sorted(self.samples)
+        total = sum(samples)
+
+        res = {
+            'calls': len(samples),
+            'total_sec': total / 1e9,
+            'ops_per_sec': len(samples) / (total / 1e9) if total else 0.0,
+        }
+        for p in PERCENTILES:
+            index = min(len(samples) - 1, len(samples) * p // 100)
+            res[f'p{p}_us'] = samples[index] / 1e3 if samples else 0.0
+        return res
+
+
+def bench_replay(corpus: List[List[Point]], engine: EngineType,
+                 repeat: int) -> Dict[str, Timer]:
+    """棋譜を打ち進め・戻しながら、各局面で判定関数を呼ぶ"""
+
+    timers = {name: Timer() for name in
+              ('add_move', 'pop', 'is_legal_move', 'renzoku', 'shishi')}
+
+    for i in range(repeat):
+        for game in corpus:
+            renju = create_renju(engine)
+            for point in game:
+                player = renju.putter
+                x, y = point
+                for dx, dy in PROBE_OFFSETS:
+                    if 0 <= x + dx < renju.height and \
+                            0 <= y + dy < renju.width:
+                        timers['is_legal_move'].call(
+                            renju.is_legal_move,
+                            Move(x + dx, y + dy, player=player))
+
+                move = Move(x, y, player=player)
+                timers['renzoku'].call(renju.renzoku, move)
+                timers['shishi'].call(renju.shishi, move)
+                timers['add_move'].call(renju.add_move, point)
+
+            while renju.turn > 0:
+                timers['pop'].call(renju.pop)
+
+    return timers
+
+
+def bench_read_csv(corpus: List[List[Point]], engine: EngineType,
+                   repeat: int, trusted: bool = False) -> Timer:
+    timer = Timer()
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i, game in enumerate(corpus):
+            renju = create_renju(engine)
+            for point in game:
+                renju.add_move(point)
+            files.append(Path(tmp) / f'game_{i:05d}.txt')
+            dump_csv(files[-1], renju)
+
+        for i in range(repeat):
+            for file in files:
+                timer.call(lambda: read_csv(file, engine, trusted=trusted))
+    return timer
+
+
+def bench_board_control(corpus: List[List[Point]], engine: EngineType,
+                        repeat: int) -> Optional[Timer]:
+    """各局面で BoardControl を作る。prompt_toolkit がなければ None"""
+
+    try:
+        from prompt import BoardControl
+    except ImportError:
+        return None
+
+    timer = Timer()
+    for i in range(repeat):
+        for game in corpus:
+            renju = create_renju(engine)
+            for point in game:
+                renju.add_move(point)
+                timer.call(lambda: BoardControl(renju=renju, prompt=False))
+    return timer
+
+
+def perft(renju: Renju, depth: int) -> int:
+    """depth 手先までの合法な手順の数。終局した局面はそこで数える"""
+
+    if depth == 0 or renju.finished:
+        return 1
+
+    count = 0
+    for point in renju.legal_moves():
+        renju.add_move(point)
+        try:
+            count += perft(renju, depth - 1)
+        finally:
+            renju.pop()
+    return count
+
+
+def bench_perft(corpus: List[List[Point]], engine: EngineType,
+                depth: int) -> List[Dict[str, float]]:
+    """各対局の中盤の局面から perft を数える"""
+
+    res = []
+    for game in corpus:
+        renju = create_renju(engine)
+        # 終局直前の手は避けて、対局の半ばまで進める
+        for point in game[:len(game) // 2]:
+            renju.add_move(point)
+
+        start = time.perf_counter()
+        nodes = perft(renju, depth)
+        elapsed = time.perf_counter() - start
+        res.append({
+            'turn': renju.turn,
+            'depth': depth,
+            'nodes': nodes,
+            'sec': elapsed,
+            'nodes_per_sec': nodes / elapsed if elapsed > 0 else 0.0,
+        })
+    return res
+
+
+def bench_parallel(corpus: List[List[Point]], jobs: int,
+                   depth: int) -> List[Dict[str, float]]:
+    """各対局の中盤の局面を depth まで読む時間を、1 プロセスと並列探索で比べる"""
+
+    from parallel import ParallelSearcher
+    from search import Searcher
+
+    res = []
+    for game in corpus:
+        renju = create_renju(EngineType.BITBOARD)
+        for point in game[:len(game) // 2]:
+            renju.add_move(point)
+
+        # 読む深さだけで比べるため、時間制限と脅威空間探索は使わない
+        single = Searcher(renju, threats=False).search(
+            time_limit=float('inf'), max_depth=depth)
+        with ParallelSearcher(jobs, threats=False) as searcher:
+            parallel = searcher.search(renju, time_limit=float('inf'),
+                                       max_depth=depth)
+
+        res.append({
+            'turn': renju.turn,
+            'depth': depth,
+            'jobs': jobs,
+            'single_sec': single.elapsed,
+            'parallel_sec': parallel.elapsed,
+            'speedup': single.elapsed / parallel.elapsed
+            if parallel.elapsed > 0 else 0.0,
+            'single_nodes': single.nodes,
+            'parallel_nodes': parallel.nodes,
+            'same_move': single.move == parallel.move,
+        })
+    return res
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=Path(__file__).parent,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(*, engine: EngineType = EngineType.LIST, repeat: int = 1,
+        games: int = CORPUS_GAMES, perft_depth: int = 2,
+        perft_games: int = 3, parallel_jobs: int = 0,
+        search_depth: int = 3) -> dict:
+    """ベンチマークをすべて走らせ、JSON にできる dict を返す"""
+
+    corpus = build_corpus(games)
+
+    results = {name: timer.report() for name, timer in
+               bench_replay(corpus, engine, repeat).items()}
+    results['read_csv'] = bench_read_csv(corpus, engine, repeat).report()
+    results['read_csv_trusted'] = bench_read_csv(
+        corpus, engine, repeat, trusted=True).report()
+
+    timer = bench_board_control(corpus, engine, repeat)
+    if timer is not None:
+        results['BoardControl'] = timer.report()
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'engine': engine.name,
+        'repeat': repeat,
+        'corpus': {'games': len(corpus),
+                   'moves': sum(len(game) for game in corpus)},
+        'results': results,
+        'perft': bench_perft(corpus[:perft_games], engine, perft_depth),
+    }
+    if parallel_jobs > 1:
+        report['parallel'] = bench_parallel(corpus[:perft_games],
+                                            parallel_jobs, search_depth)
+    return report
+
+
+def main() -> NoReturn:
+    parser = ArgumentParser(description='ゲーム本体のマイクロベンチマーク')
+    parser.add_argument('-e', '--engine', default='list',
+                        choices=[e.name.lower() for e in EngineType])
+    parser.add_argument('-r', '--repeat', type=int, default=1,
+                        help='コーパスを繰り返す回数')
+    parser.add_argument('-g', '--games', type=int, default=CORPUS_GAMES,
+                        help='コーパスに加える乱数対局の数')
+    parser.add_argument('-d', '--perft-depth', type=int, default=2)
+    parser.add_argument('--perft-games', type=int, default=3,
+                        help='perft を数える対局の数')
+    parser.add_argument('-j', '--parallel-jobs', type=int, default=0,
+                        help='並列探索の速度向上を測るときのワーカー数')
+    parser.add_argument('-s', '--search-depth', type=int, default=3,
+                        help='並列探索の比較で読む深さ')
+    parser.add_argument('-o', '--out', help='結果の JSON の出力先（デフォルトは標準出力）')
+    args = parser.parse_args()
+
+    report = run(engine=EngineType[args.engine.upper()], repeat=args.repeat,
+                 games=args.games, perft_depth=args.perft_depth,
+                 perft_games=args.perft_games,
+                 parallel_jobs=args.parallel_jobs,
+                 search_depth=args.search_depth)
+
+    text = json.dumps(report, indent=2)
+    if args.out is None:
+        print(text)
+    else:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+from typing import NoReturn, List, Tuple
+
+from constants import HEIGHT, WIDTH
+from game import Renju, Move, MoveLike, PlayerType
+from pattern import run_length, window_code, WINDOW_RADIUS, WINDOW_MASK
+
+# 方向は Renju.renzoku と同じ順: (0, 1), (-1, 1), (-1, 0), (-1, -1)
+DIRECTIONS = 4
+
+# 1 ラインあたりのビット幅。最上位の 1 ビットはラインをまたがないための番兵
+LINE_WIDTH = 16
+LINE_MASK = (1 << LINE_WIDTH) - 1
+
+
+def _line_of(x: int, y: int, d: int) -> Tuple[int, int]:
+    """(x, y) が方向 d で属するラインの番号とライン内の位置"""
+
+    if d == 0:  # 横
+        return x, y
+    if d == 1:  # 右上がり（x + y が一定）
+        return x + y, y
+    if d == 2:  # 縦
+        return y, x
+    return x - y + WIDTH - 1, y  # 右下がり（x - y が一定）
+
+
+def _build_tables() -> Tuple[list, list, list]:
+    shifts, positions = [], []
+    onboard = [[0] * (HEIGHT + WIDTH - 1) for d in range(DIRECTIONS)]
+
+    for x in range(HEIGHT):
+        for y in range(WIDTH):
+            shift, pos = [], []
+            for d in range(DIRECTIONS):
+                line, p = _line_of(x, y, d)
+                shift.append(line * LINE_WIDTH)
+                pos.append(p)
+                onboard[d][line] |= 1 << p
+            shifts.append(tuple(shift))
+            positions.append(tuple(pos))
+
+    onboard_at = []
+    for x in range(HEIGHT):
+        for y in range(WIDTH):
+            onboard_at.append(tuple(
+                onboard[d][_line_of(x, y, d)[0]] for d in range(DIRECTIONS)))
+
+    return shifts, positions, onboard_at
+
+
+# マス番号 x * WIDTH + y ごとの、方向別のラインのシフト量・ライン内位置・盤内マスク
+SHIFTS, POSITIONS, ONBOARD = _build_tables()
+
+
+def five_mask(bits: int, length: int = 5) -> int:
+    """length 個連続する石の始点を表すマスク"""
+
+    for i in range(1, length):
+        bits &= bits >> 1
+    return bits
+
+
+class BitboardRenju(Renju):
+    """ビットボード版の Renju
+
+    色ごとに横・縦・両斜めの 4 方向それぞれで、1 ラインを LINE_WIDTH ビットに
+    詰めた整数を持つ。連の長さやライン窓はラインを切り出してシフトとマスクで求める。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lines = [[0] * DIRECTIONS, [0] * DIRECTIONS]
+
+    def clone(self) -> 'BitboardRenju':
+        res = super().clone()
+        res._lines = [lines[:] for lines in self._lines]
+        return res
+
+    @staticmethod
+    def _color(player: PlayerType) -> int:
+        return 0 if player is PlayerType.FIRST else 1
+
+    def put_stone(self, x: int, y: int, player: PlayerType) -> NoReturn:
+        super().put_stone(x, y, player)
+
+        index = x * WIDTH + y
+        lines = self._lines[self._color(player)]
+        for d, (shift, pos) in enumerate(zip(SHIFTS[index], POSITIONS[index])):
+            lines[d] |= 1 << (shift + pos)
+
+    def remove_stone(self, x: int, y: int) -> NoReturn:
+        super().remove_stone(x, y)
+
+        index = x * WIDTH + y
+        for lines in self._lines:
+            for d, (shift, pos) in enumerate(zip(SHIFTS[index],
+                                                 POSITIONS[index])):
+                lines[d] &= ~(1 << (shift + pos))
+
+    def lines_at(self, move: Move) -> List[Tuple[int, int, int, int]]:
+        """move の位置を通る 4 方向のラインを切り出す
+
+        Returns:
+            List[Tuple[int, int, int, int]]: 方向ごとの (自石, 相手石, 盤内, 位置)。
+                自石には move の位置を含める。
+        """
+
+        index = move.x * WIDTH + move.y
+        color = self._color(move.player)
+        mine, theirs = self._lines[color], self._lines[1 - color]
+
+        res = []
+        for d in range(DIRECTIONS):
+            shift, pos = SHIFTS[index][d], POSITIONS[index][d]
+            res.append(((mine[d] >> shift) & LINE_MASK | (1 << pos),
+                        (theirs[d] >> shift) & LINE_MASK,
+                        ONBOARD[index][d],
+                        pos))
+        return res
+
+    def renzoku(self, move: MoveLike) -> List[int]:
+        """move に置いたときにできる連続を見つける"""
+
+        move = self._to_move(move)
+        return [run_length(mine, pos)
+                for mine, _, _, pos in self.lines_at(move)]
+
+    def line_codes(self, move: Move) -> List[int]:
+        """move を中心とした 4 方向のライン窓を pattern の表の添字にする"""
+
+        return [window_code(
+                    (mine << WINDOW_RADIUS >> pos) & WINDOW_MASK,
+                    ((onboard & ~(mine | theirs)) << WINDOW_RADIUS >> pos) &
+                    WINDOW_MASK)
+                for mine, theirs, onboard, pos in self.lines_at(move)]
+
+    def has_five(self, player: PlayerType) -> bool:
+        """player の石が 5 つ以上並んでいるとき True"""
+
+        return any(five_mask(lines) for lines in self._lines[self._color(player)])
+
+
+if __name__ == '__main__':
+    pass
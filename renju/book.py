@@ -0,0 +1,206 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+import mmap
+import struct
+from argparse import ArgumentParser
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, NoReturn, Optional, Tuple
+
+from game import (Renju, SQUARES, SYMMETRIES, INVERSE_SYMMETRIES,
+                  square_index)
+from analytics import records, replay_all
+
+# 定跡
+#
+#   ヘッダ   magic(4) version(u16) 手数(u16) エントリ数(u64)
+#   エントリ canonical なハッシュ(u64) 手(u8) 予約(3) 対局数(u32)
+#            勝ち数(u32) 引き分け数(u32)
+#
+# エントリはハッシュ順に並べるので、局面は二分探索で引ける。手は
+# Renju.canonical_move で写したマス番号で、対称な局面の同等な手は 1 つの
+# エントリになる。勝ち数・引き分け数はその手を打った側から見た値。数値はすべてリトルエンディアン。
+
+MAGIC = b'RJBK'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sHHQ')
+_ENTRY = struct.Struct('<QB3xIII')
+_KEY = struct.Struct('<Q')
+
+# 定跡に入れる手数
+BOOK_PLIES = 12
+
+# 定跡の手を使うのに必要な対局数
+MIN_GAMES = 3
+
+
+class BookMove(NamedTuple):
+    """定跡の 1 手
+
+    Attributes:
+        move(Tuple[int, int]): 手
+        games(int): この手が打たれた対局数
+        wins(int): 打った側が勝った対局数
+        draws(int): 決着しなかった対局数
+    """
+
+    move: Tuple[int, int]
+    games: int
+    wins: int
+    draws: int
+
+    @property
+    def score(self) -> float:
+        """打った側から見た得点率（引き分けは 0.5）"""
+
+        return (self.wins + self.draws / 2) / self.games
+
+
+def build(paths: Iterable[str], file: str, *, plies: int = BOOK_PLIES,
+          jobs: int = 1) -> int:
+    """対局の集まりから定跡を作る
+
+    各対局の最初の plies 手について、局面（canonical なハッシュ）と手ごとに
+    対局数と結果を数える。
+
+    Args:
+        paths(Iterable[str]): スコアシート、それを含むディレクトリ、または
+            対局アーカイブ
+        file(str): 書き出すファイル
+        plies(int): 定跡に入れる手数
+        jobs(int): 打ち直しに使うプロセス数
+
+    Returns:
+        int: 書いたエントリ数
+    """
+
+    # (ハッシュ, 写した手) -> [対局数, 勝ち数, 引き分け数]
+    counts: Dict[Tuple[int, int], List[int]] = defaultdict(lambda: [0, 0, 0])
+    for stats in replay_all(records(paths), jobs=jobs, opening_plies=plies):
+        renju = Renju()
+        for point in stats.opening:
+            if point[0] is None:  # パス
+                break
+            # 対称な局面の同等な手は 1 つのエントリにまとめる
+            key = renju.canonical_key
+            entry = counts[(key, square_index(*renju.canonical_move(point)))]
+            entry[0] += 1
+            if stats.winner is None:
+                entry[2] += 1
+            elif stats.winner is renju.putter:
+                entry[1] += 1
+            renju.load([point])
+
+    with open(file, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, plies, len(counts)))
+        for (key, index), (games, wins, draws) in sorted(counts.items()):
+            f.write(_ENTRY.pack(key, index, games, wins, draws))
+    return len(counts)
+
+
+class OpeningBook:
+    """定跡を mmap で引く
+
+    局面ごとのエントリはハッシュの二分探索で見つけるので、定跡全体は
+    メモリに読み込まない。
+
+    Args:
+        file(str): 定跡のファイル
+    """
+
+    def __init__(self, file: str):
+        with open(file, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, plies, count = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f'{file} is not an opening book')
+        if version != VERSION:
+            self._mmap.close()
+            raise ValueError(f'unsupported book version: {version}')
+
+        self.plies = plies
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _key(self, i: int) -> int:
+        return _KEY.unpack_from(self._mmap,
+                                _HEADER.size + _ENTRY.size * i)[0]
+
+    def lookup(self, renju: Renju) -> List[BookMove]:
+        """renju の局面で打たれた手。多く打たれた順"""
+
+        if renju.turn >= self.plies:
+            return []
+
+        key, symmetry = renju.canonical()
+        inverse = SYMMETRIES[INVERSE_SYMMETRIES[symmetry]]
+
+        # key 以上の最初のエントリ
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        res = []
+        for i in range(lo, self._count):
+            entry_key, index, games, wins, draws = _ENTRY.unpack_from(
+                self._mmap, _HEADER.size + _ENTRY.size * i)
+            if entry_key != key:
+                break
+            res.append(BookMove(move=SQUARES[inverse[index]], games=games,
+                                wins=wins, draws=draws))
+        res.sort(key=lambda m: m.games, reverse=True)
+        return res
+
+    def choose(self, renju: Renju, *,
+               min_games: int = MIN_GAMES) -> Optional[Tuple[int, int]]:
+        """定跡の手のうち得点率が最も高い合法手。なければ None
+
+        Args:
+            min_games(int): 使う手に必要な対局数
+        """
+
+        moves = [m for m in self.lookup(renju)
+                 if m.games >= min_games and renju.is_legal_move(m.move)]
+        if not moves:
+            return None
+        return max(moves, key=lambda m: (m.score, m.games)).move
+
+    def close(self) -> NoReturn:
+        self._mmap.close()
+
+    def __enter__(self) -> 'OpeningBook':
+        return self
+
+    def __exit__(self, *exc) -> NoReturn:
+        self.close()
+
+
+def main() -> NoReturn:
+    parser = ArgumentParser(description='対局の集まりから定跡を作る')
+    parser.add_argument('paths', nargs='+',
+                        help='スコアシート、それを含むディレクトリ、またはアーカイブ')
+    parser.add_argument('-o', '--out', default='./book.bin',
+                        help='定跡の出力先')
+    parser.add_argument('-p', '--plies', type=int, default=BOOK_PLIES,
+                        help='定跡に入れる手数')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='打ち直しに使うプロセス数')
+    args = parser.parse_args()
+
+    count = build(args.paths, args.out, plies=args.plies, jobs=args.jobs)
+    print(f'{count} entries')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,10 +3,16 @@ import pathlib
 sys.path.append(pathlib.Path(__file__).parent.__str__())
 
 
-from typing import NoReturn, Tuple, List, Optional
+from typing import Iterable, NamedTuple, NoReturn, Tuple, List, Optional, Union
 from enum import Enum, auto
+from random import Random
 
 from constants import HEIGHT, WIDTH
+from pattern import (LINE_DIRECTIONS, WINDOW_RADIUS, WINDOW_OFFSETS,
+                     MINE, BLOCKED, BLACK_TABLE, WHITE_TABLE,
+                     BLACK_FOUR_POINTS, WHITE_FOUR_POINTS,
+                     BLACK_THREE_POINTS, WHITE_THREE_POINTS,
+                     FOUR_COUNT, PatternType)
 
 
 class IllegalMove(Exception):
@@ -47,6 +53,26 @@ class SquareType(Enum):
     VACANT = auto()
 
 
+class EndReason(Enum):
+    """終局の理由
+
+    Attributes:
+        NONE: 終局していない、または記録がない
+        FIVE: 五ができた（白の長連を含む）
+        FORBIDDEN: 黒が禁手を打った
+        TIMEOUT: 持ち時間切れ
+        ERROR: ソルバが手を返さなかった
+        DRAW: 置ける場所がない
+    """
+
+    NONE = 0
+    FIVE = 1
+    FORBIDDEN = 2
+    TIMEOUT = 3
+    ERROR = 4
+    DRAW = 5
+
+
 def to_square_type(player: PlayerType = None) -> SquareType:
     """PlayerType -> SquareType"""
 
@@ -66,6 +92,8 @@ class Move:
         y(int): 列
     """
 
+    __slots__ = ('_player', '_x', '_y')
+
     def __init__(self, x: int, y: int, *,
                  player: PlayerType = None,
                  ):
@@ -74,7 +102,7 @@ class Move:
         self._y = y
 
     def __eq__(self, other) -> bool:
-        if not isinstance(other, Move):
+        if not isinstance(other, (Move, CompactMove)):
             return NotImplemented
 
         return self.player == other.player and\
@@ -121,10 +149,102 @@ class Move:
         self._y = value
 
 
+# マス番号 x * WIDTH + y -> (x, y)
+SQUARES = [(x, y) for x in range(HEIGHT) for y in range(WIDTH)]
+
+
+def square_index(x: int, y: int) -> int:
+    """(x, y) -> マス番号"""
+
+    return x * WIDTH + y
+
+
+class CompactMove:
+    """置き位置の軽量版
+
+    マス番号と置いた人の組ごとに 1 つだけ作って MOVE_POOL で共有する。
+    属性はプロパティを通さずに読め、作った後は変更しない。Move と比較できる。
+
+    Args:
+        index(int): マス番号 x * WIDTH + y
+        player(PlayerType): 置いた人
+    """
+
+    __slots__ = ('index', 'x', 'y', 'point', 'player')
+
+    def __init__(self, index: int, player: PlayerType):
+        self.index = index
+        self.point = SQUARES[index]
+        self.x, self.y = self.point
+        self.player = player
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, (Move, CompactMove)):
+            return NotImplemented
+
+        return self.player == other.player and\
+            self.x == other.x and \
+            self.y == other.y
+
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        return f'{self.player}{self.point}'
+
+
+# 置いた人 -> マス番号 -> CompactMove
+MOVE_POOL = {player: tuple(CompactMove(index, player)
+                           for index in range(HEIGHT * WIDTH))
+             for player in PlayerType}
+
+# add_move などに渡せる手: マス番号・(x, y)・Move・CompactMove
+MoveLike = Union[int, Tuple[int, int], Move, CompactMove]
+
+
+def compact_move(x: int, y: int, player: PlayerType) -> CompactMove:
+    """(x, y) と置いた人から共有の CompactMove を引く"""
+
+    return MOVE_POOL[player][x * WIDTH + y]
+
+
 # 黒は最初中央に置く
 FIRST_MOVE = Move(7, 7, player=PlayerType.FIRST)
 NONE_MOVE = Move(None, None)
 
+# Snapshot.moves でパスを表す値
+PASS_INDEX = 0xFF
+# Snapshot.to_bytes での勝者の表現。終局の理由はその上の 3 bit に入れる
+_WINNER_CODES = {None: 0, PlayerType.FIRST: 1, PlayerType.SECOND: 2}
+_WINNERS = {code: winner for winner, code in _WINNER_CODES.items()}
+
+
+class Snapshot(NamedTuple):
+    """局面の保存形式
+
+    Attributes:
+        moves(bytes): 1 手 1 バイトのマス番号。パスは PASS_INDEX
+        finished(bool): 終局しているとき True
+        winner(Optional[PlayerType]): 勝者
+        reason(EndReason): 終局の理由
+    """
+
+    moves: bytes
+    finished: bool
+    winner: Optional[PlayerType]
+    reason: EndReason = EndReason.NONE
+
+    def to_bytes(self) -> bytes:
+        """先頭 1 バイトに終局の理由・終局フラグ・勝者、続けて手を並べたバイト列"""
+
+        return bytes([self.reason.value << 3 | self.finished << 2 |
+                      _WINNER_CODES[self.winner]]) + self.moves
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Snapshot':
+        return cls(moves=bytes(data[1:]), finished=bool(data[0] >> 2 & 0x1),
+                   winner=_WINNERS[data[0] & 0x3],
+                   reason=EndReason(data[0] >> 3))
+
 
 class Board:
     """盤面の情報
@@ -134,12 +254,11 @@ class Board:
         board(List[List[SquareType]]): 盤面
     """
 
-    _score_sheet = []
-    _putter = PlayerType.FIRST
-
     def __init__(self):
         self._board = [
             [SquareType.VACANT for i in range(HEIGHT)] for i in range(WIDTH)]
+        self._score_sheet = []
+        self._putter = PlayerType.FIRST
 
     @property
     def score_sheet(self) -> List[Move]:
@@ -173,19 +292,51 @@ class Board:
     def width(self) -> int:
         return WIDTH
 
-    def add_move(self, move: Move) -> NoReturn:
+    def _to_move(self, move: MoveLike) -> Union[Move, CompactMove]:
+        """マス番号・(x, y)・置いた人のない Move を、手番側の手にする"""
+
+        if isinstance(move, int):
+            return MOVE_POOL[self._putter][move]
+        if isinstance(move, tuple):
+            x, y = move
+        elif move.player is None:
+            x, y = move.point
+        else:
+            return move
+
+        if 0 <= x < HEIGHT and 0 <= y < WIDTH:
+            return MOVE_POOL[self._putter][x * WIDTH + y]
+        return Move(x, y, player=self._putter)
+
+    def add_move(self, move: MoveLike) -> NoReturn:
         """石を置く"""
-        if not isinstance(move, Move):
-            move = Move(*move)
 
-        if move.player is None:
-            move.player = self.putter
+        move = self._to_move(move)
 
         x, y = move.point
-        self.board[x][y] = to_square_type(move.player)
+        self.put_stone(x, y, move.player)
         self.score_sheet.append(move)
         self.increment_turn()
 
+    def clone(self) -> 'Board':
+        """局面を複製する。手の履歴も含めて元の局面とは独立に進め戻しできる。"""
+
+        res = object.__new__(type(self))
+        res.__dict__.update(self.__dict__)
+        res._board = [row[:] for row in self._board]
+        res._score_sheet = self._score_sheet[:]
+        return res
+
+    def put_stone(self, x: int, y: int, player: PlayerType) -> NoReturn:
+        """盤面に石を置く。エンジンごとの差分はここで吸収する。"""
+
+        self.board[x][y] = to_square_type(player)
+
+    def remove_stone(self, x: int, y: int) -> NoReturn:
+        """盤面から石を取り除く"""
+
+        self.board[x][y] = SquareType.VACANT
+
     def pass_turn(self) -> NoReturn:
         """有効手がない場合にターンを飛ばす。"""
 
@@ -206,13 +357,351 @@ class Board:
         self.increment_turn()
 
 
+# 黒の禁手判定に影響する範囲（4 方向それぞれ 5 マス先まで）
+FORBIDDEN_RADIUS = 5
+
+# 三三の再帰判定結果のキャッシュ。(石の配置のハッシュ, マス) -> 禁手か
+# 局面だけで決まる値なのでインスタンス間で共有し、大きくなったら捨てる
+FORBIDDEN_MEMO_SIZE = 1 << 16
+_forbidden_memo = {}
+
+
+def _build_line_neighbors(radius: int) -> dict:
+    directions = [(0, 1), (-1, 1), (-1, 0), (-1, -1)]
+
+    res = {}
+    for x in range(HEIGHT):
+        for y in range(WIDTH):
+            neighbors = []
+            for (dx, dy) in directions:
+                for k in range(-radius, radius + 1):
+                    nx, ny = x + dx * k, y + dy * k
+                    if k != 0 and 0 <= nx < HEIGHT and 0 <= ny < WIDTH:
+                        neighbors.append((nx, ny))
+            res[(x, y)] = tuple(neighbors)
+    return res
+
+
+# マスごとの、禁手判定が変わりうる周辺のマス
+LINE_NEIGHBORS = _build_line_neighbors(FORBIDDEN_RADIUS)
+
+
+def _build_zobrist_keys(seed: int = 0x52454E4A55) -> Tuple[dict, int]:
+    # プロセス間で同じ値になるよう乱数の種は固定する
+    rng = Random(seed)
+
+    keys = {}
+    for x in range(HEIGHT):
+        for y in range(WIDTH):
+            keys[(x, y)] = {
+                PlayerType.FIRST: rng.getrandbits(64),
+                PlayerType.SECOND: rng.getrandbits(64),
+            }
+    return keys, rng.getrandbits(64)
+
+
+def _build_window_cells() -> dict:
+    res = {}
+    for x in range(HEIGHT):
+        for y in range(WIDTH):
+            windows = []
+            for (dx, dy) in LINE_DIRECTIONS:
+                cells = []
+                for k in range(-WINDOW_RADIUS, WINDOW_RADIUS + 1):
+                    nx, ny = x + dx * k, y + dy * k
+                    weight = 3 ** (k + WINDOW_RADIUS)
+                    if k == 0:
+                        continue
+                    if 0 <= nx < HEIGHT and 0 <= ny < WIDTH:
+                        cells.append((nx, ny, weight))
+                    else:
+                        cells.append((None, None, weight))
+                windows.append(tuple(cells))
+            res[(x, y)] = tuple(windows)
+    return res
+
+
+# マスごと・方向ごとの、ライン窓に含まれるマスと 3 進の重み（注目点を除く）
+WINDOW_CELLS = _build_window_cells()
+WINDOW_CENTER_CODE = 3 ** WINDOW_RADIUS * MINE
+
+
+# Zobrist ハッシュ用の乱数。マス・石の色ごとの値と、白番のときの値
+ZOBRIST_KEYS, ZOBRIST_SIDE = _build_zobrist_keys()
+
+
+# 盤の対称変換の数（中央 (7, 7) を中心とする回転 4 通り x 鏡映の有無）
+SYMMETRY_COUNT = 8
+
+
+def _build_symmetries() -> List[Tuple[int, ...]]:
+    last = HEIGHT - 1
+    transforms = [
+        lambda x, y: (x, y),                # 恒等変換
+        lambda x, y: (y, last - x),         # 90 度回転
+        lambda x, y: (last - x, last - y),  # 180 度回転
+        lambda x, y: (last - y, x),         # 270 度回転
+        lambda x, y: (x, last - y),         # 左右反転
+        lambda x, y: (last - x, y),         # 上下反転
+        lambda x, y: (y, x),                # 対角線で反転
+        lambda x, y: (last - y, last - x),  # 逆対角線で反転
+    ]
+    return [tuple(square_index(*f(x, y)) for x, y in SQUARES)
+            for f in transforms]
+
+
+# 変換の番号 -> マス番号の写し先
+SYMMETRIES = _build_symmetries()
+
+# 変換の番号 -> 逆変換の番号
+INVERSE_SYMMETRIES = [
+    next(u for u in range(SYMMETRY_COUNT)
+         if all(SYMMETRIES[u][index] == i
+                for i, index in enumerate(SYMMETRIES[t])))
+    for t in range(SYMMETRY_COUNT)]
+
+# 置いた人 -> マス番号 -> 変換ごとの、写し先のマスの Zobrist ハッシュ用の乱数
+SYMMETRY_KEYS = {
+    player: tuple(
+        tuple(ZOBRIST_KEYS[SQUARES[SYMMETRIES[t][index]]][player]
+              for t in range(SYMMETRY_COUNT))
+        for index in range(len(SQUARES)))
+    for player in PlayerType}
+
+
+def transform_point(point: Tuple[int, int],
+                    symmetry: int) -> Tuple[int, int]:
+    """point を対称変換 symmetry で写した点"""
+
+    return SQUARES[SYMMETRIES[symmetry][square_index(*point)]]
+
+
 class Renju(Board):
-    _finished = False
-    _winner = None
+    """連珠のルールを持つ盤面
+
+    黒の禁手点は置かれた・取り除かれた石の周辺だけを再計算するため、
+    合法手の集合は局面ごとに作り直さず差分で保つ。
+    """
 
     def __init__(self):
         super().__init__()
 
+        self._finished = False
+        self._winner = None
+        self._reason = EndReason.NONE
+
+        # 空きマス、黒の禁手点、禁手判定のやり直しが必要なマス
+        self._vacant = {(x, y) for x in range(HEIGHT) for y in range(WIDTH)}
+        self._forbidden = set()
+        self._dirty = set()
+        # 三三の再帰判定を使ったマス。周辺に限らず石が動くたびにやり直す
+        self._volatile = set()
+        # 三三の再帰判定で仮に石を置いている深さ
+        self._probing = 0
+
+        self._hash_key = 0
+        # 手数ごとの、対称変換で写した局面の Zobrist ハッシュ（8 通り）。
+        # canonical を呼んだときに、まだ求めていない手の分だけ伸ばす
+        self._symmetry_stack = [(0,) * SYMMETRY_COUNT]
+
+    def clone(self) -> 'Renju':
+        res = super().clone()
+        res._vacant = set(self._vacant)
+        res._forbidden = set(self._forbidden)
+        res._dirty = set(self._dirty)
+        res._volatile = set(self._volatile)
+        res._symmetry_stack = self._symmetry_stack[:]
+        return res
+
+    def snapshot(self) -> Snapshot:
+        """局面を 1 手 1 バイトの手順として保存する"""
+
+        return Snapshot(
+            moves=bytes(PASS_INDEX if move is NONE_MOVE
+                        else move.x * WIDTH + move.y
+                        for move in self._score_sheet),
+            finished=self._finished,
+            winner=self._winner,
+            reason=self._reason)
+
+    def restore(self, snapshot: Snapshot) -> NoReturn:
+        """snapshot の局面に戻す
+
+        今の手順と共通する手までは pop で戻し、残りの手だけを打ち直す。
+        """
+
+        moves = snapshot.moves
+        common = 0
+        for move, index in zip(self._score_sheet, moves):
+            if index != (PASS_INDEX if move is NONE_MOVE
+                         else move.x * WIDTH + move.y):
+                break
+            common += 1
+
+        while self.turn > common:
+            self.pop()
+        self._finished, self._winner = False, None
+        self._reason = EndReason.NONE
+
+        for index in moves[common:]:
+            if index == PASS_INDEX:
+                self.pass_turn()
+            else:
+                self.add_move(index)
+        self._finished, self._winner = snapshot.finished, snapshot.winner
+        self._reason = snapshot.reason
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Snapshot) -> 'Renju':
+        """snapshot の局面を新しく作る"""
+
+        res = cls()
+        res.restore(snapshot)
+        return res
+
+    def __reduce__(self):
+        # ワーカープロセスへは手順だけを送り、向こうで打ち直す
+        return (_from_snapshot_bytes, (type(self), self.snapshot().to_bytes()))
+
+    @property
+    def hash_key(self) -> int:
+        """局面の 64 bit Zobrist ハッシュ。石の配置と手番から決まる。"""
+
+        return self._hash_key
+
+    def increment_turn(self) -> NoReturn:
+        super().increment_turn()
+
+        self._hash_key ^= ZOBRIST_SIDE
+
+    @property
+    def stone_key(self) -> int:
+        """手番を除いた、石の配置だけの Zobrist ハッシュ"""
+
+        if self._putter is PlayerType.SECOND:
+            return self._hash_key ^ ZOBRIST_SIDE
+        return self._hash_key
+
+    def _symmetry_keys(self) -> Tuple[int, ...]:
+        """今の手数の、対称変換ごとのハッシュ。前回から増えた手だけ足す"""
+
+        stack = self._symmetry_stack
+        score_sheet = self._score_sheet
+        for move in score_sheet[len(stack) - 1:]:
+            keys = stack[-1]
+            if move is not NONE_MOVE:
+                keys = tuple(map(int.__xor__, keys, SYMMETRY_KEYS[
+                    move.player][move.x * WIDTH + move.y]))
+            stack.append(tuple(key ^ ZOBRIST_SIDE for key in keys))
+        return stack[-1]
+
+    def canonical(self) -> Tuple[int, int]:
+        """対称な局面で共通になるハッシュと、そのときの対称変換
+
+        盤の中央を中心とする 8 通りの対称変換で写した局面のハッシュのうち、
+        最小のものを返す。置換表などに手を書くときは canonical_move で写し、
+        読むときは transform_point(point, INVERSE_SYMMETRIES[symmetry]) で
+        戻す。ハッシュは手順（add_move・pop）
+        に合わせて 1 手ずつ差分で求めるので、put_stone で仮に置いた石は含まない。
+
+        Returns:
+            Tuple[int, int]: (ハッシュ, 対称変換の番号)
+        """
+
+        keys = self._symmetry_keys()
+        key = min(keys)
+        return key, keys.index(key)
+
+    @property
+    def canonical_key(self) -> int:
+        """canonical のハッシュ"""
+
+        return min(self._symmetry_keys())
+
+    def canonical_symmetries(self) -> List[int]:
+        """canonical のハッシュになる対称変換すべて。局面が対称なら複数ある"""
+
+        keys = self._symmetry_keys()
+        key = min(keys)
+        return [t for t, k in enumerate(keys) if k == key]
+
+    def canonical_move(self, point: Tuple[int, int]) -> Tuple[int, int]:
+        """point を canonical の局面に写した手
+
+        局面と手の組で canonical にする。局面が対称なときは、canonical の
+        ハッシュになるどの変換で写しても同じ局面になるので、写した手のうち
+        マス番号が最小のものを選ぶ。こうすると対称な局面での同等な手は同じ
+        手になる。canonical の symmetry の逆変換で戻すと、point か、局面の
+        対称性で point と同等な手になる。
+        """
+
+        index = square_index(*point)
+        return SQUARES[min(SYMMETRIES[t][index]
+                           for t in self.canonical_symmetries())]
+
+    def put_stone(self, x: int, y: int, player: PlayerType) -> NoReturn:
+        super().put_stone(x, y, player)
+
+        self._hash_key ^= ZOBRIST_KEYS[(x, y)][player]
+
+    def remove_stone(self, x: int, y: int) -> NoReturn:
+        square = self.board[x][y]
+        if square is SquareType.FIRST:
+            self._hash_key ^= ZOBRIST_KEYS[(x, y)][PlayerType.FIRST]
+        elif square is SquareType.SECOND:
+            self._hash_key ^= ZOBRIST_KEYS[(x, y)][PlayerType.SECOND]
+
+        super().remove_stone(x, y)
+
+    def _stone_placed(self, x: int, y: int) -> NoReturn:
+        """着手後に合法手の集合を更新する"""
+
+        self._vacant.discard((x, y))
+        self._forbidden.discard((x, y))
+        self._volatile.discard((x, y))
+        self._dirty.update(LINE_NEIGHBORS[(x, y)])
+        self._dirty.update(self._volatile)
+
+    def _stone_removed(self, x: int, y: int) -> NoReturn:
+        """一手戻した後に合法手の集合を更新する"""
+
+        self._vacant.add((x, y))
+        self._dirty.add((x, y))
+        self._dirty.update(LINE_NEIGHBORS[(x, y)])
+        self._dirty.update(self._volatile)
+
+    def _update_forbidden(self, point: Tuple[int, int],
+                          move: Optional[Move] = None) -> NoReturn:
+        if move is None:
+            move = compact_move(*point, PlayerType.FIRST)
+
+        self._dirty.discard(point)
+        # 三三候補でなくなったマスは外す。候補のままなら is_forbidden が戻す
+        self._volatile.discard(point)
+        if self.is_forbidden(move):
+            self._forbidden.add(point)
+        else:
+            self._forbidden.discard(point)
+
+    def _refresh_forbidden(self) -> NoReturn:
+        """周辺で石が動いたマスの禁手判定をやり直す"""
+
+        for point in self._dirty & self._vacant:
+            self._update_forbidden(point)
+        self._dirty.clear()
+
+    def legal_moves(self) -> List[Tuple[int, int]]:
+        """次に置くプレイヤーの合法手をすべて返す（順不同）"""
+
+        if self.turn == 0:
+            return [FIRST_MOVE.point]
+
+        if self.putter is PlayerType.SECOND:
+            return list(self._vacant)
+
+        self._refresh_forbidden()
+        return list(self._vacant - self._forbidden)
+
     def pop(self) -> NoReturn:
         """一手戻す"""
 
@@ -221,19 +710,20 @@ class Renju(Board):
 
         move = self._score_sheet[-1]
 
-        x, y = move.point
-        self.board[x][y] = SquareType.VACANT
+        # パスは石を取り除かない
+        if move is not NONE_MOVE:
+            x, y = move.point
+            self.remove_stone(x, y)
+            self._stone_removed(x, y)
         self._score_sheet.pop()
         self.decrement_turn()
+        del self._symmetry_stack[self.turn + 1:]
 
         self._finished, self._winner = False, None
+        self._reason = EndReason.NONE
 
-    def add_move(self, move: Move) -> NoReturn:
-        if not isinstance(move, Move):
-            move = Move(*move)
-
-        if move.player is None:
-            move.player = self.putter
+    def add_move(self, move: MoveLike) -> NoReturn:
+        move = self._to_move(move)
 
         if self.finished:
             raise ValueError(f"game is already finished")
@@ -242,32 +732,57 @@ class Renju(Board):
         if not self.is_legal_move(move):
             self._finished = True
             self._winner = get_opposite(self.putter)
+            self._reason = EndReason.FORBIDDEN
             raise IllegalMove
 
         super().add_move(move)
+        self._stone_placed(*move.point)
 
-        # 勝利判定
-        res = self.renzoku(move)
-        if max(res) >= 5:
+        # 勝利判定（白の長連は勝ち、黒の長連は禁手で弾かれている）
+        if PatternType.FIVE in self.patterns(move):
             self._finished = True
             self._winner = move.player
+            self._reason = EndReason.FIVE
 
-    def is_legal_move(self, move: Move) -> bool:
-        """その位置に置くことができるとき True
+    def load(self, moves: Iterable[MoveLike]) -> NoReturn:
+        """検証済みの手順を、合法判定と勝利判定なしで並べる
 
-        Todo: 黒の禁手処理の実装
+        石は put_stone で直接置き、終局・勝者は最後の手だけで判定する。黒の
+        禁手点は石の周辺を判定のやり直し対象にしておき、必要になったときに
+        求める。禁手や途中の五を含む手順を渡したときの結果は不定。
         """
 
-        if not isinstance(move, Move):
-            move = Move(*move)
+        if self.finished:
+            raise ValueError(f"game is already finished")
 
-        if move.player is None:
-            move.player = self.putter
+        score_sheet = self._score_sheet
+        last = None
+        for move in moves:
+            last = self._to_move(move)
+            x, y = last.point
+            self.put_stone(x, y, last.player)
+            score_sheet.append(last)
+            self.increment_turn()
+
+            self._vacant.discard((x, y))
+            self._forbidden.discard((x, y))
+            self._volatile.discard((x, y))
+            self._dirty.update(LINE_NEIGHBORS[(x, y)])
+
+        if last is None:
+            return
+        self._dirty.update(self._volatile)
+
+        if PatternType.FIVE in self.patterns(last):
+            self._finished = True
+            self._winner = last.player
+            self._reason = EndReason.FIVE
 
-        (x, y), player = move.point, move.player
+    def is_legal_move(self, move: MoveLike) -> bool:
+        """その位置に置くことができるとき True"""
 
-        if player is None:
-            player = self.putter
+        move = self._to_move(move)
+        (x, y), player = move.point, move.player
 
         # 初手は中央のみ
         if self.turn == 0 and move != FIRST_MOVE:
@@ -281,70 +796,157 @@ class Renju(Board):
         if player is PlayerType.SECOND:
             return True
 
-        # 黒の禁手処理
-        if self.shishi(move):  # 四四
-            return False
+        # 周辺に変化がなければ前回の判定を使う
+        point = (x, y)
+        if point in self._dirty:
+            self._update_forbidden(point, move)
+
+        return point not in self._forbidden
+
+    def is_forbidden(self, move: Move) -> bool:
+        """黒がその位置に置いたとき禁手になるとき True
 
-        res = self.renzoku(move)
-        if res.count(3) > 1:  # 三三
+        五ができる場合は他の形に関わらず禁手にならない。三三は、三を活四に
+        する点のうち少なくとも 1 つが禁手でない三（本当の三）だけを数える。
+        """
+
+        patterns = self.patterns(move)
+        if PatternType.FIVE in patterns:
             return False
-        if max(res) > 5:  # 長連
+        if PatternType.OVERLINE in patterns:  # 長連
+            return True
+        if sum(FOUR_COUNT.get(p, 0) for p in patterns) >= 2:  # 四四
+            return True
+
+        threes = [d for d, p in enumerate(patterns)
+                  if p == PatternType.OPEN_THREE]
+        if len(threes) < 2:
             return False
 
-        return True
+        # 三三候補: 結果は遠くの石にも左右されるので毎回やり直す対象にする
+        point = move.point
+        if not self._probing:
+            self._volatile.add(point)
 
-    def renzoku(self, move: Move) -> bool:
-        """move に置いたときにできる連続を見つける"""
+        key = (self.stone_key, point)
+        if key not in _forbidden_memo:
+            if len(_forbidden_memo) >= FORBIDDEN_MEMO_SIZE:
+                _forbidden_memo.clear()
+            _forbidden_memo[key] = self._count_real_threes(move, threes) >= 2
+        return _forbidden_memo[key]
 
-        res = []
-        directions = [(0, 1), (-1, 1), (-1, 0), (-1, -1)]
-        for (dx, dy) in directions:
-            my_type = to_square_type(move.player)
-            count = 1
+    def probe_forbidden(self, move: Move) -> bool:
+        """put_stone で仮に石を置いた局面で、黒の禁手を調べる
 
-            x, y = move.x, move.y
-            while True:
-                x += dx
-                y += dy
+        判定は is_forbidden と同じだが、合法手のキャッシュには何も残さない。
+        """
 
-                # 盤外
-                if x < 0 or y < 0 or x >= HEIGHT or y >= WIDTH:
-                    break
+        self._probing += 1
+        try:
+            return self.is_forbidden(move)
+        finally:
+            self._probing -= 1
 
-                if self.board[x][y] is my_type:
-                    count += 1
-                else:
-                    break
+    def _count_real_threes(self, move: Move, directions: List[int]) -> int:
+        """move を置いた局面で、活四にする点が禁手でない三を数える"""
 
-            x, y = move.x, move.y
-            while True:
-                x -= dx
-                y -= dy
+        x, y = move.point
+        codes = self.line_codes(move)
+
+        black = MOVE_POOL[PlayerType.FIRST]
+        count = 0
+        self.put_stone(x, y, PlayerType.FIRST)
+        self._probing += 1
+        try:
+            for d in directions:
+                dx, dy = LINE_DIRECTIONS[d]
+                for k in WINDOW_OFFSETS[BLACK_THREE_POINTS[codes[d]]]:
+                    four = black[(x + dx * k) * WIDTH + y + dy * k]
+                    if not self.is_forbidden(four):
+                        count += 1
+                        break
+        finally:
+            self._probing -= 1
+            self.remove_stone(x, y)
+
+        return count
+
+    def line_codes(self, move: Move) -> List[int]:
+        """move を中心とした 4 方向のライン窓を pattern の表の添字にする
+
+        move の位置は move.player の石として扱い、盤外は相手の石と同じに扱う。
+        """
 
-                # 盤外
-                if x < 0 or y < 0 or x >= HEIGHT or y >= WIDTH:
-                    break
+        board = self.board
+        mine = to_square_type(move.player)
 
-                if self.board[x][y] is my_type:
-                    count += 1
-                else:
-                    break
+        res = []
+        for cells in WINDOW_CELLS[(move.x, move.y)]:
+            code = WINDOW_CENTER_CODE
+            for (x, y, weight) in cells:
+                if x is None:
+                    code += weight * BLOCKED
+                    continue
+                square = board[x][y]
+                if square is mine:
+                    code += weight * MINE
+                elif square is not SquareType.VACANT:
+                    code += weight * BLOCKED
+            res.append(code)
+        return res
 
-            res.append(count)
+    def patterns(self, move: Move) -> List[PatternType]:
+        """move に置いたときにできる形（方向ごと、PatternType の値）"""
 
+        table = BLACK_TABLE if move.player is PlayerType.FIRST else WHITE_TABLE
+        return [table[code] for code in self.line_codes(move)]
+
+    def _window_points(self, move: Move, tables: Tuple[list, list]
+                       ) -> List[Tuple[int, int]]:
+        table = tables[0] if move.player is PlayerType.FIRST else tables[1]
+        x, y = move.point
+
+        res = []
+        for (dx, dy), code in zip(LINE_DIRECTIONS, self.line_codes(move)):
+            mask = table[code]
+            if mask:
+                res.extend((x + dx * k, y + dy * k)
+                           for k in WINDOW_OFFSETS[mask])
         return res
 
-    def shishi(self, move: Move) -> bool:
-        """四四のチェック"""
+    def five_points(self, move: Move) -> List[Tuple[int, int]]:
+        """move に置いたとき、次の一手で五になる点（四の止め所）"""
+
+        return self._window_points(
+            move, (BLACK_FOUR_POINTS, WHITE_FOUR_POINTS))
+
+    def straight_four_points(self, move: Move) -> List[Tuple[int, int]]:
+        """move に置いたとき、次の一手で活四になる点（三の止め所の一部）"""
+
+        return self._window_points(
+            move, (BLACK_THREE_POINTS, WHITE_THREE_POINTS))
+
+    def fours(self, move: Move) -> List[int]:
+        """move に置いたときにできる四の数（方向ごと）"""
+
+        return [FOUR_COUNT.get(p, 0) for p in self.patterns(move)]
+
+    def threes(self, move: Move) -> List[bool]:
+        """move に置いたときに三ができるとき True（方向ごと）"""
 
+        return [p == PatternType.OPEN_THREE for p in self.patterns(move)]
+
+    def renzoku(self, move: MoveLike) -> List[int]:
+        """move に置いたときにできる連続を見つける"""
+
+        move = self._to_move(move)
         res = []
-        directions = [(0, 1), (-1, 1), (-1, 0), (-1, -1),
-                      (0, -1), (1, -1), (1, 0), (1, 1)]
+        directions = [(0, 1), (-1, 1), (-1, 0), (-1, -1)]
         for (dx, dy) in directions:
             my_type = to_square_type(move.player)
             count = 1
 
-            x, y, skip = move.x, move.y, False
+            x, y = move.x, move.y
             while True:
                 x += dx
                 y += dy
@@ -355,8 +957,6 @@ class Renju(Board):
 
                 if self.board[x][y] is my_type:
                     count += 1
-                if not skip and self.board[x][y] is SquareType.VACANT:
-                    skip = True
                 else:
                     break
 
@@ -376,7 +976,13 @@ class Renju(Board):
 
             res.append(count)
 
-        return res.count(4) >= 2
+        return res
+
+    def shishi(self, move: MoveLike) -> bool:
+        """四四のチェック"""
+
+        move = self._to_move(move)
+        return sum(self.fours(move)) >= 2
 
     @property
     def finished(self) -> bool:
@@ -390,6 +996,21 @@ class Renju(Board):
 
         return self._winner
 
+    @property
+    def reason(self) -> EndReason:
+        """終局の理由。終局していないとき EndReason.NONE"""
+
+        return self._reason
+
+    def declare_result(self, winner: Optional[PlayerType],
+                       reason: EndReason) -> NoReturn:
+        """結果を記録して終局させる
+
+        時間切れ・ソルバのエラー・引き分けなど、盤上で決まらない結果に使う。
+        """
+
+        self._finished, self._winner, self._reason = True, winner, reason
+
     def print_ascii(self) -> NoReturn:
         for row in self.board:
             for col in row:
@@ -405,5 +1026,30 @@ class Renju(Board):
             print(f'GAME IS FINISHED: WINNER = {self.winner}')
 
 
+def _from_snapshot_bytes(cls: type, data: bytes) -> Renju:
+    return cls.from_snapshot(Snapshot.from_bytes(data))
+
+
+class EngineType(Enum):
+    """盤面エンジンの種類
+
+    Attributes:
+        LIST: 二次元リストで盤面を持つ（デフォルト）
+        BITBOARD: 色ごとのビットボードで盤面を持つ
+    """
+
+    LIST = auto()
+    BITBOARD = auto()
+
+
+def create_renju(engine: EngineType = EngineType.LIST) -> Renju:
+    """エンジンを指定して Renju を作る"""
+
+    if engine is EngineType.BITBOARD:
+        from bitboard import BitboardRenju
+        return BitboardRenju()
+    return Renju()
+
+
 if __name__ == '__main__':
     pass
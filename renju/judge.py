@@ -0,0 +1,353 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+import asyncio
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import List, NamedTuple, NoReturn, Optional
+
+from game import (IllegalMove, Renju, Move, PlayerType, EndReason,
+                  get_opposite)
+from protocol import (PERSISTENT_FLAG, BEGIN, END, READY, ProtocolError,
+                      format_move, parse_move)
+from sheet import ScoreSheetWriter
+from tournament import GameResult, summarize
+
+# 常駐ソルバが end を受けてから終了するまで待つ時間（秒）
+CLOSE_TIMEOUT = 5.0
+
+# 常駐ソルバが起動してから ready を返すまで待つ時間（秒）。手の持ち時間とは別
+STARTUP_TIMEOUT = 60.0
+
+# 同時に打つ対局数のデフォルト
+CONCURRENCY = 64
+
+
+class MoveTimeout(Exception):
+    """ソルバが持ち時間内に手を返さなかった"""
+
+    pass
+
+
+class GameOutcome(NamedTuple):
+    """1 局の結果
+
+    Attributes:
+        renju(Renju): 終局面
+        winner(Optional[PlayerType]): 勝者。引き分けのとき None
+        forbidden(bool): 禁手で決着したとき True
+        error(bool): ソルバが手を返さなかったとき True
+        timeout(bool): 持ち時間切れで決着したとき True
+    """
+
+    renju: Renju
+    winner: Optional[PlayerType]
+    forbidden: bool
+    error: bool
+    timeout: bool
+
+
+async def _wait(awaitable, timeout: Optional[float]):
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise MoveTimeout
+
+
+class AsyncSolverProcess:
+    """対局中ずっと起動しておくソルバプロセス（asyncio 版）
+
+    行プロトコルは protocol.SolverProcess と同じ。start で起動し、ready を
+    受けてから返すので、起動にかかった時間は手の持ち時間に入らない。
+
+    Args:
+        process(asyncio.subprocess.Process): PERSISTENT_FLAG を付けて起動した
+            ソルバ
+    """
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self._process = process
+        self._killed = False
+
+    @classmethod
+    async def start(cls, command: str,
+                    timeout: Optional[float] = STARTUP_TIMEOUT
+                    ) -> 'AsyncSolverProcess':
+        """ソルバを起動し、ready を受けるまで待つ
+
+        timeout 秒以内に ready が来なければ MoveTimeout、ready 以外が来たら
+        ProtocolError を投げる。どちらのときもプロセスは止める。
+        """
+
+        process = await asyncio.create_subprocess_exec(
+            *command.split(), PERSISTENT_FLAG,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE)
+        solver = cls(process)
+        try:
+            line = await _wait(process.stdout.readline(), timeout)
+            if line.decode().strip() != READY:
+                raise ProtocolError(f'solver did not get ready: {line!r}')
+        except BaseException:
+            # 取り消されたときも含め、準備できなかったソルバは止める
+            solver.kill()
+            await process.wait()
+            raise
+        return solver
+
+    async def _send(self, line: str) -> NoReturn:
+        self._process.stdin.write((line + '\n').encode())
+        await self._process.stdin.drain()
+
+    async def request(self, last_move: Optional[Move],
+                      timeout: Optional[float] = None) -> Move:
+        """相手の直前の手を送り、ソルバの手を受け取る
+
+        Args:
+            last_move(Optional[Move]): 相手の直前の手。ソルバが初手のとき None
+            timeout(Optional[float]): 持ち時間（秒）。超えるとソルバを止めて
+                MoveTimeout を投げる
+        """
+
+        await self._send(BEGIN if last_move is None
+                         else format_move(last_move.point))
+
+        try:
+            line = await _wait(self._process.stdout.readline(), timeout)
+        except MoveTimeout:
+            # 応答しないソルバは end を待たずに止める
+            self.kill()
+            raise
+        if not line:
+            raise ProtocolError('solver exited without a move')
+        return Move(*parse_move(line.decode()))
+
+    def kill(self) -> NoReturn:
+        """end を送らずにプロセスを止める"""
+
+        self._killed = True
+        if self._process.returncode is None:
+            try:
+                self._process.kill()
+            except ProcessLookupError:
+                pass
+
+    async def close(self) -> NoReturn:
+        """対局終了を伝えてプロセスを終了させる
+
+        kill したプロセスには end を送らず、終了を待つだけにする。
+        """
+
+        process = self._process
+        if process.returncode is None and not self._killed:
+            try:
+                await self._send(END)
+                process.stdin.close()
+            except OSError:
+                pass
+        try:
+            await asyncio.wait_for(process.wait(), CLOSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.kill()
+            await process.wait()
+
+
+async def request_oneshot(command: str, score_sheet: Path,
+                          timeout: Optional[float] = None) -> Move:
+    """ソルバを 1 手だけ起動し、スコアシートを渡して手を受け取る
+
+    持ち時間を超えたときはソルバを止めて MoveTimeout を投げる。
+    """
+
+    process = await asyncio.create_subprocess_exec(
+        *command.split(), str(score_sheet),
+        stdout=asyncio.subprocess.PIPE)
+    try:
+        stdout, _ = await _wait(process.communicate(), timeout)
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+    return Move(*parse_move(stdout.decode()))
+
+
+def _limit(move_time: Optional[float],
+           clock: Optional[float]) -> Optional[float]:
+    """この手の持ち時間。1 手の上限と残りの持ち時間の短い方"""
+
+    if clock is None:
+        return move_time
+    clock = max(clock, 0.0)
+    return clock if move_time is None else min(move_time, clock)
+
+
+async def play_game(*, first: str, second: str, score_sheet: Path,
+                    persistent: bool = True,
+                    move_time: Optional[float] = None,
+                    game_time: Optional[float] = None,
+                    incremental: bool = True) -> GameOutcome:
+    """画面表示なしで 1 局打つ
+
+    持ち時間を超えた手は、禁手と同じく手番側の負けにする。ソルバが起動
+    できない・途中で終了したなど、手を返さなかったときも手番側の負けにする。
+    結果と終局の理由はスコアシートの終局の行に残す。
+
+    Args:
+        first(str): 先手のソルバの実行コマンド
+        second(str): 後手のソルバの実行コマンド
+        score_sheet(Path): スコアシートの出力先
+        persistent(bool): ソルバを対局中常駐させるとき True
+        move_time(Optional[float]): 1 手の持ち時間（秒）。None なら無制限
+        game_time(Optional[float]): 1 局を通した各ソルバの持ち時間（秒）。
+            None なら無制限
+        incremental(bool): スコアシートを追記形式で書く。False なら毎手
+            CSV 形式で書き直す（CSV 形式しか読めない一発起動のソルバ用）
+    """
+
+    commands = {PlayerType.FIRST: first, PlayerType.SECOND: second}
+    clocks = {player: game_time for player in commands}
+    loop = asyncio.get_running_loop()
+
+    renju = Renju()
+    writer = ScoreSheetWriter(score_sheet, incremental=incremental)
+
+    solvers = {}
+    try:
+        if persistent:
+            for player, command in commands.items():
+                try:
+                    solvers[player] = await AsyncSolverProcess.start(command)
+                except (OSError, ProtocolError, MoveTimeout):
+                    # 起動できなかった・準備ができなかった側の負け
+                    renju.declare_result(get_opposite(player),
+                                         EndReason.ERROR)
+                    break
+
+        while not renju.finished:
+            # 置ける場所がなければ引き分け
+            if not renju.legal_moves():
+                renju.declare_result(None, EndReason.DRAW)
+                break
+
+            putter = renju.putter
+            limit = _limit(move_time, clocks[putter])
+            start = loop.time()
+            try:
+                if persistent:
+                    last_move = renju.score_sheet[-1] if renju.turn > 0 \
+                        else None
+                    move = await solvers[putter].request(last_move, limit)
+                else:
+                    move = await request_oneshot(commands[putter],
+                                                 score_sheet, limit)
+                renju.add_move(move)
+            except IllegalMove:
+                # 禁手を打った側の負けで終局している
+                pass
+            except MoveTimeout:
+                renju.declare_result(get_opposite(putter), EndReason.TIMEOUT)
+            except (ProtocolError, ValueError, TypeError, IndexError,
+                    OSError):
+                # OSError: 起動できない、途中で終了して書き込めないなど
+                renju.declare_result(get_opposite(putter), EndReason.ERROR)
+            finally:
+                if clocks[putter] is not None:
+                    clocks[putter] -= loop.time() - start
+
+            if not persistent:
+                writer.append(renju)
+    except asyncio.CancelledError:
+        # 取り消されたときは end を待たずに止める
+        for solver in solvers.values():
+            solver.kill()
+        raise
+    finally:
+        await asyncio.gather(*(solver.close()
+                               for solver in solvers.values()))
+        writer.append(renju)
+        writer.close()
+
+    reason = renju.reason
+    return GameOutcome(renju=renju, winner=renju.winner,
+                       forbidden=reason is EndReason.FORBIDDEN,
+                       error=reason is EndReason.ERROR,
+                       timeout=reason is EndReason.TIMEOUT)
+
+
+async def _play(index: int, semaphore: asyncio.Semaphore, *, solver_a: str,
+                solver_b: str, out: Path, persistent: bool,
+                move_time: Optional[float], game_time: Optional[float],
+                incremental: bool) -> GameResult:
+    # 偶数局は A が先手、奇数局は B が先手
+    if index % 2 == 0:
+        black, first, second = 'A', solver_a, solver_b
+    else:
+        black, first, second = 'B', solver_b, solver_a
+
+    async with semaphore:
+        outcome = await play_game(
+            first=first, second=second,
+            score_sheet=out / f'game_{index:05d}.txt',
+            persistent=persistent, move_time=move_time, game_time=game_time,
+            incremental=incremental)
+
+    return GameResult(index=index, black=black, winner=outcome.winner,
+                      forbidden=outcome.forbidden, error=outcome.error,
+                      turns=outcome.renju.turn, timeout=outcome.timeout)
+
+
+async def run_games(*, solver_a: str, solver_b: str, games: int, out: Path,
+                    concurrency: int = CONCURRENCY, persistent: bool = True,
+                    move_time: Optional[float] = None,
+                    game_time: Optional[float] = None,
+                    incremental: bool = True) -> List[GameResult]:
+    """ソルバ A・B を games 局、1 プロセスの中で concurrency 局ずつ並行に打つ"""
+
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*(
+        _play(index, semaphore, solver_a=solver_a, solver_b=solver_b,
+              out=out, persistent=persistent, move_time=move_time,
+              game_time=game_time, incremental=incremental)
+        for index in range(games)))
+
+
+def main() -> NoReturn:
+    parser = ArgumentParser(
+        description='持ち時間つきで、ソルバ同士の対局を 1 プロセスで並行に打つ')
+    parser.add_argument('solver_a')
+    parser.add_argument('solver_b')
+    parser.add_argument('-n', '--games', type=int, default=100)
+    parser.add_argument('-c', '--concurrency', type=int, default=CONCURRENCY,
+                        help='同時に打つ対局数')
+    parser.add_argument('-m', '--move-time', type=float,
+                        help='1 手の持ち時間（秒）。超えると負け')
+    parser.add_argument('-g', '--game-time', type=float,
+                        help='1 局を通した各ソルバの持ち時間（秒）。超えると負け')
+    parser.add_argument('-o', '--out', default='./games',
+                        help='スコアシートの出力先ディレクトリ')
+    parser.add_argument('--oneshot', action='store_true',
+                        help='ソルバを毎手起動する（常駐プロトコル非対応のソルバ用）')
+    parser.add_argument('--csv', action='store_true',
+                        help='スコアシートを毎手 CSV 形式で書き直す'
+                             '（CSV 形式しか読めない一発起動のソルバ用）')
+    args = parser.parse_args()
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    results = asyncio.run(run_games(
+        solver_a=args.solver_a, solver_b=args.solver_b, games=args.games,
+        out=out, concurrency=args.concurrency, persistent=not args.oneshot,
+        move_time=args.move_time, game_time=args.game_time,
+        incremental=not args.csv))
+    elapsed = time.perf_counter() - start
+
+    print(summarize(sorted(results), elapsed, timeouts=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,25 +2,68 @@ import sys
 import pathlib
 sys.path.append(pathlib.Path(__file__).parent.__str__())
 
-import subprocess
+import time
 from argparse import ArgumentParser
-from typing import NoReturn
+from typing import NoReturn, Optional
 from pathlib import Path
 from logging import getLogger, basicConfig, DEBUG
 
-from game import IllegalMove, Renju, Move
-from prompt import prompt, visualize
-from sheet import dump_csv
+from game import IllegalMove, Renju, Move, PlayerType
+from prompt import Viewer, prompt, visualize
+from metrics import (MetricsWriter, Usage, process_usage, run_solver,
+                     sidecar_path)
+from protocol import SolverProcess
+from replay import replay
+from sheet import ScoreSheetWriter
 
 logger = getLogger(__name__)
 
 
-def run(*, renju: Renju, command: str, score_sheet: Path) -> NoReturn:
+def request_move(*, renju: Renju, command: str, score_sheet: Path,
+                 solver: Optional[SolverProcess] = None,
+                 metrics: Optional[MetricsWriter] = None) -> Move:
+    """ソルバに次の手を聞く
+
+    solver が渡されたときは常駐ソルバに相手の直前の手だけを送る。
+    そうでなければ毎手ソルバを起動し、スコアシートを渡す。metrics が
+    渡されたときは、経過時間・CPU 時間・最大常駐メモリを書き出す。
+    """
+
+    player = renju.putter
+
+    if solver is not None:
+        last_move = renju.score_sheet[-1] if renju.turn > 0 else None
+        before = process_usage(solver.pid)
+        start = time.perf_counter()
+        move = solver.request(last_move)
+        wall = time.perf_counter() - start
+        after = process_usage(solver.pid)
+        usage = Usage(wall=wall, cpu=None, max_rss=None)
+        if before is not None and after is not None:
+            usage = Usage(wall=wall, cpu=after[0] - before[0],
+                          max_rss=after[1])
+    else:
+        stdout, usage = run_solver(command.split() + [str(score_sheet)])
+        move = Move(*map(int, stdout.split()))
+
+    if metrics is not None:
+        metrics.append(turn=renju.turn + 1, player=player, solver=command,
+                       usage=usage)
+    return move
+
+
+def run(*, renju: Renju, command: str, score_sheet: Path,
+        solver: Optional[SolverProcess] = None,
+        metrics: Optional[MetricsWriter] = None,
+        viewer: Optional[Viewer] = None) -> NoReturn:
     try:
-        process = subprocess.run(command.split() + [str(score_sheet)],
-                                 capture_output=True)
-        move = Move(*map(int, process.stdout.split()))
-        visualize(renju=renju)
+        move = request_move(renju=renju, command=command,
+                            score_sheet=score_sheet, solver=solver,
+                            metrics=metrics)
+        if viewer is None:
+            visualize(renju=renju)
+        else:
+            viewer.update()
         renju.add_move(move)
     except IllegalMove:
         return
@@ -28,9 +71,9 @@ def run(*, renju: Renju, command: str, score_sheet: Path) -> NoReturn:
         raise
 
 
-def human_run(renju: Renju) -> NoReturn:
+def human_run(renju: Renju, viewer: Optional[Viewer] = None) -> NoReturn:
     try:
-        move = prompt(renju)
+        move = prompt(renju) if viewer is None else viewer.select()
         renju.add_move(move)
     except IllegalMove:
         return
@@ -43,44 +86,79 @@ def main() -> NoReturn:
     parser.add_argument('-f', '--first', default=None)
     parser.add_argument('-s', '--second', default=None)
     parser.add_argument('-o', '--out', default='./score_sheet.txt')
+    parser.add_argument('-p', '--persistent', action='store_true',
+                        help='ソルバを対局中常駐させ、相手の手だけを標準入出力で渡す')
+    parser.add_argument('--incremental', action='store_true',
+                        help='スコアシートを追記形式（1 行 1 手）で書く')
+    parser.add_argument('-r', '--replay', metavar='SCORE_SHEET',
+                        help='対局せず、スコアシートの対局を再生する')
+    parser.add_argument('--speed', type=int, default=500,
+                        help='1 手を表示しておく時間（ミリ秒）')
+    parser.add_argument('--ply', type=int,
+                        help='再生で最初に表示する手数（省くと終局面）')
     args = parser.parse_args()
 
+    if args.replay is not None:
+        replay(args.replay, wait_militime=args.speed, ply=args.ply)
+        return
+
 #    basicConfig(level=DEBUG)
 
-    # スコアシート
+    # スコアシート（1 手ごとに書く）
     score_sheet = Path(args.out)
-    score_sheet.unlink(missing_ok=True)
-    score_sheet.touch(exist_ok=True)
-
-    with open(score_sheet, 'w', newline='') as f:
-        f.write('0')
+    writer = ScoreSheetWriter(score_sheet, incremental=args.incremental)
+    # ソルバを呼ぶたびの資源使用量（スコアシートの隣に書く）。人間同士の
+    # 対局では書かない
+    metrics = None
+    if args.first is not None or args.second is not None:
+        metrics = MetricsWriter(sidecar_path(score_sheet))
 
     renju = Renju()
+    # 盤面の表示は対局を通して 1 つの Application で行う
+    viewer = Viewer(renju, wait_militime=args.speed)
+
+    # 常駐モードでは対局開始時に一度だけソルバを起動する
+    solvers = {}
+    if args.persistent:
+        for player, command in ((PlayerType.FIRST, args.first),
+                                (PlayerType.SECOND, args.second)):
+            if command is not None:
+                solvers[player] = SolverProcess(command)
 
     def check_finished() -> NoReturn:
         if not renju.finished:
             return
         else:
-            visualize(renju=renju, enter_to_next=True)
+            for solver in solvers.values():
+                solver.close()
+            writer.close()
+            if metrics is not None:
+                metrics.close()
+            viewer.wait_enter()
+            viewer.close()
             sys.exit(0)
 
     while True:
         # 先手（黒）
         if args.first is None:
-            human_run(renju=renju)
+            human_run(renju=renju, viewer=viewer)
         else:
-            run(renju=renju, command=args.first, score_sheet=score_sheet)
+            run(renju=renju, command=args.first, score_sheet=score_sheet,
+                solver=solvers.get(PlayerType.FIRST), metrics=metrics,
+                viewer=viewer)
 
-        dump_csv(score_sheet, renju)
+        writer.append(renju)
         check_finished()
 
         # 後手（白）
         if args.second is None:
-            human_run(renju=renju)
+            human_run(renju=renju, viewer=viewer)
         else:
-            pass
+            run(renju=renju, command=args.second, score_sheet=score_sheet,
+                solver=solvers.get(PlayerType.SECOND), metrics=metrics,
+                viewer=viewer)
 
-        dump_csv(score_sheet, renju)
+        writer.append(renju)
         check_finished()
 
 
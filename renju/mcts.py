@@ -0,0 +1,394 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+import math
+import time
+from random import Random
+from typing import Dict, List, NoReturn, Optional, Tuple
+
+from constants import HEIGHT, WIDTH
+from game import (Renju, PlayerType, SquareType, MOVE_POOL, SQUARES,
+                  NONE_MOVE, FIRST_MOVE, FOUR_COUNT, get_opposite)
+from pattern import (LINE_DIRECTIONS, WINDOW_OFFSETS, PatternType,
+                     BLACK_TABLE, WHITE_TABLE,
+                     BLACK_FOUR_POINTS, WHITE_FOUR_POINTS)
+from search import NEAR
+
+# UCT の探索項の係数
+EXPLORATION = 1.4
+
+# 方向ごとの、ライン上で 1 歩進んだときのマス番号の差
+STEPS = [dx * WIDTH + dy for dx, dy in LINE_DIRECTIONS]
+
+# マス番号 -> 周辺のマス番号（木の中で読む候補手）
+NEAR_INDEX = [tuple(x * WIDTH + y for x, y in NEAR[point])
+              for point in SQUARES]
+
+# 置いた人 -> 形の表・四を五にする点の表
+TABLES = {
+    PlayerType.FIRST: (BLACK_TABLE, BLACK_FOUR_POINTS),
+    PlayerType.SECOND: (WHITE_TABLE, WHITE_FOUR_POINTS),
+}
+
+# プレイヤーごとの、打つと五になる点（マス番号）。古くなった点も含む
+WinPoints = Dict[PlayerType, List[int]]
+
+
+class Node:
+    """探索木のノード
+
+    Attributes:
+        move(Optional[int]): このノードに進む手のマス番号。根は None
+        player(PlayerType): move を打った人
+        parent(Optional[Node]): 親ノード
+        children(List[Node]): 展開済みの子
+        untried(List[int]): まだ展開していない手
+        visits(int): 訪問回数
+        wins(float): move を打った人から見た勝ち数（引き分けは 0.5）
+    """
+
+    __slots__ = ('move', 'player', 'parent', 'children', 'untried',
+                 'visits', 'wins')
+
+    def __init__(self, move: Optional[int], player: PlayerType,
+                 parent: Optional['Node'], untried: List[int]):
+        self.move = move
+        self.player = player
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+
+    def select(self, exploration: float) -> 'Node':
+        """UCT 値が最大の子"""
+
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: (
+            child.wins / child.visits +
+            exploration * math.sqrt(log_visits / child.visits)))
+
+
+class MCTSResult:
+    """探索結果
+
+    Args:
+        move(Tuple[int, int]): 最も訪問回数の多い手
+        visits(int): その手の訪問回数
+        win_rate(float): その手の勝率（手番側から見た値）
+        playouts(int): プレイアウトの回数
+        elapsed(float): 探索時間（秒）
+    """
+
+    def __init__(self, *, move: Tuple[int, int], visits: int,
+                 win_rate: float, playouts: int, elapsed: float):
+        self.move = move
+        self.visits = visits
+        self.win_rate = win_rate
+        self.playouts = playouts
+        self.elapsed = elapsed
+
+    @property
+    def playouts_per_sec(self) -> float:
+        """1 秒あたりのプレイアウト数"""
+
+        return self.playouts / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return f'MCTSResult(move={self.move}, visits={self.visits}, ' \
+            f'win_rate={self.win_rate:.3f}, playouts={self.playouts}, ' \
+            f'playouts/sec={self.playouts_per_sec:.0f})'
+
+
+class MCTS:
+    """UCT によるモンテカルロ木探索
+
+    木の中は Renju.add_move / Renju.pop で進め戻しし、候補手は石の近くの合法手に
+    限る。プレイアウトは put_stone / remove_stone だけで石を置き、五にできれば
+    打ち、相手の五は止め、それ以外は空点から一様に選ぶ。黒の禁手は選んだ点だけ
+    調べるので、1 手ごとに全マスの合法判定はしない。
+
+    Args:
+        renju(Renju): 探索する局面。探索後は元の局面に戻る
+        exploration(float): UCT の探索項の係数
+        seed(Optional[int]): 乱数のシード
+    """
+
+    def __init__(self, renju: Renju, *, exploration: float = EXPLORATION,
+                 seed: Optional[int] = None):
+        self.renju = renju
+        self.exploration = exploration
+        self.playouts = 0
+
+        self._rng = Random(seed)
+        # プレイアウト用の空点の一覧と、マス番号 -> 一覧内の位置
+        self._pool = [0] * (HEIGHT * WIDTH)
+        self._where = [0] * (HEIGHT * WIDTH)
+        self._placed = []
+
+    def _codes(self, index: int, player: PlayerType) -> Optional[List[int]]:
+        """index に player が置けるならライン窓の添字を、黒の禁手なら None"""
+
+        move = MOVE_POOL[player][index]
+        codes = self.renju.line_codes(move)
+        if player is PlayerType.SECOND:
+            return codes
+
+        fours, threes = 0, 0
+        for code in codes:
+            pattern = BLACK_TABLE[code]
+            if pattern == PatternType.FIVE:
+                return codes
+            if pattern == PatternType.OVERLINE:
+                return None
+            fours += FOUR_COUNT.get(pattern, 0)
+            threes += pattern == PatternType.OPEN_THREE
+        if fours >= 2:
+            return None
+        if threes >= 2 and self.renju.probe_forbidden(move):
+            return None
+        return codes
+
+    @staticmethod
+    def _add_win_points(points: List[int], index: int, player: PlayerType,
+                        codes: List[int]) -> NoReturn:
+        four_points = TABLES[player][1]
+        for step, code in zip(STEPS, codes):
+            mask = four_points[code]
+            if mask:
+                for k in WINDOW_OFFSETS[mask]:
+                    points.append(index + step * k)
+
+    def _win_point(self, points: List[int], player: PlayerType) -> int:
+        """points のうち今も player が打てば五になる点。なければ -1
+
+        古くなった点は points から取り除く。
+        """
+
+        board = self.renju.board
+        table = TABLES[player][0]
+        while points:
+            index = points[-1]
+            x, y = SQUARES[index]
+            if board[x][y] is SquareType.VACANT:
+                codes = self._codes(index, player)
+                if codes is not None and \
+                        any(table[code] == PatternType.FIVE
+                            for code in codes):
+                    return index
+            points.pop()
+        return -1
+
+    def win_points(self) -> WinPoints:
+        """今の局面で両者が打つと五になる点"""
+
+        res = {PlayerType.FIRST: [], PlayerType.SECOND: []}
+        for move in self.renju.score_sheet:
+            if move is NONE_MOVE:
+                continue
+            index = move.x * WIDTH + move.y
+            self._add_win_points(
+                res[move.player], index, move.player,
+                self.renju.line_codes(MOVE_POOL[move.player][index]))
+        return res
+
+    def _untried(self, wins: WinPoints) -> List[int]:
+        """今の局面で展開する手。五が打てればそれだけ、相手の五は止めるだけ
+
+        黒の禁手は展開するときに調べる。
+        """
+
+        renju = self.renju
+        if renju.finished:
+            return []
+        if renju.turn == 0:
+            return [FIRST_MOVE.x * WIDTH + FIRST_MOVE.y]
+
+        mover = renju.putter
+        index = self._win_point(wins[mover], mover)
+        if index >= 0:
+            return [index]
+        index = self._win_point(wins[get_opposite(mover)],
+                                get_opposite(mover))
+        if index >= 0 and renju.is_legal_move(index):
+            return [index]
+
+        board = renju.board
+        near = set()
+        for move in renju.score_sheet:
+            if move is not NONE_MOVE:
+                near.update(NEAR_INDEX[move.x * WIDTH + move.y])
+
+        res = [i for i in near
+               if board[i // WIDTH][i % WIDTH] is SquareType.VACANT]
+        self._rng.shuffle(res)
+        return res
+
+    def playout(self, wins: WinPoints) -> Optional[PlayerType]:
+        """今の局面から終局まで打ち、勝者を返す。引き分けは None
+
+        wins はプレイアウト中に書き換える。石は put_stone で置き、最後に
+        remove_stone で取り除くので、合法手のキャッシュには触れない。
+        """
+
+        renju = self.renju
+        board = renju.board
+        rng = self._rng
+        pool, where, placed = self._pool, self._where, self._placed
+
+        n = 0
+        for index, (x, y) in enumerate(SQUARES):
+            if board[x][y] is SquareType.VACANT:
+                pool[n] = index
+                where[index] = n
+                n += 1
+
+        mover, other = renju.putter, get_opposite(renju.putter)
+        own, theirs = wins[mover], wins[other]
+        winner = None
+        try:
+            while n:
+                # 五が打てれば勝ち
+                if own and self._win_point(own, mover) >= 0:
+                    winner = mover
+                    break
+
+                # 相手の五は止める。黒が止め所に打てなければ負け
+                index = self._win_point(theirs, other) if theirs else -1
+                if index >= 0:
+                    codes = self._codes(index, mover)
+                    if codes is None:
+                        winner = other
+                        break
+                else:
+                    # 空点から選ぶ。黒の禁手点はこの手番だけ一覧から外す
+                    skipped = 0
+                    while n:
+                        j = int(rng.random() * n)
+                        index = pool[j]
+                        codes = self._codes(index, mover)
+                        if codes is not None:
+                            break
+                        n -= 1
+                        pool[j], pool[n] = pool[n], index
+                        where[pool[j]], where[index] = j, n
+                        skipped += 1
+                    n += skipped
+                    if codes is None:
+                        break
+
+                # index を一覧から外して置く
+                j, last = where[index], pool[n - 1]
+                pool[j], where[last] = last, j
+                pool[n - 1], where[index] = index, n - 1
+                n -= 1
+
+                x, y = SQUARES[index]
+                renju.put_stone(x, y, mover)
+                placed.append(index)
+                self._add_win_points(own, index, mover, codes)
+
+                mover, other = other, mover
+                own, theirs = theirs, own
+        finally:
+            while placed:
+                index = placed.pop()
+                renju.remove_stone(*SQUARES[index])
+
+        return winner
+
+    def search(self, *, time_limit: float = 1.0,
+               max_playouts: Optional[int] = None) -> MCTSResult:
+        """持ち時間かプレイアウト回数の上限まで木を育て、最善手を返す
+
+        上限が 0 でも 1 回はプレイアウトする。
+        """
+
+        renju = self.renju
+        start = time.perf_counter()
+        deadline = start + time_limit
+
+        root_wins = self.win_points()
+        root = Node(None, get_opposite(renju.putter), None,
+                    [index for index in self._untried(root_wins)
+                     if renju.is_legal_move(index)])
+        if not root.untried:
+            raise ValueError('no legal moves')
+
+        # 手を返せるよう、上限に関わらず少なくとも 1 回はプレイアウトする
+        self.playouts = 0
+        while True:
+            self._iterate(root, root_wins)
+            self.playouts += 1
+
+            # 候補が 1 つならそれ以上読まない
+            if len(root.children) == 1 and not root.untried:
+                break
+            if time.perf_counter() >= deadline or \
+                    (max_playouts is not None and
+                     self.playouts >= max_playouts):
+                break
+
+        best = max(root.children, key=lambda child: child.visits)
+        return MCTSResult(move=SQUARES[best.move], visits=best.visits,
+                          win_rate=best.wins / best.visits,
+                          playouts=self.playouts,
+                          elapsed=time.perf_counter() - start)
+
+    def _iterate(self, root: Node, root_wins: WinPoints) -> NoReturn:
+        renju = self.renju
+        wins = {player: list(points) for player, points in root_wins.items()}
+
+        def push(index: int) -> NoReturn:
+            player = renju.putter
+            renju.add_move(index)
+            self._add_win_points(wins[player], index, player,
+                                 renju.line_codes(MOVE_POOL[player][index]))
+
+        node, depth = root, 0
+        try:
+            # 選択
+            while not node.untried and node.children:
+                node = node.select(self.exploration)
+                push(node.move)
+                depth += 1
+
+            # 展開
+            index = -1
+            while node.untried and not renju.finished:
+                index = node.untried.pop()
+                if renju.is_legal_move(index):
+                    break
+                index = -1
+            if index >= 0:
+                player = renju.putter
+                push(index)
+                depth += 1
+                node = Node(index, player, node, self._untried(wins))
+                node.parent.children.append(node)
+
+            # シミュレーション
+            if renju.finished:
+                winner = renju.winner
+            elif not node.untried and not node.children:
+                winner = None
+            else:
+                winner = self.playout(wins)
+        finally:
+            for i in range(depth):
+                renju.pop()
+
+        # 逆伝播
+        while node is not None:
+            node.visits += 1
+            if winner is None:
+                node.wins += 0.5
+            elif winner is node.player:
+                node.wins += 1.0
+            node = node.parent
+
+
+if __name__ == '__main__':
+    pass
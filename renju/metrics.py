@@ -0,0 +1,223 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+import csv
+import os
+import subprocess
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, NoReturn, Optional, Tuple
+
+from game import PlayerType
+
+# サイドカーファイル
+#
+#   スコアシートと同じディレクトリに <スコアシートの stem>.metrics.csv として
+#   置く CSV。1 行目は見出しで、以降ソルバを呼ぶたびに 1 行足す。
+SIDECAR_SUFFIX = '.metrics.csv'
+FIELDS = ('turn', 'player', 'wall_sec', 'cpu_sec', 'max_rss_kb', 'solver')
+
+# 報告する 1 手の所要時間のパーセンタイル
+PERCENTILES = (50, 95, 99)
+
+# ru_maxrss の単位。Linux は KB、macOS はバイト
+_RSS_SCALE = 1024 if sys.platform == 'darwin' else 1
+
+
+class Usage(NamedTuple):
+    """ソルバを 1 回呼んだときの資源使用量
+
+    Attributes:
+        wall(float): 経過時間（秒）
+        cpu(Optional[float]): ユーザ + システムの CPU 時間（秒）。測れないとき None
+        max_rss(Optional[int]): 最大常駐メモリ（KB）。常駐ソルバでは起動からの
+            最大値。測れないとき None
+    """
+
+    wall: float
+    cpu: Optional[float]
+    max_rss: Optional[int]
+
+
+def sidecar_path(score_sheet: Path) -> Path:
+    """スコアシートに対応するサイドカーファイルのパス"""
+
+    score_sheet = Path(score_sheet)
+    return score_sheet.with_name(score_sheet.stem + SIDECAR_SUFFIX)
+
+
+def _wait4_solver(args: List[str]) -> Tuple[bytes, Usage]:
+    # subprocess は自分で子プロセスを回収するので、posix_spawn で起動して
+    # wait4 で回収する
+    read_fd, write_fd = os.pipe()
+    try:
+        with open(os.devnull, 'wb') as devnull:
+            start = time.perf_counter()
+            pid = os.posix_spawnp(args[0], args, os.environ, file_actions=[
+                (os.POSIX_SPAWN_DUP2, write_fd, 1),
+                (os.POSIX_SPAWN_DUP2, devnull.fileno(), 2),
+            ])
+    except BaseException:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+
+    with open(read_fd, 'rb') as f:
+        stdout = f.read()
+    _, _, rusage = os.wait4(pid, 0)
+    wall = time.perf_counter() - start
+
+    return stdout, Usage(wall=wall, cpu=rusage.ru_utime + rusage.ru_stime,
+                         max_rss=rusage.ru_maxrss // _RSS_SCALE)
+
+
+def run_solver(args: List[str]) -> Tuple[bytes, Usage]:
+    """ソルバを 1 回起動して標準出力と資源使用量を返す
+
+    wait4 で子プロセスを回収し、そのプロセスだけの CPU 時間と最大常駐メモリを
+    得る。wait4 のない環境（Windows）では経過時間だけを測る。標準エラー出力は
+    捨てる。
+    """
+
+    if hasattr(os, 'wait4') and hasattr(os, 'posix_spawnp'):
+        return _wait4_solver(args)
+
+    start = time.perf_counter()
+    stdout = subprocess.run(args, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL).stdout
+    wall = time.perf_counter() - start
+    return stdout, Usage(wall=wall, cpu=None, max_rss=None)
+
+
+def process_usage(pid: int) -> Optional[Tuple[float, int]]:
+    """起動中のプロセスの (CPU 時間（秒）, 最大常駐メモリ（KB）)
+
+    /proc から読むので Linux 以外では None。
+    """
+
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # comm は空白を含みうるので、最後の ')' の後ろから数える
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f'/proc/{pid}/status') as f:
+            hwm = next((int(line.split()[1]) for line in f
+                        if line.startswith('VmHWM:')), None)
+    except (OSError, IndexError, ValueError):
+        return None
+
+    ticks = os.sysconf('SC_CLK_TCK')
+    # fields[11], fields[12] は utime, stime（stat の 14, 15 番目）
+    return (int(fields[11]) + int(fields[12])) / ticks, hwm
+
+
+class MetricsWriter:
+    """サイドカーファイルに 1 手ごとの資源使用量を書く
+
+    Args:
+        file(str): 書き出すファイル
+    """
+
+    def __init__(self, file: str):
+        self._file = open(file, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(FIELDS)
+        self._file.flush()
+
+    def append(self, *, turn: int, player: PlayerType, solver: str,
+               usage: Usage) -> NoReturn:
+        program = '1' if player is PlayerType.FIRST else '2'
+        self._writer.writerow([
+            turn, program, f'{usage.wall:.6f}',
+            '' if usage.cpu is None else f'{usage.cpu:.6f}',
+            '' if usage.max_rss is None else usage.max_rss,
+            solver])
+        self._file.flush()
+
+    def close(self) -> NoReturn:
+        self._file.close()
+
+    def __enter__(self) -> 'MetricsWriter':
+        return self
+
+    def __exit__(self, *exc) -> NoReturn:
+        self.close()
+
+
+def sidecar_files(paths: Iterable[str]) -> List[Path]:
+    """ファイルとディレクトリの一覧を、サイドカーファイルの一覧にする"""
+
+    res = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            res.extend(sorted(path.glob('*' + SIDECAR_SUFFIX)))
+        else:
+            res.append(path)
+    return res
+
+
+def _percentile(samples: List[float], p: int) -> float:
+    return samples[min(len(samples) - 1, len(samples) * p // 100)]
+
+
+def summarize(paths: Iterable[str]) -> Dict[str, dict]:
+    """ソルバごとの 1 手の所要時間のパーセンタイル・CPU 時間・最大常駐メモリ"""
+
+    walls = defaultdict(list)
+    cpus = defaultdict(list)
+    rss = defaultdict(int)
+    for file in sidecar_files(paths):
+        with open(file, newline='') as f:
+            for row in csv.DictReader(f):
+                solver = row['solver']
+                walls[solver].append(float(row['wall_sec']))
+                if row['cpu_sec']:
+                    cpus[solver].append(float(row['cpu_sec']))
+                if row['max_rss_kb']:
+                    rss[solver] = max(rss[solver], int(row['max_rss_kb']))
+
+    res = {}
+    for solver, samples in walls.items():
+        samples.sort()
+        report = {'moves': len(samples)}
+        for p in PERCENTILES:
+            report[f'p{p}_ms'] = _percentile(samples, p) * 1e3
+        report['max_ms'] = samples[-1] * 1e3
+        if cpus[solver]:
+            report['cpu_mean_ms'] = sum(cpus[solver]) / len(cpus[solver]) * 1e3
+        if rss[solver]:
+            report['max_rss_kb'] = rss[solver]
+        res[solver] = report
+    return res
+
+
+def format_summary(summary: Dict[str, dict]) -> str:
+    lines = []
+    for solver, report in summary.items():
+        lines.append(solver)
+        lines.append(f'  moves       : {report["moves"]}')
+        lines.append('  latency     : ' + ' '.join(
+            f'p{p}={report[f"p{p}_ms"]:.1f}ms' for p in PERCENTILES) +
+            f' max={report["max_ms"]:.1f}ms')
+        if 'cpu_mean_ms' in report:
+            lines.append(f'  cpu (mean)  : {report["cpu_mean_ms"]:.1f}ms')
+        if 'max_rss_kb' in report:
+            lines.append(f'  max rss     : {report["max_rss_kb"]} KB')
+    return '\n'.join(lines)
+
+
+def main() -> NoReturn:
+    parser = ArgumentParser(description='ソルバごとの 1 手の所要時間などをまとめる')
+    parser.add_argument('paths', nargs='+',
+                        help='サイドカーファイルか、それを含むディレクトリ')
+    args = parser.parse_args()
+
+    print(format_summary(summarize(args.paths)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+import os
+import time
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, NoReturn, Tuple
+
+from game import Renju
+from search import Searcher, SearchResult, WIN_SCORE, WIN_THRESHOLD
+from transposition import TranspositionTable
+
+# 結果の受け渡しにかかる時間の見込み（秒）。ワーカーの持ち時間から引く
+IPC_MARGIN = 0.05
+
+# ワーカープロセスごとの、共有メモリ上の置換表
+_shared = None
+_table = None
+
+
+def _init_worker(name: str, buckets: int) -> NoReturn:
+    global _shared, _table
+    _shared = SharedMemory(name=name)
+    _table = TranspositionTable(buckets, buffer=_shared.buf)
+
+
+def _search_worker(renju: Renju, root_moves: List[Tuple[int, int]], *,
+                   width: int, threats: bool, time_limit: float,
+                   max_depth: int) -> SearchResult:
+    searcher = Searcher(renju, table=_table, width=width, threats=threats)
+    return searcher.search(time_limit=time_limit, max_depth=max_depth,
+                           root_moves=root_moves)
+
+
+def combine(results: List[SearchResult]) -> SearchResult:
+    """ルートの手を分けて読んだ結果をまとめる
+
+    勝ちを読み切ったワーカーがあればその手を選ぶ。それ以外は全員が読み切った
+    深さのうち最も深いもので、評価値が最大の手を選ぶ。
+    """
+
+    nodes = sum(r.nodes for r in results)
+    elapsed = max(r.elapsed for r in results)
+
+    wins = [r for r in results if r.score >= WIN_THRESHOLD]
+    if wins:
+        best = max(wins, key=lambda r: r.score)
+        return SearchResult(move=best.move, score=best.score, depth=best.depth,
+                            nodes=nodes, elapsed=elapsed)
+
+    depth = min(r.depth for r in results)
+    candidates = []
+    for r in results:
+        for d, score, move in r.iterations:
+            if d == depth:
+                candidates.append((score, move))
+    if not candidates:
+        return SearchResult(move=results[0].move, score=0, depth=0,
+                            nodes=nodes, elapsed=elapsed)
+
+    score, move = max(candidates)
+    return SearchResult(move=move, score=score, depth=depth, nodes=nodes,
+                        elapsed=elapsed)
+
+
+class ParallelSearcher:
+    """ルートの手をワーカープロセスに分けて読む並列探索
+
+    ルートの候補手は Searcher.root_moves（Renju.is_legal_move で作る）で並べ、
+    上位から順にワーカーへ配る。置換表は共有メモリに置いて全ワーカーで使う。
+    ワーカーが読む間、呼び出し側のプロセスはルートの VCF・VCT を調べる。
+
+    Args:
+        jobs(int): ワーカープロセスの数
+        buckets(int): 置換表のバケット数
+        width(int): 各ノードで調べる候補手の数の上限
+        threats(bool): 脅威空間探索を使うとき True
+    """
+
+    def __init__(self, jobs: int = os.cpu_count(), *,
+                 buckets: int = 1 << 18, width: int = 12,
+                 threats: bool = True):
+        self.jobs = jobs
+        self.width = width
+        self.threats = threats
+
+        self._shared = SharedMemory(
+            create=True, size=TranspositionTable.nbytes(buckets))
+        self._pool = Pool(processes=jobs, initializer=_init_worker,
+                          initargs=(self._shared.name, buckets))
+
+    def split(self, moves: List[Tuple[int, int]]
+              ) -> List[List[Tuple[int, int]]]:
+        """読む順に並んだ手を、各ワーカーの良い手が偏らないよう配る"""
+
+        parts = [moves[i::self.jobs] for i in range(self.jobs)]
+        return [part for part in parts if part]
+
+    def search(self, renju: Renju, *, time_limit: float = 1.0,
+               max_depth: int = 64) -> SearchResult:
+        """持ち時間内に最善手を探す。引数は Searcher.search と同じ。"""
+
+        start = time.perf_counter()
+
+        searcher = Searcher(renju, width=self.width, threats=self.threats)
+        moves = searcher.root_moves()
+        if not moves:
+            raise ValueError('no legal moves')
+        if len(moves) == 1:
+            return SearchResult(move=moves[0], score=0, depth=0, nodes=0,
+                                elapsed=time.perf_counter() - start)
+
+        budget = max(time_limit - IPC_MARGIN, 0.0)
+        pending = [self._pool.apply_async(
+                       _search_worker, (renju, part),
+                       dict(width=self.width, threats=self.threats,
+                            time_limit=budget, max_depth=max_depth))
+                   for part in self.split(moves)]
+
+        # ワーカーを待つ間に、ルートの勝ち手順を探す
+        line = searcher.threat_search(budget)
+        results = [p.get() for p in pending]
+
+        res = combine(results)
+        if line is not None:
+            res.move, res.score = line[0], WIN_SCORE - len(line)
+            res.depth = len(line)
+        res.nodes += searcher.nodes
+        res.elapsed = time.perf_counter() - start
+        return res
+
+    def close(self) -> NoReturn:
+        self._pool.terminate()
+        self._pool.join()
+        self._shared.close()
+        self._shared.unlink()
+
+    def __enter__(self) -> 'ParallelSearcher':
+        return self
+
+    def __exit__(self, *exc) -> NoReturn:
+        self.close()
+
+
+if __name__ == '__main__':
+    pass
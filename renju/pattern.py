@@ -0,0 +1,276 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+import os
+import tempfile
+from array import array
+from enum import IntEnum
+from typing import List, NoReturn, Tuple
+
+# ライン窓の方向。窓の i 番目は注目点から (i - WINDOW_RADIUS) 歩進んだマス
+LINE_DIRECTIONS = [(0, 1), (-1, 1), (1, 0), (1, 1)]
+
+# 注目点の前後 4 マスで五・四・三の形が決まり、黒の長連判定にだけ 5 マス先が要る
+WINDOW_RADIUS = 5
+WINDOW_SIZE = 2 * WINDOW_RADIUS + 1
+WINDOW_MASK = (1 << WINDOW_SIZE) - 1
+
+# 窓の各マスは 3 進 1 桁で表す
+EMPTY, MINE, BLOCKED = 0, 1, 2
+TABLE_SIZE = 3 ** WINDOW_SIZE
+
+# 表のキャッシュ。パッケージのディレクトリは書き込めないことがあるので、
+# ユーザのキャッシュディレクトリ（$XDG_CACHE_HOME か ~/.cache）に置く
+TABLE_FILE = pathlib.Path(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+) / 'renju' / 'pattern_table.bin'
+TABLE_MAGIC = b'RJPT0003'
+
+
+class PatternType(IntEnum):
+    """注目点に石を置いたときのライン上の形
+
+    Attributes:
+        NONE: なし
+        OPEN_THREE: 三（一手で活四になる）
+        FOUR: 四（一手で五になる）
+        DOUBLE_FOUR: 一直線上の四四
+        STRAIGHT_FOUR: 活四（五になる点が 2 つある）
+        FIVE: 五（黒はちょうど 5 つ）
+        OVERLINE: 長連（6 つ以上）
+    """
+
+    NONE = 0
+    OPEN_THREE = 1
+    FOUR = 2
+    DOUBLE_FOUR = 3
+    STRAIGHT_FOUR = 4
+    FIVE = 5
+    OVERLINE = 6
+
+
+# 形ごとの四の数
+FOUR_COUNT = {
+    PatternType.FOUR: 1,
+    PatternType.DOUBLE_FOUR: 2,
+    PatternType.STRAIGHT_FOUR: 1,
+}
+
+
+def run_length(line: int, pos: int) -> int:
+    """ライン上で pos を含む連続した石の数"""
+
+    up = line >> pos
+    up = ((~up) & (up + 1)).bit_length() - 1
+
+    low = ~line & ((1 << pos) - 1)
+    return up + pos - low.bit_length()
+
+
+def five_points(mine: int, empty: int, pos: int, exact: bool) -> List[int]:
+    """あと一手で pos を含む五（exact のときは長連を除く）になる空点"""
+
+    res = []
+    window = empty & (0x1FF << pos >> 4)
+    while window:
+        bit = window & -window
+        window ^= bit
+        length = run_length(mine | bit, pos)
+        if length == 5 or (length > 5 and not exact):
+            res.append(bit.bit_length() - 1)
+    return res
+
+
+def is_straight_four(points: List[int]) -> bool:
+    return len(points) == 2 and points[1] - points[0] == 5
+
+
+def three_points(mine: int, empty: int, pos: int, exact: bool) -> List[int]:
+    """置くと pos を含む活四になる空点"""
+
+    res = []
+    window = empty & (0x1FF << pos >> 4)
+    while window:
+        bit = window & -window
+        window ^= bit
+        if is_straight_four(five_points(mine | bit, empty ^ bit, pos, exact)):
+            res.append(bit.bit_length() - 1)
+    return res
+
+
+def classify(mine: int, empty: int, pos: int, exact: bool) -> PatternType:
+    """ライン上の形を判定する
+
+    Args:
+        mine(int): 自石のビット列（pos を含む）
+        empty(int): 空点のビット列
+        pos(int): 注目点の位置
+        exact(bool): 黒のとき True。ちょうど 5 つだけを五とする
+    """
+
+    length = run_length(mine, pos)
+    if length == 5 or (length > 5 and not exact):
+        return PatternType.FIVE
+    if length > 5:
+        return PatternType.OVERLINE
+
+    points = five_points(mine, empty, pos, exact)
+    if is_straight_four(points):
+        return PatternType.STRAIGHT_FOUR
+    if len(points) >= 2:
+        return PatternType.DOUBLE_FOUR
+    if len(points) == 1:
+        return PatternType.FOUR
+
+    if three_points(mine, empty, pos, exact):
+        return PatternType.OPEN_THREE
+    return PatternType.NONE
+
+
+def _build_codes() -> Tuple[List[int], List[int]]:
+    mine_codes, blocked_codes = [], []
+    for mask in range(1 << WINDOW_SIZE):
+        code = 0
+        for i in range(WINDOW_SIZE):
+            if mask >> i & 1:
+                code += 3 ** i
+        mine_codes.append(code * MINE)
+        blocked_codes.append(code * BLOCKED)
+    return mine_codes, blocked_codes
+
+
+# 窓のビット列から表の添字への変換
+MINE_CODES, BLOCKED_CODES = _build_codes()
+
+
+def _build_offsets() -> List[Tuple[int, ...]]:
+    return [tuple(i - WINDOW_RADIUS for i in range(WINDOW_SIZE) if mask >> i & 1)
+            for mask in range(1 << WINDOW_SIZE)]
+
+
+# 窓内の位置のビット列 -> 注目点からの歩数
+WINDOW_OFFSETS = _build_offsets()
+
+
+def window_code(mine: int, empty: int) -> int:
+    """窓のビット列（自石・空点）を表の添字にする"""
+
+    return MINE_CODES[mine] + \
+        BLOCKED_CODES[~(mine | empty) & WINDOW_MASK]
+
+
+def build_tables() -> Tuple[bytes, bytes, array, array, array, array]:
+    """形の表と、四を五にする点・三を活四にする点の表を作る
+
+    Returns:
+        Tuple[bytes, bytes, array, array, array, array]: 黒・白の形の表、
+            黒・白の四を五にする点、黒・白の三を活四にする点の表。
+            点は窓内の位置のビット列。注目点が自石でない添字は NONE / 0 のまま。
+    """
+
+    tables = (bytearray(TABLE_SIZE), bytearray(TABLE_SIZE))
+    fours = (array('H', bytes(2 * TABLE_SIZE)),
+             array('H', bytes(2 * TABLE_SIZE)))
+    threes = (array('H', bytes(2 * TABLE_SIZE)),
+              array('H', bytes(2 * TABLE_SIZE)))
+    center = 3 ** WINDOW_RADIUS * MINE
+    memo = {}
+
+    for rest in range(3 ** (WINDOW_SIZE - 1)):
+        # rest の桁を注目点以外のマスに割り当てる
+        mine, empty, code, digits = 1 << WINDOW_RADIUS, 0, center, rest
+        for i in range(WINDOW_SIZE):
+            if i == WINDOW_RADIUS:
+                continue
+            digits, digit = divmod(digits, 3)
+            code += digit * 3 ** i
+            if digit == MINE:
+                mine |= 1 << i
+            elif digit == EMPTY:
+                empty |= 1 << i
+
+        for color, exact in enumerate((True, False)):
+            # 両端のマスは自石かどうかだけが意味を持つ
+            key = (mine, empty & ~(1 | 1 << (WINDOW_SIZE - 1)), exact)
+            if key not in memo:
+                pattern = classify(mine, empty, WINDOW_RADIUS, exact)
+                four_mask, three_mask = 0, 0
+                if pattern in FOUR_COUNT:
+                    for i in five_points(mine, empty, WINDOW_RADIUS, exact):
+                        four_mask |= 1 << i
+                if pattern == PatternType.OPEN_THREE:
+                    for i in three_points(mine, empty, WINDOW_RADIUS, exact):
+                        three_mask |= 1 << i
+                memo[key] = (pattern, four_mask, three_mask)
+            tables[color][code], fours[color][code], threes[color][code] = \
+                memo[key]
+
+    return (bytes(tables[0]), bytes(tables[1]),
+            fours[0], fours[1], threes[0], threes[1])
+
+
+def save_tables(tables: Tuple[bytes, bytes, array, array, array, array],
+                file: pathlib.Path = TABLE_FILE) -> NoReturn:
+    """表を保存する
+
+    同じディレクトリの一時ファイルに書いてから os.replace で置き換えるので、
+    同時に読み書きするプロセスが書きかけのファイルを見ることはない。
+    """
+
+    file.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=file.parent, prefix=file.name + '.')
+    try:
+        with open(fd, 'wb') as f:
+            f.write(TABLE_MAGIC)
+            for table in tables:
+                f.write(table if isinstance(table, bytes) else table.tobytes())
+        os.replace(tmp, file)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load_tables(file: pathlib.Path = TABLE_FILE,
+                ) -> Tuple[bytes, bytes, array, array, array, array]:
+    """キャッシュから表を読む。なければメモリ上で作り、キャッシュに保存する。
+
+    保存できなくても（読み取り専用のホームなど）作った表をそのまま使う。
+    """
+
+    try:
+        data = file.read_bytes()
+        if data[:len(TABLE_MAGIC)] == TABLE_MAGIC and \
+                len(data) == len(TABLE_MAGIC) + 10 * TABLE_SIZE:
+            offset = len(TABLE_MAGIC)
+            res = [data[offset:offset + TABLE_SIZE],
+                   data[offset + TABLE_SIZE:offset + 2 * TABLE_SIZE]]
+            offset += 2 * TABLE_SIZE
+
+            for i in range(4):
+                points = array('H')
+                points.frombytes(data[offset:offset + 2 * TABLE_SIZE])
+                res.append(points)
+                offset += 2 * TABLE_SIZE
+            return tuple(res)
+    except OSError:
+        pass
+
+    tables = build_tables()
+    try:
+        save_tables(tables, file)
+    except OSError:
+        pass
+    return tables
+
+
+# 窓の添字 -> PatternType（黒用・白用）と、四を五にする点・三を活四にする点の
+# ビット列
+(BLACK_TABLE, WHITE_TABLE, BLACK_FOUR_POINTS, WHITE_FOUR_POINTS,
+ BLACK_THREE_POINTS, WHITE_THREE_POINTS) = load_tables()
+
+
+if __name__ == '__main__':
+    # 表を作り直して保存する
+    save_tables(build_tables())
@@ -14,7 +14,10 @@ from prompt_toolkit.layout.controls import FormattedTextControl
 from prompt_toolkit.layout.dimension import LayoutDimension as D
 from prompt_toolkit.layout.layout import Layout
 
+import _thread
 import asyncio
+import signal
+import threading
 from typing import Dict, Tuple, NoReturn, Optional
 
 from game import SquareType, Renju
@@ -105,14 +108,7 @@ class BoardControl(FormattedTextControl):
                  text_style: Optional[Dict[str, str]] = None,
                  **kwargs):
         self.renju = renju
-        self._board = [[None for i in range(15)] for i in range(15)]
-
-        for x in range(renju.height):
-            for y in range(renju.width):
-                square = renju.board[x][y]
-                canput = renju.is_legal_move((x, y))
-                self.board[x][y] = self.Square(square=square,
-                                               canput=canput)
+        self._board = [[self.Square() for i in range(15)] for i in range(15)]
 
         self.prompt = prompt
         if not prompt:
@@ -124,6 +120,16 @@ class BoardControl(FormattedTextControl):
         if text_style is not None:
             self.text_style.update(text_style)
 
+        # 最後に取り込んだ手順と合法手、マスごとの formatted_text（行末の改行を含む）
+        self._moves = []
+        self._legal = set()
+        self._cells = []
+        for x in range(self.height):
+            self._cells.extend([None] * self.width)
+            self._cells.append(('', '\n'))
+        self._refresh({(x, y) for x in range(self.height)
+                       for y in range(self.width)})
+
         super(BoardControl, self).__init__(
             self.make_formatted_text, **kwargs)
 
@@ -139,6 +145,48 @@ class BoardControl(FormattedTextControl):
     def width(self):
         return 0 if self.height == 0 else len(self._board[0])
 
+    def _cell_index(self, x: int, y: int) -> int:
+        return x * (self.width + 1) + y
+
+    def _render(self, x: int, y: int, selected: bool = False
+                ) -> Tuple[str, str]:
+        return self.board[x][y].convert_to_formatted_text(
+            color_style=self.color_style, text_style=self.text_style,
+            selected=selected)
+
+    def _refresh(self, points) -> NoReturn:
+        """points のマスの石・置けるかと、手順・合法手の控えを renju に合わせる"""
+
+        renju = self.renju
+        legal = set(renju.legal_moves())
+        points = set(points) | (legal ^ self._legal)
+
+        for x, y in points:
+            square = self.board[x][y]
+            square.square = renju.board[x][y]
+            square.canput = (x, y) in legal
+            self._cells[self._cell_index(x, y)] = self._render(x, y)
+
+        self._moves = list(renju.score_sheet)
+        self._legal = legal
+
+    def sync(self) -> NoReturn:
+        """renju の変化を取り込む
+
+        前回から打った・戻した手のマスと、置けるかが変わったマスだけを
+        作り直す。
+        """
+
+        old, new = self._moves, self.renju.score_sheet
+        common = 0
+        for a, b in zip(old, new):
+            if a != b:
+                break
+            common += 1
+
+        self._refresh(move.point for move in old[common:] + new[common:]
+                      if move.x is not None)
+
     def make_formatted_text(self):
         formatted_text = []
 
@@ -155,17 +203,12 @@ class BoardControl(FormattedTextControl):
             formatted_text.append(('#00ffff',
                                    f'[Select] {self.get_selected_index()}\n'))
 
-        def append(square: self.Square, selected: bool = False):
-            formatted_text.append(square.convert_to_formatted_text(
-                color_style=self.color_style, text_style=self.text_style,
-                selected=selected))
-
-        for x in range(self.height):
-            for y in range(self.width):
-                selected = (x == self.selected_index_x and
-                            y == self.selected_index_y)
-                append(self.board[x][y], selected)
-            formatted_text.append(('', '\n'))
+        # 盤面は作っておいたものを使い、選択中のマスだけ描き直す
+        formatted_text.extend(self._cells)
+        x, y = self.get_selected_index()
+        if 0 <= x < self.height and 0 <= y < self.width:
+            formatted_text[3 + self._cell_index(x, y)] = \
+                self._render(x, y, selected=True)
 
         return formatted_text
 
@@ -178,6 +221,19 @@ class BoardControl(FormattedTextControl):
         return self.board[x][y].canput
 
 
+def board_layout(bc: BoardControl) -> Layout:
+    HSContainer = HSplit([
+        ConditionalContainer(
+            Window(
+                bc,
+                width=D.exact(43),
+                height=D(min=3),
+                scroll_offsets=ScrollOffsets(top=1, bottom=1)
+            ),
+            filter=~IsDone())])
+    return Layout(HSContainer)
+
+
 def prompt(renju: Renju) -> Tuple[int, int]:
     """盤面のビジュアライズ・プロンプト
 
@@ -189,16 +245,7 @@ def prompt(renju: Renju) -> Tuple[int, int]:
 
     bc = BoardControl(renju=renju)
 
-    HSContainer = HSplit([
-        ConditionalContainer(
-            Window(
-                bc,
-                width=D.exact(43),
-                height=D(min=3),
-                scroll_offsets=ScrollOffsets(top=1, bottom=1)
-            ),
-            filter=~IsDone())])
-    layout = Layout(HSContainer)
+    layout = board_layout(bc)
 
     kb = KeyBindings()
 
@@ -265,16 +312,7 @@ def visualize(*,
 
     bc = BoardControl(renju=renju, prompt=False)
 
-    HSContainer = HSplit([
-        ConditionalContainer(
-            Window(
-                bc,
-                width=D.exact(43),
-                height=D(min=3),
-                scroll_offsets=ScrollOffsets(top=1, bottom=1)
-            ),
-            filter=~IsDone())])
-    layout = Layout(HSContainer)
+    layout = board_layout(bc)
 
     kb = KeyBindings()
 
@@ -302,5 +340,163 @@ def visualize(*,
     asyncio.get_event_loop().run_until_complete(visualize_async(app, wait_militime))
 
 
+class Viewer:
+    """対局を通して 1 つの Application を表示し続けるビューア
+
+    visualize は 1 手ごとに Application と BoardControl を作り直すが、
+    Viewer は最初に作ったものを使い続け、update では BoardControl.sync で
+    変わったマスだけを描き直す。Application は専用のスレッドのイベント
+    ループで動かし続けるので、ソルバが考えている間もキー入力を処理する。
+    Ctrl-C・Ctrl-Q では表示を終え、メインスレッドに KeyboardInterrupt を
+    送る。
+
+    Args:
+        renju(Renju): 表示する局面
+        wait_militime(int): update で表示を止めておく時間（ミリ秒）
+    """
+
+    def __init__(self, renju: Renju, *, wait_militime: int = 500):
+        self.control = BoardControl(renju=renju, prompt=False)
+        self.wait_militime = wait_militime
+
+        # キー入力を待っている間は、Enter などで _resumed を立てる
+        self._resumed = threading.Event()
+        self._selecting = False
+
+        bc = self.control
+        kb = KeyBindings()
+
+        @kb.add('c-q', eager=True)
+        @kb.add('c-c', eager=True)
+        def _(event):
+            self._exit()
+            _interrupt_main()
+
+        def move_cursor(dx: int, dy: int):
+            if not self._selecting:
+                return
+            x, y = bc.selected_index_x + dx, bc.selected_index_y + dy
+            if 0 <= x < bc.height and 0 <= y < bc.width:
+                bc.selected_index_x, bc.selected_index_y = x, y
+
+        kb.add('down', eager=True)(lambda event: move_cursor(1, 0))
+        kb.add('up', eager=True)(lambda event: move_cursor(-1, 0))
+        kb.add('right', eager=True)(lambda event: move_cursor(0, 1))
+        kb.add('left', eager=True)(lambda event: move_cursor(0, -1))
+
+        @kb.add('enter', eager=True)
+        def _(event):
+            if self._selecting and not bc.check_puttable():
+                return
+            self._resumed.set()
+
+        self.app = Application(
+            layout=board_layout(bc),
+            key_bindings=kb,
+            mouse_support=False,
+        )
+
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(started,), daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def _run(self, started: threading.Event) -> NoReturn:
+        asyncio.set_event_loop(self._loop)
+        self._loop.call_soon(started.set)
+        try:
+            self._loop.run_until_complete(self.app.run_async())
+        finally:
+            started.set()
+
+    def _call(self, func, *args):
+        """func を Application のスレッドで呼び、終わるまで待つ"""
+
+        async def call():
+            return func(*args)
+
+        if not self._thread.is_alive():
+            return func(*args)
+        return asyncio.run_coroutine_threadsafe(call(), self._loop).result()
+
+    def _exit(self) -> NoReturn:
+        if self.app.is_running and not self.app.future.done():
+            self.app.exit()
+
+    def _sync(self) -> NoReturn:
+        self.control.sync()
+        self.app.invalidate()
+
+    def _wait(self, timeout: Optional[float] = None) -> NoReturn:
+        """キー入力か timeout 秒まで待つ"""
+
+        self._resumed.clear()
+        self._resumed.wait(timeout)
+
+    def update(self, wait_militime: Optional[int] = None) -> NoReturn:
+        """局面の変化を描き直し、wait_militime の間表示する"""
+
+        if wait_militime is None:
+            wait_militime = self.wait_militime
+        self._call(self._sync)
+        self._wait(wait_militime / 1000)
+
+    def _start_select(self) -> NoReturn:
+        bc = self.control
+        bc.sync()
+        if not (0 <= bc.selected_index_x < bc.height and
+                0 <= bc.selected_index_y < bc.width):
+            bc.selected_index_x, bc.selected_index_y = 0, 0
+        self._selecting = True
+        self.app.invalidate()
+
+    def _end_select(self) -> Tuple[int, int]:
+        bc = self.control
+        self._selecting = False
+        res = bc.get_selected_index()
+        bc.selected_index_x, bc.selected_index_y = -1, -1
+        self.app.invalidate()
+        return res
+
+    def select(self) -> Tuple[int, int]:
+        """人間に手を選ばせる"""
+
+        self._call(self._start_select)
+        try:
+            self._wait()
+        finally:
+            res = self._call(self._end_select)
+        return res
+
+    def wait_enter(self) -> NoReturn:
+        """Enter が押されるまで表示する"""
+
+        self._call(self._sync)
+        self._wait()
+
+    def close(self) -> NoReturn:
+        if self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._exit)
+            self._thread.join()
+        self._loop.close()
+
+    def __enter__(self) -> 'Viewer':
+        return self
+
+    def __exit__(self, *exc) -> NoReturn:
+        self.close()
+
+
+def _interrupt_main() -> NoReturn:
+    """メインスレッドに SIGINT を送る。ソルバを待っている間でも止まる"""
+
+    if hasattr(signal, 'pthread_kill'):
+        signal.pthread_kill(threading.main_thread().ident, signal.SIGINT)
+    else:
+        _thread.interrupt_main()
+
+
 if __name__ == '__main__':
     pass
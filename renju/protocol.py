@@ -0,0 +1,151 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+import subprocess
+from typing import Callable, NoReturn, Optional, TextIO, Tuple
+
+from game import Renju, Move, EngineType, create_renju
+
+# 常駐ソルバとの行プロトコル
+#
+#   ジャッジ -> ソルバ
+#     begin       ソルバが先手。最初の手を返す
+#     <x> <y>     相手が直前に置いた手。次の手を返す
+#     end         対局終了。ソルバは終了する
+#   ソルバ -> ジャッジ
+#     ready       起動と準備（import・表の読み込みなど）が済んだ。最初に 1 回だけ
+#     <x> <y>     置く手
+#
+# ソルバは対局開始から自分で局面を持ち、相手の手と自分の手を順に適用する。
+# ジャッジは ready を受けてから begin・相手の手を送るので、起動にかかった時間は
+# 最初の手の持ち時間に入らない。
+PERSISTENT_FLAG = '--persistent'
+BEGIN = 'begin'
+END = 'end'
+READY = 'ready'
+
+
+class ProtocolError(Exception):
+    """ソルバが手を返さなかった・解釈できない行を返した"""
+
+    pass
+
+
+def format_move(point: Tuple[int, int]) -> str:
+    x, y = point
+    return f'{x} {y}'
+
+
+def parse_move(line: str) -> Tuple[int, int]:
+    try:
+        x, y = map(int, line.split())
+    except ValueError:
+        raise ProtocolError(f'invalid move: {line!r}')
+    return (x, y)
+
+
+class SolverProcess:
+    """対局中ずっと起動しておくソルバプロセス（ジャッジ側）
+
+    ソルバが ready を返すまで待ってから戻る。ready 以外を返して終了したときは
+    ProtocolError を投げる。
+
+    Args:
+        command(str): ソルバの実行コマンド。PERSISTENT_FLAG を付けて起動する。
+    """
+
+    def __init__(self, command: str):
+        self._process = subprocess.Popen(
+            command.split() + [PERSISTENT_FLAG],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1)
+
+        # 準備が済むまで待つ
+        line = self._process.stdout.readline()
+        if line.strip() != READY:
+            self._process.kill()
+            self._process.wait()
+            raise ProtocolError(f'solver did not get ready: {line!r}')
+
+    @property
+    def pid(self) -> int:
+        return self._process.pid
+
+    def _send(self, line: str) -> NoReturn:
+        self._process.stdin.write(line + '\n')
+        self._process.stdin.flush()
+
+    def request(self, last_move: Optional[Move]) -> Move:
+        """相手の直前の手を送り、ソルバの手を受け取る
+
+        Args:
+            last_move(Optional[Move]): 相手の直前の手。ソルバが初手のとき None
+        """
+
+        self._send(BEGIN if last_move is None else format_move(last_move.point))
+
+        line = self._process.stdout.readline()
+        if not line:
+            raise ProtocolError('solver exited without a move')
+        return Move(*parse_move(line))
+
+    def close(self) -> NoReturn:
+        """対局終了を伝えてプロセスを終了させる"""
+
+        if self._process.poll() is None:
+            try:
+                self._send(END)
+                self._process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+        try:
+            self._process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+
+    def __enter__(self) -> 'SolverProcess':
+        return self
+
+    def __exit__(self, *exc) -> NoReturn:
+        self.close()
+
+
+def serve(choose_move: Callable[[Renju], Tuple[int, int]], *,
+          engine: EngineType = EngineType.LIST,
+          stdin: TextIO = sys.stdin,
+          stdout: TextIO = sys.stdout) -> NoReturn:
+    """常駐ソルバとして行プロトコルを処理する（ソルバ側）
+
+    Args:
+        choose_move(Callable[[Renju], Tuple[int, int]]): 局面から次の手を選ぶ関数
+        engine(EngineType): ソルバ側で持つ局面のエンジン
+    """
+
+    renju = create_renju(engine)
+    stdout.write(READY + '\n')
+    stdout.flush()
+
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        if line == END:
+            break
+
+        if line != BEGIN:
+            renju.add_move(parse_move(line))
+
+        point = choose_move(renju)
+        stdout.write(format_move(point) + '\n')
+        stdout.flush()
+
+        renju.add_move(point)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,216 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+from prompt_toolkit.application import Application
+from prompt_toolkit.key_binding import KeyBindings
+from prompt_toolkit.layout.containers import HSplit, Window
+from prompt_toolkit.layout.controls import FormattedTextControl
+from prompt_toolkit.layout.dimension import LayoutDimension as D
+from prompt_toolkit.layout.layout import Layout
+
+import asyncio
+from typing import Dict, List, NoReturn, Optional
+
+from game import Renju, Move
+from prompt import BoardControl
+from sheet import read_csv
+
+# チェックポイントを置く間隔（手数）。これより遠い手数へは、近くの
+# チェックポイントの複製から打ち進める
+CHECKPOINT_INTERVAL = 16
+
+
+class ReplayGame:
+    """記録済みの対局を 1 手ずつ、または任意の手数へ動かす
+
+    1 手の前後は Renju.pop / add_move で動かす。CHECKPOINT_INTERVAL 手ごとに
+    局面の複製をとっておき、離れた手数へは目的の手数以下で最も近い
+    チェックポイントを複製して打ち進めるので、0 手目から打ち直さない。
+
+    Args:
+        moves(List[Move]): 対局の手順
+        interval(int): チェックポイントを置く間隔（手数）
+    """
+
+    def __init__(self, moves: List[Move], *,
+                 interval: int = CHECKPOINT_INTERVAL):
+        self.moves = list(moves)
+        self.interval = interval
+        self.renju = Renju()
+        # 手数 -> その手数の局面
+        self._checkpoints: Dict[int, Renju] = {0: self.renju.clone()}
+
+    @classmethod
+    def from_file(cls, file: str, **kwargs) -> 'ReplayGame':
+        """スコアシートを read_csv で読む"""
+
+        return cls(read_csv(file).score_sheet, **kwargs)
+
+    @property
+    def ply(self) -> int:
+        return self.renju.turn
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def _advance(self) -> NoReturn:
+        move = self.moves[self.renju.turn]
+        if move.x is None:  # パス
+            self.renju.pass_turn()
+        else:
+            self.renju.add_move(move.point)
+
+        ply = self.renju.turn
+        if ply % self.interval == 0 and ply not in self._checkpoints:
+            self._checkpoints[ply] = self.renju.clone()
+
+    def forward(self) -> bool:
+        """1 手進める。最後の手まで進んでいれば False"""
+
+        if self.ply >= len(self.moves):
+            return False
+        self._advance()
+        return True
+
+    def back(self) -> bool:
+        """1 手戻す。0 手目なら False"""
+
+        if self.ply == 0:
+            return False
+        self.renju.pop()
+        return True
+
+    def seek(self, ply: int) -> NoReturn:
+        """ply 手目の局面にする。範囲外の手数は端に丸める"""
+
+        ply = max(0, min(ply, len(self.moves)))
+
+        # 遠いときは、今の局面より近いチェックポイントの複製から打ち進める
+        if abs(ply - self.ply) > self.interval:
+            base = max(k for k in self._checkpoints if k <= ply)
+            if ply < self.ply or base > self.ply:
+                self.renju = self._checkpoints[base].clone()
+
+        while self.ply > ply:
+            self.renju.pop()
+        while self.ply < ply:
+            self._advance()
+
+
+async def _autoplay(game: ReplayGame, control: BoardControl,
+                    app: Application, wait_militime: int) -> NoReturn:
+    while game.forward():
+        control.sync()
+        app.invalidate()
+        await asyncio.sleep(wait_militime / 1000)
+
+
+def replay(file: str, *, wait_militime: int = 500,
+           ply: Optional[int] = None) -> NoReturn:
+    """スコアシートの対局を再生する
+
+    →・← で 1 手進める・戻す、Home・End で最初・最後、数字を打って Enter で
+    その手数へ飛ぶ。Space で wait_militime ごとの自動再生を始める・止める。
+    q・Ctrl-C で終わる。
+
+    Args:
+        file(str): スコアシート
+        wait_militime(int): 自動再生で 1 手を表示しておく時間（ミリ秒）
+        ply(Optional[int]): 最初に表示する手数。省くと終局面
+    """
+
+    game = ReplayGame.from_file(file)
+    game.seek(len(game) if ply is None else ply)
+
+    bc = BoardControl(renju=game.renju, prompt=False)
+    # 打ちかけの手数と、自動再生のタスク
+    typed = []
+    playing = None
+
+    def show() -> NoReturn:
+        # seek でチェックポイントの複製に入れ替わることがある
+        bc.renju = game.renju
+        bc.sync()
+
+    def stop() -> NoReturn:
+        nonlocal playing
+        if playing is not None:
+            playing.cancel()
+            playing = None
+
+    kb = KeyBindings()
+
+    @kb.add('q', eager=True)
+    @kb.add('c-q', eager=True)
+    @kb.add('c-c', eager=True)
+    def _(event):
+        stop()
+        event.app.exit(None)
+
+    @kb.add('right', eager=True)
+    def _(event):
+        stop()
+        game.forward()
+        show()
+
+    @kb.add('left', eager=True)
+    def _(event):
+        stop()
+        game.back()
+        show()
+
+    @kb.add('home', eager=True)
+    def _(event):
+        stop()
+        game.seek(0)
+        show()
+
+    @kb.add('end', eager=True)
+    def _(event):
+        stop()
+        game.seek(len(game))
+        show()
+
+    for digit in '0123456789':
+        kb.add(digit, eager=True)(lambda event, d=digit: typed.append(d))
+
+    @kb.add('backspace', eager=True)
+    def _(event):
+        if typed:
+            typed.pop()
+
+    @kb.add('enter', eager=True)
+    def _(event):
+        if not typed:
+            return
+        stop()
+        game.seek(int(''.join(typed)))
+        typed.clear()
+        show()
+
+    @kb.add('space', eager=True)
+    def _(event):
+        nonlocal playing
+        if playing is not None and not playing.done():
+            stop()
+            return
+        playing = event.app.create_background_task(
+            _autoplay(game, bc, event.app, wait_militime))
+
+    def status():
+        return [('#00ffff', f'[Replay] {game.ply}/{len(game)}'
+                            f' > {"".join(typed)}')]
+
+    layout = Layout(HSplit([
+        Window(bc, width=D.exact(43), height=D(min=3)),
+        Window(FormattedTextControl(status), height=1),
+    ]))
+
+    app = Application(
+        layout=layout,
+        key_bindings=kb,
+        mouse_support=False,
+    )
+    app.run()
@@ -0,0 +1,425 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+import time
+from typing import Dict, List, NoReturn, Optional, Tuple
+
+from constants import HEIGHT, WIDTH
+from game import (Renju, PlayerType, FIRST_MOVE, INVERSE_SYMMETRIES,
+                  compact_move, get_opposite, transform_point)
+from pattern import PatternType
+from threat import ThreatSearcher
+from transposition import TranspositionTable, BoundType
+
+WIN_SCORE = 1000000
+# これ以上の評価値は勝ち（手数つき）
+WIN_THRESHOLD = WIN_SCORE - 1000
+
+# 置いたときにできる形ごとの点数
+PATTERN_SCORE = [0] * (max(PatternType) + 1)
+PATTERN_SCORE[PatternType.OPEN_THREE] = 300
+PATTERN_SCORE[PatternType.FOUR] = 800
+PATTERN_SCORE[PatternType.DOUBLE_FOUR] = 20000
+PATTERN_SCORE[PatternType.STRAIGHT_FOUR] = 20000
+PATTERN_SCORE[PatternType.FIVE] = 100000
+# 白の長連は FIVE として引かれ、黒の長連は禁手なので点数はつけない
+PATTERN_SCORE[PatternType.OVERLINE] = 0
+
+# 脅威空間探索の上限。ルートでは持ち時間のこの割合までを VCF・VCT に使う
+ROOT_VCF_NODES = 20000
+ROOT_VCT_NODES = 5000
+THREAT_TIME_RATIO = 0.2
+# 末端では四が打てるときだけ、小さな上限で VCF を調べる
+LEAF_VCF_NODES = 200
+LEAF_VCF_DEPTH = 8
+
+# 候補手は既存の石から 2 マス以内
+NEAR_RADIUS = 2
+
+
+def _build_near() -> Dict[Tuple[int, int], Tuple[Tuple[int, int], ...]]:
+    res = {}
+    for x in range(HEIGHT):
+        for y in range(WIDTH):
+            res[(x, y)] = tuple(
+                (nx, ny)
+                for nx in range(x - NEAR_RADIUS, x + NEAR_RADIUS + 1)
+                for ny in range(y - NEAR_RADIUS, y + NEAR_RADIUS + 1)
+                if (nx, ny) != (x, y) and 0 <= nx < HEIGHT and 0 <= ny < WIDTH)
+    return res
+
+
+NEAR = _build_near()
+
+
+class SearchTimeout(Exception):
+    """持ち時間切れ"""
+
+    pass
+
+
+class SearchResult:
+    """探索結果
+
+    Args:
+        move(Tuple[int, int]): 最善手
+        score(int): 評価値（手番側から見た値）
+        depth(int): 読み切った深さ
+        nodes(int): 探索したノード数
+        elapsed(float): 探索時間（秒）
+        iterations(List[Tuple[int, int, Tuple[int, int]]]): 読み切った深さごとの
+            (深さ, 評価値, 最善手)
+    """
+
+    def __init__(self, *, move: Tuple[int, int], score: int, depth: int,
+                 nodes: int, elapsed: float,
+                 iterations: Optional[List[Tuple[int, int, Tuple[int, int]]]]
+                 = None):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.iterations = iterations if iterations is not None else []
+
+    @property
+    def nps(self) -> float:
+        """1 秒あたりのノード数"""
+
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return f'SearchResult(move={self.move}, score={self.score}, ' \
+            f'depth={self.depth}, nodes={self.nodes}, nps={self.nps:.0f})'
+
+
+class Searcher:
+    """反復深化つきの negamax + alpha-beta 探索
+
+    手の並べ替えには置換表の最善手、キラー手、ヒストリーと形の点数を使う。
+    局面は Renju.add_move / Renju.pop で進め戻しする。threats が True なら
+    ルートで VCF・VCT を、末端で VCF を先に調べる。
+
+    Args:
+        renju(Renju): 探索する局面。探索後は元の局面に戻る
+        table(Optional[TranspositionTable]): 置換表。None なら新しく作る
+        width(int): 各ノードで調べる候補手の数の上限
+        threats(bool): 脅威空間探索を使うとき True
+    """
+
+    def __init__(self, renju: Renju, *,
+                 table: Optional[TranspositionTable] = None,
+                 width: int = 12, threats: bool = True):
+        self.renju = renju
+        self.table = table if table is not None else TranspositionTable()
+        self.width = width
+        # 証明・反証キャッシュを探索をまたいで使い回す
+        self.threat = ThreatSearcher(renju) if threats else None
+
+        self.nodes = 0
+        self._deadline = None
+        self._root_moves = None
+        self._root_best = None
+        self._killers = []
+        self._history = {}
+
+        # 石からの距離が NEAR_RADIUS 以内のマスの、近くにある石の数
+        self._near = {}
+        for move in renju.score_sheet:
+            if move.x is not None:
+                self._add_near(move.point, 1)
+
+    def _add_near(self, point: Tuple[int, int], delta: int) -> NoReturn:
+        near = self._near
+        for p in NEAR[point]:
+            near[p] = near.get(p, 0) + delta
+
+    def _push(self, point: Tuple[int, int]) -> NoReturn:
+        self.renju.add_move(point)
+        self._add_near(point, 1)
+
+    def _pop(self) -> NoReturn:
+        point = self.renju.score_sheet[-1].point
+        self.renju.pop()
+        self._add_near(point, -1)
+
+    def candidates(self) -> List[Tuple[int, int]]:
+        """石の近くの合法手"""
+
+        renju = self.renju
+        if renju.turn == 0:
+            return [FIRST_MOVE.point]
+
+        putter = renju.putter
+        res = []
+        for point, count in self._near.items():
+            if count <= 0:
+                continue
+            if not renju.is_legal_move(compact_move(*point, putter)):
+                continue
+            res.append(point)
+        return res
+
+    def point_score(self, point: Tuple[int, int], player: PlayerType) -> int:
+        """player が point に置いたときの形の点数"""
+
+        score = 0
+        for pattern in self.renju.patterns(compact_move(*point, player)):
+            score += PATTERN_SCORE[pattern]
+        return score
+
+    def _scored_moves(self, moves: List[Tuple[int, int]]
+                      ) -> List[Tuple[int, Tuple[int, int], int, int]]:
+        renju = self.renju
+        me = renju.putter
+        opp = get_opposite(me)
+        res = []
+        for point in moves:
+            attack = self.point_score(point, me)
+            # 黒の禁手点は黒が打てないので守る必要がない
+            if opp is PlayerType.FIRST and \
+                    not renju.is_legal_move(compact_move(*point, opp)):
+                defense = 0
+            else:
+                defense = self.point_score(point, opp)
+            res.append((attack + defense, point, attack, defense))
+        return res
+
+    def evaluate(self, ply: int = 0) -> int:
+        """手番側から見た静的評価。四追いで勝てるときは勝ちの評価値"""
+
+        scored = self._scored_moves(self.candidates())
+        if not scored:
+            return 0
+
+        best = max(attack for _, _, attack, _ in scored)
+        if self.threat is not None and best >= PATTERN_SCORE[PatternType.FOUR]:
+            # 末端の VCF も持ち時間の残りで打ち切る
+            remaining = self._remaining()
+            if remaining is not None and remaining <= 0:
+                raise SearchTimeout
+            line = self.threat.vcf(max_depth=LEAF_VCF_DEPTH,
+                                   max_nodes=LEAF_VCF_NODES,
+                                   time_limit=remaining)
+            self._check_time()
+            if line is not None:
+                return WIN_SCORE - ply - len(line)
+
+        total = sum(attack - defense for _, _, attack, defense in scored)
+        # 手番側は最も良い手を先に打てる
+        return total + best
+
+    def root_moves(self) -> List[Tuple[int, int]]:
+        """ルートで読む手を、読む順に返す"""
+
+        return self._ordered_moves(0, None)
+
+    def _ordered_moves(self, ply: int,
+                       tt_move: Optional[Tuple[int, int]]
+                       ) -> List[Tuple[int, int]]:
+        scored = self._scored_moves(self.candidates())
+        if not scored:
+            return []
+
+        # 五が打てるならそれだけ、相手の五を止める必要があればそれだけ読む
+        wins = [p for _, p, attack, _ in scored
+                if attack >= PATTERN_SCORE[PatternType.FIVE]]
+        if wins:
+            return wins[:1]
+        blocks = [p for _, p, _, defense in scored
+                  if defense >= PATTERN_SCORE[PatternType.FIVE]]
+        if blocks:
+            return blocks
+
+        if ply == 0 and self._root_moves is not None:
+            scored = [item for item in scored if item[1] in self._root_moves]
+
+        killers = self._killers[ply] if ply < len(self._killers) else ()
+        history = self._history
+
+        def priority(item):
+            score, point, _, _ = item
+            if point == tt_move:
+                return (2, 0)
+            if point in killers:
+                return (1, score)
+            return (0, score + history.get(point, 0))
+
+        scored.sort(key=priority, reverse=True)
+        return [point for _, point, _, _ in scored[:self.width]]
+
+    def _remaining(self) -> Optional[float]:
+        """持ち時間の残り（秒）。持ち時間がなければ None"""
+
+        if self._deadline is None:
+            return None
+        return self._deadline - time.perf_counter()
+
+    def _check_time(self) -> NoReturn:
+        # 1 ノードが数ミリ秒かかるので、時計はノードごとに見る
+        remaining = self._remaining()
+        if remaining is not None and remaining <= 0:
+            raise SearchTimeout
+
+    def _negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        self._check_time()
+
+        renju = self.renju
+        # 直前の手で決着している: 手番側の負け
+        if renju.finished:
+            return -(WIN_SCORE - ply)
+
+        # 対称な局面は同じエントリを使う。手は canonical の局面に写して書く
+        key, symmetry = renju.canonical()
+        entry = self.table.probe(key)
+        tt_move = None
+        if entry is not None:
+            if entry.move is not None:
+                tt_move = transform_point(entry.move,
+                                          INVERSE_SYMMETRIES[symmetry])
+            if entry.depth >= depth and ply > 0:
+                if entry.bound == BoundType.EXACT:
+                    return entry.value
+                if entry.bound == BoundType.LOWER and entry.value >= beta:
+                    return entry.value
+                if entry.bound == BoundType.UPPER and entry.value <= alpha:
+                    return entry.value
+
+        if depth <= 0:
+            return self.evaluate(ply)
+
+        moves = self._ordered_moves(ply, tt_move)
+        if not moves:
+            return 0
+
+        original_alpha = alpha
+        best_score, best_move = -WIN_SCORE - 1, moves[0]
+        for point in moves:
+            self._push(point)
+            try:
+                score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                self._pop()
+
+            if score > best_score:
+                best_score, best_move = score, point
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self._store_cutoff(ply, point, depth)
+                break
+
+        if best_score <= original_alpha:
+            bound = BoundType.UPPER
+        elif best_score >= beta:
+            bound = BoundType.LOWER
+        else:
+            bound = BoundType.EXACT
+        self.table.store(key, depth, best_score, bound,
+                         renju.canonical_move(best_move))
+        if ply == 0:
+            # 置換表は他のプロセスと共有していることがあるので、ルートの最善手は
+            # 自分で持っておく
+            self._root_best = best_move
+
+        return best_score
+
+    def _store_cutoff(self, ply: int, point: Tuple[int, int],
+                      depth: int) -> NoReturn:
+        while len(self._killers) <= ply:
+            self._killers.append([])
+        killers = self._killers[ply]
+        if point not in killers:
+            killers.insert(0, point)
+            del killers[2:]
+
+        self._history[point] = self._history.get(point, 0) + depth * depth
+
+    def threat_search(self, time_limit: float
+                       ) -> Optional[List[Tuple[int, int]]]:
+        """ルートで四追い、三・四による追い詰めの順に勝ち手順を探す"""
+
+        if self.threat is None:
+            return None
+
+        deadline = time.perf_counter() + time_limit
+        line = self.threat.vcf(max_nodes=ROOT_VCF_NODES, time_limit=time_limit)
+        self.nodes += self.threat.nodes
+        if line is None:
+            remaining = deadline - time.perf_counter()
+            if remaining > 0:
+                line = self.threat.vct(max_nodes=ROOT_VCT_NODES,
+                                       time_limit=remaining)
+                self.nodes += self.threat.nodes
+        return line
+
+    def search(self, *, time_limit: float = 1.0, max_depth: int = 64,
+               root_moves: Optional[List[Tuple[int, int]]] = None
+               ) -> SearchResult:
+        """反復深化で最善手を探す
+
+        Args:
+            time_limit(float): 持ち時間（秒）。超えたら最後に読み切った深さの結果を返す
+            max_depth(int): 最大の深さ
+            root_moves(Optional[List[Tuple[int, int]]]): ルートで読む手を
+                これらに限る。指定したときはルートの脅威空間探索をしない
+        """
+
+        start = time.perf_counter()
+        self._deadline = start + time_limit
+        self.nodes = 0
+        self.table.new_search()
+
+        self._root_moves = None if root_moves is None else set(root_moves)
+        try:
+            moves = self._ordered_moves(0, None)
+            if not moves:
+                raise ValueError('no legal moves')
+            return self._iterate(moves, start, time_limit, max_depth)
+        finally:
+            self._root_moves = None
+            self._deadline = None
+
+    def _iterate(self, moves: List[Tuple[int, int]], start: float,
+                 time_limit: float, max_depth: int) -> SearchResult:
+        best = SearchResult(move=moves[0], score=0, depth=0, nodes=0,
+                            elapsed=0.0)
+        if len(moves) == 1 and self._root_moves is None:
+            best.elapsed = time.perf_counter() - start
+            return best
+
+        line = None
+        if self._root_moves is None:
+            line = self.threat_search(time_limit * THREAT_TIME_RATIO)
+        if line is not None:
+            best.score, best.depth = WIN_SCORE - len(line), len(line)
+            best.move = line[0]
+            best.nodes = self.nodes
+            best.elapsed = time.perf_counter() - start
+            return best
+
+        self._root_best = best.move
+        try:
+            for depth in range(1, max_depth + 1):
+                score = self._negamax(depth, -WIN_SCORE - 1, WIN_SCORE + 1, 0)
+                best.move = self._root_best
+                best.score, best.depth = score, depth
+                best.iterations.append((depth, score, best.move))
+
+                # 勝ち負けが読み切れたらそれ以上は読まない
+                if abs(score) >= WIN_THRESHOLD:
+                    break
+        except SearchTimeout:
+            # 途中で打ち切った深さの結果は捨てる（局面は _negamax が戻す）
+            pass
+
+        best.nodes = self.nodes
+        best.elapsed = time.perf_counter() - start
+        return best
+
+
+if __name__ == '__main__':
+    pass
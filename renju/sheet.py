@@ -4,41 +4,263 @@ sys.path.append(pathlib.Path(__file__).parent.__str__())
 
 
 import csv
-from typing import NoReturn
+from typing import Iterator, List, NoReturn, Optional, Tuple
 
-from game import Renju, PlayerType
+from game import (Renju, Move, PlayerType, EndReason, EngineType,
+                  create_renju)
 
+# 追記形式のスコアシート
+#
+#   <program>:<x>:<y>\n   1 行 1 手。program は先手 1・後手 2
+#
+# 手数の見出しを持たないので、1 手ごとに末尾へ 1 行足すだけで書ける。
+# read_csv は 1 行目に ',' がなく ':' があればこの形式として読む。
+#
+# どちらの形式でも、パスは x・y を -1 として書き、(None, None) として読む。
+#
+# 終局の行
+#
+#   result:<winner>:<reason>\n   winner は先手 1・後手 2・なし 0、reason は
+#                                EndReason の名前を小文字にしたもの
+#
+# 終局したときだけ、CSV 形式では 2 行目に、追記形式では最後の行に書く。禁手・
+# 時間切れのように手順からはわからない結果もこれで残す。
+
+PASS_POINT = (None, None)
+RESULT_TAG = 'result'
+
+_PROGRAMS = {None: '0', PlayerType.FIRST: '1', PlayerType.SECOND: '2'}
+_PLAYERS = {program: player for player, program in _PROGRAMS.items()}
+
+Point = Tuple[Optional[int], Optional[int]]
+# 記録された結果: (勝者, 終局の理由)
+Result = Tuple[Optional[PlayerType], EndReason]
+
+
+def _is_incremental(line: str) -> bool:
+    return ',' not in line and ':' in line
+
+
+def _parse_rows(rows: List[str]) -> Iterator[Point]:
+    for row in rows:
+        program, x, y = map(int, row.split(':'))
+        yield PASS_POINT if x < 0 else (x, y)
+
+
+def _parse_result(row: str) -> Result:
+    _, program, reason = row.strip().split(':')
+    return _PLAYERS[program], EndReason[reason.upper()]
+
+
+def read_sheet(file: str) -> Tuple[List[Point], Optional[Result]]:
+    """スコアシートの手順と記録された結果を、局面を作らずに読む
+
+    手順は (x, y) の並びで、パスは PASS_POINT になる。終局の行がなければ
+    結果は None。
+    """
 
-def read_csv(file: str) -> Renju:
     with open(file, newline='') as csvfile:
-        score_sheet = csv.reader(csvfile,
-                                 delimiter=',',
-                                 quotechar='"').__next__()[1:]
+        first = csvfile.readline()
+        if _is_incremental(first):
+            rows = [first] + csvfile.readlines()
+        else:
+            csvfile.seek(0)
+            reader = csv.reader(csvfile, delimiter=',', quotechar='"')
+            rows = next(reader, [])[1:]
+            # 2 行目は終局の行
+            rows.extend(row[0] for row in reader if row)
+
+    rows = [row for row in rows if row.strip()]
+    result = None
+    if rows and rows[-1].startswith(RESULT_TAG):
+        result = _parse_result(rows.pop())
+    return list(_parse_rows(rows)), result
+
+
+def read_points(file: str) -> List[Point]:
+    """スコアシートの手順を、局面を作らずに (x, y) の並びとして読む
+
+    パスは PASS_POINT になる。
+    """
+
+    return read_sheet(file)[0]
+
+
+def read_csv(file: str, engine: EngineType = EngineType.LIST, *,
+             trusted: bool = False) -> Renju:
+    """スコアシートを読む。CSV 形式と追記形式のどちらも読める
+
+    終局の行があれば、禁手・時間切れなど手順から決まらない結果も記録どおりに
+    する。
+
+    Args:
+        trusted(bool): ジャッジが検証済みの手順として、合法判定と勝利判定を
+            1 手ごとにせずに並べる（Renju.load）
+    """
+
+    points, result = read_sheet(file)
+
+    renju = create_renju(engine)
+    # load はパスを並べられないので、パスがあれば 1 手ずつ打つ
+    if trusted and PASS_POINT not in points:
+        renju.load(points)
+    else:
+        for point in points:
+            if point == PASS_POINT:
+                renju.pass_turn()
+            else:
+                renju.add_move(point)
+
+    if result is not None and not renju.finished:
+        renju.declare_result(*result)
+    return renju
+
+
+def _format_move(move: Move, turn: int) -> str:
+    """program:x:y。turn は 0 始まりの手数で、パスの手番はここから決める"""
+
+    if move.x is None:
+        program = '1' if turn % 2 == 0 else '2'
+        return f'{program}:-1:-1'
 
-        renju = Renju()
-        for row in score_sheet:
-            program, x, y = map(int, row.split(':'))
+    x, y = move.point
+    program = '1' if move.player == PlayerType.FIRST else '2'
+    return f'{program}:{x}:{y}'
 
-            renju.add_move((x, y))
-        return renju
+
+def format_csv(renju: Renju) -> str:
+    """CSV 形式のスコアシート（手数の見出しと全手を 1 行に並べる）"""
+
+    text = [str(renju.turn)]
+    text.extend(_format_move(move, turn)
+                for turn, move in enumerate(renju.score_sheet))
+    res = ','.join(text) + '\n'
+    if renju.finished:
+        res += format_result(renju)
+    return res
 
 
 def dump_csv(file: str, renju: Renju) -> NoReturn:
     with open(file, 'w', newline='') as csvfile:
-        text = []
+        csvfile.write(format_csv(renju))
+
+
+def format_row(move: Move, turn: int) -> str:
+    """追記形式の 1 行。turn は 0 始まりの手数"""
+
+    return _format_move(move, turn) + '\n'
+
+
+def format_result(renju: Renju) -> str:
+    """終局の行"""
+
+    return (f'{RESULT_TAG}:{_PROGRAMS[renju.winner]}:'
+            f'{renju.reason.name.lower()}\n')
+
+
+class ScoreSheetWriter:
+    """ジャッジが 1 手ごとにスコアシートを書く
+
+    デフォルトでは append のたびに CSV 形式（dump_csv と同じ）で書き直す。
+    CSV 形式しか読めない外部のソルバを一発起動で呼ぶとき向け。
+    incremental を指定すると追記形式で書き、まだ書いていない手だけを末尾に
+    足すので、1 手ごとの書き込み量が手数によらない。追記形式は read_csv と
+    ScoreSheetReader で読める。終局していれば終局の行も書く。
+
+    Args:
+        file(str): 書き出すファイル
+        incremental(bool): 追記形式で書く
+    """
+
+    def __init__(self, file: str, *, incremental: bool = False):
+        self._file = open(file, 'w', newline='')
+        self._incremental = incremental
+        self._written = 0
+        self._ended = False
+
+    def append(self, renju: Renju) -> NoReturn:
+        """renju の手のうち、まだ書いていないものを書く"""
+
+        if renju.turn < self._written:
+            raise ValueError('score sheet is append-only')
+
+        if self._incremental:
+            for turn in range(self._written, renju.turn):
+                self._file.write(format_row(renju.score_sheet[turn], turn))
+            if renju.finished and not self._ended:
+                self._file.write(format_result(renju))
+                self._ended = True
+        else:
+            self._file.seek(0)
+            self._file.truncate()
+            self._file.write(format_csv(renju))
+        self._written = renju.turn
+        self._file.flush()
+
+    def close(self) -> NoReturn:
+        self._file.close()
+
+    def __enter__(self) -> 'ScoreSheetWriter':
+        return self
+
+    def __exit__(self, *exc) -> NoReturn:
+        self.close()
+
+
+class ScoreSheetReader:
+    """追記形式のスコアシートを、前回読んだ位置から読み進める
+
+    読んだ局面とファイル内の位置（バイト）を持っておき、update では前回から
+    増えた行だけを打ち足すので、1 手ごとの読み込みと打ち直しが手数によらない。
+    書きかけの行は次の update に回す。ファイルが前回より短くなっていれば
+    （新しい対局）最初から読み直す。終局の行は read_csv と同じく扱う。
+
+    Args:
+        file(str): 読むファイル
+        engine(EngineType): 局面のエンジン
+    """
+
+    def __init__(self, file: str, engine: EngineType = EngineType.LIST):
+        self.file = file
+        self.engine = engine
+        self.renju = create_renju(engine)
+        self.offset = 0
+
+    def update(self) -> Renju:
+        """増えた手を打ち足した局面を返す"""
+
+        with open(self.file, 'rb') as f:
+            f.seek(0, 2)
+            if f.tell() < self.offset:
+                self.renju = create_renju(self.engine)
+                self.offset = 0
+
+            f.seek(self.offset)
+            data = f.read()
 
-        # 行数
-        text.append(str(renju.turn))
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines(keepends=True):
+            # 例外になった行も読んだことにして、同じ手を二度打たない
+            self.offset += len(line)
+            self._read_row(line.decode())
 
-        # 手
-        for i in range(renju.turn):
-            move = renju.score_sheet[i]
-            x, y = move.point
+        return self.renju
 
-            program = '1' if move.player == PlayerType.FIRST else '2'
-            text.append(':'.join([program, str(x), str(y)]))
+    def _read_row(self, row: str) -> NoReturn:
+        if not row.strip():
+            return
+        if row.startswith(RESULT_TAG):
+            if not self.renju.finished:
+                self.renju.declare_result(*_parse_result(row))
+            return
+        if not _is_incremental(row):
+            raise ValueError('not an incremental score sheet')
 
-        csvfile.write(','.join(text) + '\n')
+        point, = _parse_rows([row])
+        if point == PASS_POINT:
+            self.renju.pass_turn()
+        else:
+            self.renju.add_move(point)
 
 
 if __name__ == '__main__':
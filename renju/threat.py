@@ -0,0 +1,297 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+import time
+from typing import Dict, List, NoReturn, Optional, Tuple
+
+from game import (Renju, PlayerType, SquareType, LINE_NEIGHBORS, FOUR_COUNT,
+                  INVERSE_SYMMETRIES, compact_move, get_opposite,
+                  transform_point)
+from pattern import PatternType
+
+# 脅威の段階。値が小さいほど強い
+FIVE, FOUR, THREE = 0, 1, 2
+
+# 証明・反証キャッシュの上限。超えたら捨てる
+CACHE_SIZE = 1 << 16
+
+Point = Tuple[int, int]
+Threats = Dict[PlayerType, Dict[Point, int]]
+
+
+class ThreatAbort(Exception):
+    """ノード数・時間の上限に達した"""
+
+    pass
+
+
+class ThreatSearcher:
+    """四（VCF）と三（VCT）だけを打つ脅威空間探索
+
+    攻め方は五・四・（VCT では）三になる手だけを打ち、受け方はそれを止める手と
+    四の打ち返しだけを打つ。両者の「打つと五・四・三になる点」は、石が置かれた
+    マスの周辺だけを差分で更新する。黒の禁手点は脅威に数えないので、黒が止め所に
+    打てない場合は攻め方の勝ちになる。証明・反証した局面は Zobrist ハッシュで
+    キャッシュし、同じ ThreatSearcher を使う限り再利用する。キャッシュのキーは
+    Renju.canonical で対称な局面どうし共通にする。
+
+    Args:
+        renju(Renju): 探索する局面。探索後は元の局面に戻る
+    """
+
+    def __init__(self, renju: Renju):
+        self.renju = renju
+        self.nodes = 0
+
+        self._max_nodes = None
+        self._deadline = None
+        # (VCT か, canonical なハッシュ) -> 対称変換で写した勝ち手順 / 読んだ深さ
+        self._proven = {}
+        self._disproven = {}
+
+    def vcf(self, *, max_depth: int = 20, max_nodes: int = 10000,
+            time_limit: Optional[float] = None) -> Optional[List[Point]]:
+        """手番側の四追い勝ちを探す
+
+        Args:
+            max_depth(int): 攻め方の手数の上限
+            max_nodes(int): ノード数の上限
+            time_limit(Optional[float]): 時間の上限（秒）
+
+        Returns:
+            Optional[List[Tuple[int, int]]]: 攻め方・受け方の手を交互に並べた
+                勝ち手順。見つからない・上限に達したとき None
+        """
+
+        return self._search(False, max_depth, max_nodes, time_limit)
+
+    def vct(self, *, max_depth: int = 10, max_nodes: int = 20000,
+            time_limit: Optional[float] = None) -> Optional[List[Point]]:
+        """手番側の三・四による追い詰め勝ちを探す。引数は vcf と同じ。"""
+
+        return self._search(True, max_depth, max_nodes, time_limit)
+
+    def _search(self, three: bool, max_depth: int, max_nodes: int,
+                time_limit: Optional[float]) -> Optional[List[Point]]:
+        renju = self.renju
+        if renju.finished or renju.turn == 0:
+            return None
+
+        self.nodes = 0
+        self._max_nodes = max_nodes
+        self._deadline = None if time_limit is None else \
+            time.perf_counter() + time_limit
+
+        threats = self.threats()
+        try:
+            # 短い勝ちを先に見つけるよう、攻め方の手数を 1 手ずつ伸ばす
+            for depth in range(1, max_depth + 1):
+                res = self._attack(three, depth, threats)
+                if res is not None:
+                    return res
+            return None
+        except ThreatAbort:
+            return None
+        finally:
+            self._deadline = None
+
+    def level(self, point: Point, player: PlayerType) -> Optional[int]:
+        """player が point に打ったときの脅威の段階。脅威にならないとき None"""
+
+        move = compact_move(*point, player)
+        patterns = self.renju.patterns(move)
+        if PatternType.FIVE in patterns:
+            return FIVE
+
+        if any(p in FOUR_COUNT for p in patterns):
+            level = FOUR
+        elif PatternType.OPEN_THREE in patterns:
+            level = THREE
+        else:
+            return None
+
+        # 黒の禁手点は脅威にならない
+        if player is PlayerType.FIRST and not self.renju.is_legal_move(move):
+            return None
+        return level
+
+    def threats(self) -> Threats:
+        """両者の、打つと五・四・三になる点"""
+
+        renju = self.renju
+        region = set()
+        for move in renju.score_sheet:
+            if move.x is not None:
+                region.update(LINE_NEIGHBORS[move.point])
+
+        res = {PlayerType.FIRST: {}, PlayerType.SECOND: {}}
+        for player, levels in res.items():
+            for (x, y) in region:
+                if renju.board[x][y] is not SquareType.VACANT:
+                    continue
+                level = self.level((x, y), player)
+                if level is not None:
+                    levels[(x, y)] = level
+        return res
+
+    def _updated(self, threats: Threats, point: Point,
+                 player: PlayerType) -> Threats:
+        """player が point に打った後の脅威。周辺のマスだけ調べ直す"""
+
+        board = self.renju.board
+
+        res = {}
+        for owner, levels in threats.items():
+            levels = dict(levels)
+            levels.pop(point, None)
+
+            # 自分の石は周辺に新しい脅威を作りうるが、相手の石は消すだけ
+            if owner is player:
+                targets = LINE_NEIGHBORS[point]
+            else:
+                targets = [p for p in LINE_NEIGHBORS[point] if p in levels]
+
+            for (x, y) in targets:
+                if board[x][y] is not SquareType.VACANT:
+                    continue
+                level = self.level((x, y), owner)
+                if level is None:
+                    levels.pop((x, y), None)
+                else:
+                    levels[(x, y)] = level
+            res[owner] = levels
+        return res
+
+    def _count(self) -> NoReturn:
+        self.nodes += 1
+        if self.nodes > self._max_nodes:
+            raise ThreatAbort
+        if self._deadline is not None and \
+                time.perf_counter() >= self._deadline:
+            raise ThreatAbort
+
+    def _attack(self, three: bool, depth: int,
+                threats: Threats) -> Optional[List[Point]]:
+        """攻め方の手番。勝ち手順を返す"""
+
+        self._count()
+
+        renju = self.renju
+        attacker = renju.putter
+        mine = threats[attacker]
+        theirs = threats[get_opposite(attacker)]
+
+        for point, level in mine.items():
+            if level == FIVE:
+                return [point]
+
+        hash_key, symmetry = renju.canonical()
+        key = (three, hash_key)
+        if key in self._proven:
+            inverse = INVERSE_SYMMETRIES[symmetry]
+            return [transform_point(p, inverse) for p in self._proven[key]]
+        if depth <= 0 or self._disproven.get(key, -1) >= depth:
+            return None
+
+        limit = THREE if three else FOUR
+        moves = sorted((level, point) for point, level in mine.items()
+                       if level <= limit)
+
+        # 相手の四は止めるしかない（止め所が 2 つあれば止められない）
+        blocks = [point for point, level in theirs.items() if level == FIVE]
+        if blocks:
+            moves = [(level, point) for level, point in moves
+                     if len(blocks) == 1 and point == blocks[0]]
+
+        for _, point in moves:
+            if not renju.is_legal_move(compact_move(*point, attacker)):
+                continue
+            res = self._defend(three, depth, threats, point)
+            if res is not None:
+                if len(self._proven) >= CACHE_SIZE:
+                    self._proven.clear()
+                line = [point] + res
+                # 対称な局面では、どの変換で写しても同じ手順になるよう最小の
+                # 手順を選ぶ
+                self._proven[key] = min(
+                    [transform_point(p, t) for p in line]
+                    for t in renju.canonical_symmetries())
+                return line
+
+        if len(self._disproven) >= CACHE_SIZE:
+            self._disproven.clear()
+        self._disproven[key] = depth
+        return None
+
+    def _blocks_three(self, point: Point, attacker: PlayerType,
+                      defense: Point) -> bool:
+        """defense に受けると point の三（活四にする点）が消えるとき True"""
+
+        renju = self.renju
+        renju.put_stone(*defense, get_opposite(attacker))
+        try:
+            return not renju.straight_four_points(
+                compact_move(*point, attacker))
+        finally:
+            renju.remove_stone(*defense)
+
+    def _defend(self, three: bool, depth: int, threats: Threats,
+                point: Point) -> Optional[List[Point]]:
+        """攻め方が point に打った後の受け方の手番。全ての受けに勝てば手順を返す"""
+
+        renju = self.renju
+        attacker = renju.putter
+        defender = get_opposite(attacker)
+
+        renju.add_move(point)
+        try:
+            self._count()
+            threats = self._updated(threats, point, attacker)
+            mine, theirs = threats[attacker], threats[defender]
+
+            # 受け方に五があれば攻めは失敗
+            if any(level == FIVE for level in theirs.values()):
+                return None
+
+            fives = [p for p, level in mine.items() if level == FIVE]
+            if len(fives) >= 2:
+                return []
+            if fives:
+                # 四: 止め所以外は受けにならない。黒が止め所に打てなければ勝ち
+                defenses = fives
+            else:
+                # 三: 止める手と、四の打ち返し
+                defenses = [p for p, level in theirs.items() if level == FOUR]
+                defenses.extend(
+                    p for p in LINE_NEIGHBORS[point]
+                    if theirs.get(p) != FOUR and
+                    renju.board[p[0]][p[1]] is SquareType.VACANT and
+                    self._blocks_three(point, attacker, p))
+
+            defenses = [p for p in defenses
+                        if renju.is_legal_move(compact_move(*p, defender))]
+            if not defenses:
+                return []
+
+            line = None
+            for p in defenses:
+                renju.add_move(p)
+                try:
+                    res = self._attack(three, depth - 1,
+                                       self._updated(threats, p, defender))
+                finally:
+                    renju.pop()
+
+                if res is None:
+                    return None
+                if line is None:
+                    line = [p] + res
+            return line
+        finally:
+            renju.pop()
+
+
+if __name__ == '__main__':
+    pass
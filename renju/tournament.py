@@ -0,0 +1,206 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+import os
+import time
+from argparse import ArgumentParser
+from functools import partial
+from multiprocessing import Pool
+from pathlib import Path
+from typing import NamedTuple, NoReturn, Optional, List, Tuple
+
+from game import IllegalMove, Renju, PlayerType, EndReason, get_opposite
+from main import request_move
+from metrics import MetricsWriter, sidecar_path
+from protocol import SolverProcess, ProtocolError
+from sheet import ScoreSheetWriter
+
+
+class GameResult(NamedTuple):
+    """1 局の結果
+
+    Attributes:
+        index(int): 対局番号
+        black(str): 先手のソルバ名（'A' または 'B'）
+        winner(Optional[PlayerType]): 勝者。引き分けのとき None
+        forbidden(bool): 禁手で決着したとき True
+        error(bool): ソルバが手を返さなかったとき True
+        turns(int): 手数
+        timeout(bool): 持ち時間切れで決着したとき True。持ち時間があるのは
+            judge.py だけ
+    """
+
+    index: int
+    black: str
+    winner: Optional[PlayerType]
+    forbidden: bool
+    error: bool
+    turns: int
+    timeout: bool = False
+
+    def winner_name(self) -> Optional[str]:
+        if self.winner is None:
+            return None
+        if self.winner is PlayerType.FIRST:
+            return self.black
+        return 'B' if self.black == 'A' else 'A'
+
+
+def play_game(*, first: str, second: str, score_sheet: Path,
+              persistent: bool = True, incremental: bool = True,
+              ) -> Tuple[Renju, Optional[PlayerType], bool, bool]:
+    """画面表示なしで 1 局打つ
+
+    禁手・ソルバのエラー・引き分けも、スコアシートの終局の行に残す。
+    スコアシートは追記形式で書く。incremental が False なら毎手 CSV 形式で
+    書き直す（CSV 形式しか読めない一発起動のソルバ用）。
+
+    Returns:
+        Tuple[Renju, Optional[PlayerType], bool, bool]:
+            終局面、勝者、禁手負けか、ソルバのエラーか
+    """
+
+    commands = {PlayerType.FIRST: first, PlayerType.SECOND: second}
+
+    renju = Renju()
+    writer = ScoreSheetWriter(score_sheet, incremental=incremental)
+    metrics = MetricsWriter(sidecar_path(score_sheet))
+
+    solvers = {}
+    try:
+        if persistent:
+            for player, command in commands.items():
+                try:
+                    solvers[player] = SolverProcess(command)
+                except (OSError, ProtocolError):
+                    # 起動できなかった・準備ができなかった側の負け
+                    renju.declare_result(get_opposite(player),
+                                         EndReason.ERROR)
+                    break
+
+        while not renju.finished:
+            # 置ける場所がなければ引き分け
+            if not renju.legal_moves():
+                renju.declare_result(None, EndReason.DRAW)
+                break
+
+            putter = renju.putter
+            try:
+                move = request_move(renju=renju, command=commands[putter],
+                                    score_sheet=score_sheet,
+                                    solver=solvers.get(putter),
+                                    metrics=metrics)
+                renju.add_move(move)
+            except IllegalMove:
+                # 禁手を打った側の負けで終局している
+                pass
+            except (ProtocolError, ValueError, TypeError, IndexError,
+                    OSError):
+                # OSError: 起動できない、途中で終了して書き込めないなど
+                renju.declare_result(get_opposite(putter), EndReason.ERROR)
+                break
+
+            if not persistent:
+                writer.append(renju)
+    finally:
+        for solver in solvers.values():
+            solver.close()
+        writer.append(renju)
+        writer.close()
+        metrics.close()
+
+    return (renju, renju.winner, renju.reason is EndReason.FORBIDDEN,
+            renju.reason is EndReason.ERROR)
+
+
+def _play(index: int, *, solver_a: str, solver_b: str, out: Path,
+          persistent: bool, incremental: bool) -> GameResult:
+    # 偶数局は A が先手、奇数局は B が先手
+    if index % 2 == 0:
+        black, first, second = 'A', solver_a, solver_b
+    else:
+        black, first, second = 'B', solver_b, solver_a
+
+    renju, winner, forbidden, error = play_game(
+        first=first, second=second,
+        score_sheet=out / f'game_{index:05d}.txt',
+        persistent=persistent, incremental=incremental)
+
+    return GameResult(index=index, black=black, winner=winner,
+                      forbidden=forbidden, error=error, turns=renju.turn)
+
+
+def summarize(results: List[GameResult], elapsed: float, *,
+              timeouts: bool = False) -> str:
+    """A から見た勝敗と対局速度をまとめる
+
+    timeouts が True なら持ち時間切れの数も出す（持ち時間のある judge.py 用）。
+    """
+
+    wins = sum(r.winner_name() == 'A' for r in results)
+    losses = sum(r.winner_name() == 'B' for r in results)
+    draws = sum(r.winner is None for r in results)
+    forbidden = {
+        name: sum(r.forbidden and r.winner_name() != name for r in results)
+        for name in ('A', 'B')}
+    errors = {
+        name: sum(r.error and r.winner_name() != name for r in results)
+        for name in ('A', 'B')}
+    turns = sum(r.turns for r in results)
+
+    lines = [
+        f'games          : {len(results)}',
+        f'A wins         : {wins}',
+        f'A losses       : {losses}',
+        f'draws          : {draws}',
+        f'forbidden loss : A={forbidden["A"]} B={forbidden["B"]}',
+        f'solver errors  : A={errors["A"]} B={errors["B"]}',
+    ]
+    if timeouts:
+        lost = {
+            name: sum(r.timeout and r.winner_name() != name for r in results)
+            for name in ('A', 'B')}
+        lines.append(f'timeouts       : A={lost["A"]} B={lost["B"]}')
+    lines.extend([
+        f'average turns  : {turns / max(len(results), 1):.1f}',
+        f'elapsed        : {elapsed:.2f} s',
+        f'games/sec      : {len(results) / elapsed:.2f}',
+    ])
+    return '\n'.join(lines)
+
+
+def main() -> NoReturn:
+    parser = ArgumentParser(description='画面表示なしでソルバ同士を N 局対戦させる')
+    parser.add_argument('solver_a')
+    parser.add_argument('solver_b')
+    parser.add_argument('-n', '--games', type=int, default=100)
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='並列に打つ対局数（デフォルトはコア数）')
+    parser.add_argument('-o', '--out', default='./games',
+                        help='スコアシートの出力先ディレクトリ')
+    parser.add_argument('--oneshot', action='store_true',
+                        help='ソルバを毎手起動する（常駐プロトコル非対応のソルバ用）')
+    parser.add_argument('--csv', action='store_true',
+                        help='スコアシートを毎手 CSV 形式で書き直す'
+                             '（CSV 形式しか読めない一発起動のソルバ用）')
+    args = parser.parse_args()
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+
+    play = partial(_play, solver_a=args.solver_a, solver_b=args.solver_b,
+                   out=out, persistent=not args.oneshot,
+                   incremental=not args.csv)
+
+    start = time.perf_counter()
+    with Pool(processes=args.jobs) as pool:
+        results = list(pool.imap_unordered(play, range(args.games)))
+    elapsed = time.perf_counter() - start
+
+    print(summarize(sorted(results), elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+import sys
+import pathlib
+sys.path.append(pathlib.Path(__file__).parent.__str__())
+
+
+from array import array
+from enum import IntEnum
+from typing import NoReturn, Optional, Tuple, NamedTuple
+
+from constants import WIDTH
+
+
+class BoundType(IntEnum):
+    """評価値の種類
+
+    Attributes:
+        EXACT: 正確な値
+        LOWER: 下界（beta カット）
+        UPPER: 上界（alpha を超えなかった）
+    """
+
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+
+class Entry(NamedTuple):
+    """置換表のエントリ"""
+
+    depth: int
+    value: int
+    bound: BoundType
+    move: Optional[Tuple[int, int]]
+
+
+# 1 エントリは (key ^ data, data) の 2 ワード。data のビット配置は
+#   value(32) | depth(8) | bound(2) | move(8) | generation(8)
+# キーとデータを xor しておくことで、共有メモリ上で書き込みが混ざった
+# エントリは照合に失敗し、読み捨てられる。
+ENTRY_WORDS = 2
+# 1 バケットは深さ優先スロットと常時置換スロットの 2 エントリ
+BUCKET_WORDS = 2 * ENTRY_WORDS
+
+VALUE_BIAS = 1 << 31
+NO_MOVE = 0xFF
+MASK64 = (1 << 64) - 1
+
+
+def _pack(depth: int, value: int, bound: int, move: int,
+          generation: int) -> int:
+    return ((value + VALUE_BIAS) & 0xFFFFFFFF) | \
+        (depth & 0xFF) << 32 | \
+        (bound & 0x3) << 40 | \
+        (move & 0xFF) << 42 | \
+        (generation & 0xFF) << 50
+
+
+class TranspositionTable:
+    """固定サイズの置換表
+
+    各バケットは深さ優先スロットと常時置換スロットを持つ。深さ優先スロットは
+    より深い探索結果か、古い世代のエントリのときだけ置き換える。それ以外は
+    常時置換スロットに書き込むため、メモリ使用量は buckets に比例して一定。
+
+    Args:
+        buckets(int): バケット数
+        buffer: 格納先のバッファ。共有メモリを渡すとプロセス間で共有できる。
+            None のときは自前で確保する。
+    """
+
+    def __init__(self, buckets: int = 1 << 16, *, buffer=None):
+        if buckets <= 0:
+            raise ValueError('buckets must be positive')
+
+        self._buckets = buckets
+        if buffer is None:
+            self._table = array('Q', bytes(8 * buckets * BUCKET_WORDS))
+        else:
+            self._table = memoryview(buffer).cast('B').cast('Q')
+            if len(self._table) < buckets * BUCKET_WORDS:
+                raise ValueError('buffer is too small')
+        self._generation = 0
+
+    @staticmethod
+    def nbytes(buckets: int) -> int:
+        """buckets 個のバケットに必要なバイト数"""
+
+        return 8 * buckets * BUCKET_WORDS
+
+    @property
+    def buckets(self) -> int:
+        return self._buckets
+
+    def new_search(self) -> NoReturn:
+        """世代を進める。古い世代の深さ優先スロットは置き換え対象になる。"""
+
+        self._generation = (self._generation + 1) & 0xFF
+
+    def clear(self) -> NoReturn:
+        for i in range(len(self._table)):
+            self._table[i] = 0
+
+    def probe(self, key: int) -> Optional[Entry]:
+        """key の局面のエントリを返す。なければ None"""
+
+        table = self._table
+        base = (key % self._buckets) * BUCKET_WORDS
+        for slot in (base, base + ENTRY_WORDS):
+            data = table[slot + 1]
+            if table[slot] ^ data != key or (data == 0 and key == 0):
+                continue
+
+            move = (data >> 42) & 0xFF
+            return Entry(
+                depth=(data >> 32) & 0xFF,
+                value=(data & 0xFFFFFFFF) - VALUE_BIAS,
+                bound=BoundType((data >> 40) & 0x3),
+                move=None if move == NO_MOVE else divmod(move, WIDTH))
+        return None
+
+    def store(self, key: int, depth: int, value: int, bound: BoundType,
+              move: Optional[Tuple[int, int]] = None) -> NoReturn:
+        """エントリを書き込む
+
+        Args:
+            key(int): 局面の 64 bit ハッシュ（Renju.hash_key）
+            depth(int): 探索深さ（0 - 255）
+            value(int): 評価値（符号付き 32 bit）
+            bound(BoundType): 評価値の種類
+            move(Optional[Tuple[int, int]]): 最善手
+        """
+
+        key &= MASK64
+        table = self._table
+        base = (key % self._buckets) * BUCKET_WORDS
+
+        move = NO_MOVE if move is None else move[0] * WIDTH + move[1]
+        data = _pack(depth, value, bound, move, self._generation)
+
+        # 深さ優先スロット: 同じ局面・より深い探索・古い世代なら置き換える
+        old = table[base + 1]
+        old_key = table[base] ^ old
+        if old == 0 or old_key == key or \
+                depth >= (old >> 32) & 0xFF or \
+                (old >> 50) & 0xFF != self._generation:
+            table[base], table[base + 1] = key ^ data, data
+            return
+
+        table[base + ENTRY_WORDS] = key ^ data
+        table[base + ENTRY_WORDS + 1] = data
+
+
+if __name__ == '__main__':
+    pass
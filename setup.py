@@ -6,7 +6,17 @@ setup(
     entry_points={
         "console_scripts": [
             "renju=renju.main:main",
+            "renju-tournament=renju.tournament:main",
+            "renju-judge=renju.judge:main",
+            "renju-benchmark=renju.benchmark:main",
+            "renju-archive=renju.archive:main",
+            "renju-analytics=renju.analytics:main",
+            "renju-book=renju.book:main",
+            "renju-metrics=renju.metrics:main",
         ]
     },
+    extras_require={
+        'batch': ['numpy'],
+    },
     packages=find_packages(exclude=['tests', 'docs'])
 )
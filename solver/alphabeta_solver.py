@@ -0,0 +1,69 @@
+
+import sys
+from argparse import ArgumentParser
+
+from renju.sheet import read_csv, EngineType
+from renju.protocol import serve
+from renju.book import OpeningBook, MIN_GAMES
+from renju.search import Searcher
+from renju.parallel import ParallelSearcher
+from renju.transposition import TranspositionTable
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('score_sheet', nargs='?')
+    parser.add_argument('--persistent', action='store_true')
+    parser.add_argument('-t', '--time', type=float, default=1.0,
+                        help='1 手あたりの持ち時間（秒）')
+    parser.add_argument('-w', '--width', type=int, default=12,
+                        help='各ノードで読む候補手の数')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='2 以上のとき、ルートの手をこの数のプロセスで分けて読む')
+    parser.add_argument('-b', '--book',
+                        help='定跡のファイル。定跡にある局面では探索しない')
+    parser.add_argument('--book-min-games', type=int, default=MIN_GAMES,
+                        help='定跡の手を使うのに必要な対局数')
+    args = parser.parse_args()
+
+    book = OpeningBook(args.book) if args.book is not None else None
+
+    # 常駐モードでは置換表（並列時はワーカーも）を対局を通して使い回す
+    table, parallel = None, None
+    if args.jobs > 1:
+        parallel = ParallelSearcher(args.jobs, buckets=1 << 18,
+                                    width=args.width)
+    else:
+        table = TranspositionTable(1 << 18)
+
+    def choose_move(renju):
+        if book is not None:
+            move = book.choose(renju, min_games=args.book_min_games)
+            if move is not None:
+                print('book', file=sys.stderr)
+                return move
+
+        if parallel is not None:
+            result = parallel.search(renju, time_limit=args.time)
+        else:
+            result = Searcher(renju, table=table, width=args.width).search(
+                time_limit=args.time)
+        print(f'depth={result.depth} nodes={result.nodes} '
+              f'nps={result.nps:.0f} score={result.score}', file=sys.stderr)
+        return result.move
+
+    try:
+        if args.persistent:
+            serve(choose_move, engine=EngineType.BITBOARD)
+            return
+
+        renju = read_csv(args.score_sheet, engine=EngineType.BITBOARD,
+                         trusted=True)
+        print(*choose_move(renju))
+    finally:
+        if parallel is not None:
+            parallel.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+
+import sys
+from argparse import ArgumentParser
+
+from renju.sheet import read_csv, EngineType
+from renju.protocol import serve
+from renju.book import OpeningBook, MIN_GAMES
+from renju.mcts import MCTS, EXPLORATION
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('score_sheet', nargs='?')
+    parser.add_argument('--persistent', action='store_true')
+    parser.add_argument('-t', '--time', type=float, default=1.0,
+                        help='1 手あたりの持ち時間（秒）')
+    parser.add_argument('-c', '--exploration', type=float,
+                        default=EXPLORATION, help='UCT の探索項の係数')
+    parser.add_argument('--seed', type=int, help='乱数のシード')
+    parser.add_argument('-b', '--book',
+                        help='定跡のファイル。定跡にある局面では探索しない')
+    parser.add_argument('--book-min-games', type=int, default=MIN_GAMES,
+                        help='定跡の手を使うのに必要な対局数')
+    args = parser.parse_args()
+
+    book = OpeningBook(args.book) if args.book is not None else None
+
+    def choose_move(renju):
+        if book is not None:
+            move = book.choose(renju, min_games=args.book_min_games)
+            if move is not None:
+                print('book', file=sys.stderr)
+                return move
+
+        result = MCTS(renju, exploration=args.exploration,
+                      seed=args.seed).search(time_limit=args.time)
+        print(f'playouts={result.playouts} '
+              f'playouts/sec={result.playouts_per_sec:.0f} '
+              f'visits={result.visits} win_rate={result.win_rate:.3f}',
+              file=sys.stderr)
+        return result.move
+
+    if args.persistent:
+        serve(choose_move, engine=EngineType.BITBOARD)
+        return
+
+    renju = read_csv(args.score_sheet, engine=EngineType.BITBOARD,
+                     trusted=True)
+    print(*choose_move(renju))
+
+
+if __name__ == '__main__':
+    main()
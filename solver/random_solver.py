@@ -3,32 +3,36 @@ from argparse import ArgumentParser
 from random import shuffle
 
 from renju.sheet import read_csv
+from renju.protocol import serve
+
+
+def choose_move(renju):
+    win_moves, next_moves = [], renju.legal_moves()
+    for (x, y) in next_moves:
+        renju.add_move((x, y))
+        if renju.finished:
+            win_moves.append((x, y))
+        renju.pop()
+
+    if len(win_moves) != 0:
+        return win_moves[0]
+    else:
+        shuffle(next_moves)
+        return next_moves[0]
 
 
 def main():
     parser = ArgumentParser()
-    parser.add_argument('score_sheet')
+    parser.add_argument('score_sheet', nargs='?')
+    parser.add_argument('--persistent', action='store_true')
     args = parser.parse_args()
 
-    renju = read_csv(args.score_sheet)
+    if args.persistent:
+        serve(choose_move)
+        return
 
-    win_moves, next_moves = [], []
-    for x in range(renju.height):
-        for y in range(renju.width):
-            if not renju.is_legal_move((x, y)):
-                continue
-            next_moves.append((x, y))
-
-            renju.add_move((x, y))
-            if renju.finished:
-                win_moves.append((x, y))
-            renju.pop()
-
-    if len(win_moves) != 0:
-        print(*win_moves[0])
-    else:
-        shuffle(next_moves)
-        print(*next_moves[0])
+    renju = read_csv(args.score_sheet, trusted=True)
+    print(*choose_move(renju))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,5 @@
+import sys
+import pathlib
+
+# renju のモジュールは互いにフラットに import し合うので、同じように読む
+sys.path.append(str(pathlib.Path(__file__).parent.parent / 'renju'))
@@ -0,0 +1,54 @@
+import sys
+import textwrap
+
+from analytics import analyze
+from archive import pack
+from tournament import play_game
+
+# 黒は (7, 6) で三三を打つ。白は盤の端に打つ
+SCRIPTED_SOLVER = textwrap.dedent('''
+    import sys
+
+    MOVES = [(7, 7), (0, 0), (7, 8), (0, 2), (8, 6), (0, 4), (9, 6), (0, 6),
+             (7, 6)]
+
+    # ジャッジは追記形式（1 行 1 手）で書く
+    with open(sys.argv[1]) as f:
+        turn = sum(1 for line in f if line.strip())
+    print(*MOVES[turn])
+''')
+
+
+def _forbidden_game(tmp_path):
+    solver = tmp_path / 'solver.py'
+    solver.write_text(SCRIPTED_SOLVER)
+    command = f'{sys.executable} {solver}'
+
+    games = tmp_path / 'games'
+    games.mkdir()
+    _, winner, forbidden, error = play_game(
+        first=command, second=command, score_sheet=games / 'game_00000.txt',
+        persistent=False)
+    assert forbidden and not error
+    return games
+
+
+def test_judge_forbidden_loss_is_reported(tmp_path):
+    games = _forbidden_game(tmp_path)
+
+    report = analyze([str(games)]).report()
+    assert report['games'] == 1
+    assert report['forbidden_loss_rate'] == 1.0
+    assert report['forfeit_rate'] == 0.0
+    assert report['win_rate']['white'] == 1.0
+
+
+def test_forbidden_loss_survives_archive(tmp_path):
+    games = _forbidden_game(tmp_path)
+    archive = tmp_path / 'games.rjar'
+    pack([str(games)], str(archive))
+
+    report = analyze([str(archive)]).report()
+    assert report['forbidden_loss_rate'] == 1.0
+    assert report['forfeit_rate'] == 0.0
+    assert report['win_rate']['white'] == 1.0
@@ -0,0 +1,114 @@
+from random import Random
+
+import pytest
+
+import game
+from game import Renju, PlayerType, compact_move
+
+P = (7, 7)
+
+# 白の石は盤の端に、五にならないよう 1 つおきに置く
+WHITE = [(0, y) for y in range(0, 15, 2)] + \
+    [(14, y) for y in range(0, 15, 2)] + [(1, 0), (1, 14), (13, 0), (13, 14)]
+
+
+def position(black):
+    """black の黒石と同数の白石を置いた、黒番の局面"""
+
+    moves = []
+    for b, w in zip(black, WHITE):
+        moves += [b, w]
+    renju = Renju()
+    renju.load(moves)
+    assert renju.putter is PlayerType.FIRST
+    return renju
+
+
+# P の横の三 (7, 7)-(7, 9) を活四にする (7, 6)・(7, 10) が、P を置くと
+# どちらも四四になる。縦の三 (5, 7)-(7, 7) だけが本当の三
+FAKE_THREE = [(7, 8), (7, 9), (6, 7), (5, 7),
+              (8, 6), (9, 6), (10, 6), (6, 5), (5, 4), (4, 3)]
+FAKE_THREE_BLOCKERS = [(8, 10), (9, 10), (10, 10),
+                       (8, 11), (9, 12), (10, 13)]
+FILLER = [(3, 12), (11, 1), (12, 12), (2, 8), (12, 4), (2, 1)]
+
+
+@pytest.mark.parametrize('black, point, legal', [
+    # 三三
+    ([(7, 8), (7, 9), (8, 7), (9, 7)], P, False),
+    # 四四
+    ([(7, 8), (7, 9), (7, 10), (8, 7), (9, 7), (10, 7)], P, False),
+    # 同じ直線上の四四
+    ([(7, 3), (7, 5), (7, 6), (7, 9), (2, 2)], P, False),
+    # 四三は禁手でない
+    ([(7, 8), (7, 9), (7, 10), (8, 7), (9, 7), (3, 3)], P, True),
+    # 長連
+    ([(7, 1), (7, 2), (7, 3), (7, 5), (7, 6), (3, 3)], (7, 4), False),
+    # 五ができれば四四でも禁手でない
+    ([(7, 8), (7, 9), (7, 10), (7, 11), (8, 7), (9, 7), (10, 7), (3, 3)],
+     P, True),
+    # 片方の三の活四点がどちらも禁手なら三三にならない
+    (FAKE_THREE + FAKE_THREE_BLOCKERS, P, True),
+    # 活四点の片方だけが禁手なら本当の三
+    (FAKE_THREE + FILLER, P, False),
+])
+def test_forbidden_diagrams(black, point, legal):
+    renju = position(black)
+    assert renju.is_legal_move(point) is legal
+    assert (point in renju.legal_moves()) is legal
+
+
+def test_volatile_shrinks():
+    renju = position([(7, 8), (7, 9), (8, 7), (9, 7)])
+    assert not renju.is_legal_move(P)
+    assert P in renju._volatile
+
+    # 白が横の三を止めると、P は三三候補でなくなる
+    renju.add_move((2, 12))
+    renju.add_move((7, 10))
+    assert renju.is_legal_move(P)
+    assert P not in renju._volatile
+
+
+def _reference_legal(renju):
+    """同じ手順を並べ直した局面で、空きマスをすべて判定し直した合法手"""
+
+    game._forbidden_memo.clear()
+    fresh = Renju()
+    fresh.load(renju.score_sheet)
+    if fresh.putter is PlayerType.SECOND:
+        return {(x, y) for x in range(15) for y in range(15)
+                if fresh.board[x][y] is game.SquareType.VACANT}
+    return {(x, y) for x in range(15) for y in range(15)
+            if fresh.board[x][y] is game.SquareType.VACANT and
+            not fresh.probe_forbidden(compact_move(x, y, PlayerType.FIRST))}
+
+
+def _near(renju, rng):
+    """石の近くの合法手。禁手の形ができやすいよう密集させる"""
+
+    moves = renju.legal_moves()
+    stones = [move.point for move in renju.score_sheet]
+    near = [(x, y) for x, y in moves
+            if any(abs(x - a) <= 2 and abs(y - b) <= 2 for a, b in stones)]
+    return rng.choice(near or moves)
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_incremental_legal_moves_match_scan(seed):
+    rng = Random(seed)
+    renju = Renju()
+    for _ in range(120):
+        if renju.turn > 1 and (renju.finished or rng.random() < 0.25):
+            renju.pop()
+        else:
+            renju.add_move(_near(renju, rng))
+
+        if renju.turn == 0:
+            continue
+        expected = _reference_legal(renju)
+        assert set(renju.legal_moves()) == expected
+        for x in range(15):
+            for y in range(15):
+                assert renju.is_legal_move((x, y)) is ((x, y) in expected)
+        assert renju._volatile <= renju._vacant
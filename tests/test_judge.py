@@ -0,0 +1,117 @@
+import asyncio
+import sys
+import textwrap
+
+import pytest
+
+from game import PlayerType
+from judge import AsyncSolverProcess, MoveTimeout, play_game, run_games
+from protocol import ProtocolError
+from sheet import read_csv
+
+# 常駐モードで最初の 1 手だけ返して終了する
+DYING_SOLVER = textwrap.dedent('''
+    import sys
+
+    print('ready', flush=True)
+    sys.stdin.readline()
+    print(7, 8, flush=True)
+''')
+
+# 常駐モードで盤の端に順に打つ
+EDGE_SOLVER = textwrap.dedent('''
+    import sys
+
+    moves = iter([(7, 7)] + [(0, y) for y in range(0, 15, 2)])
+    print('ready', flush=True)
+    for line in sys.stdin:
+        if line.strip() == 'end':
+            break
+        print(*next(moves), flush=True)
+''')
+
+# 準備に時間がかかる。準備が済んだ後は盤の端にすぐ打つ
+SLOW_START_SOLVER = 'import time\ntime.sleep(1.5)\n' + EDGE_SOLVER
+
+# ready を返さずに手を返す
+NOT_READY_SOLVER = textwrap.dedent('''
+    print(7, 7, flush=True)
+''')
+
+# 手を返さない
+SILENT_SOLVER = textwrap.dedent('''
+    import time
+
+    time.sleep(60)
+''')
+
+
+def _command(tmp_path, name, source):
+    solver = tmp_path / name
+    solver.write_text(source)
+    return f'{sys.executable} {solver}'
+
+
+@pytest.mark.parametrize('persistent', [True, False])
+def test_missing_solver_loses_by_error(tmp_path, persistent):
+    silent = _command(tmp_path, 'silent.py', SILENT_SOLVER)
+    results = asyncio.run(run_games(
+        solver_a='/nonexistent/solver', solver_b=silent, games=1,
+        out=tmp_path, persistent=persistent, move_time=0.5))
+
+    assert results[0].error and results[0].winner_name() == 'B'
+    renju = read_csv(tmp_path / 'game_00000.txt')
+    assert renju.finished and renju.winner is PlayerType.SECOND
+
+
+def test_solver_exiting_mid_game_loses_by_error(tmp_path):
+    edge = _command(tmp_path, 'edge.py', EDGE_SOLVER)
+    dying = _command(tmp_path, 'dying.py', DYING_SOLVER)
+    outcome = asyncio.run(play_game(
+        first=edge, second=dying, score_sheet=tmp_path / 'game.txt',
+        move_time=30))
+
+    assert outcome.error and outcome.winner is PlayerType.FIRST
+    assert outcome.renju.turn == 3
+
+
+def test_timeout_is_recorded_in_score_sheet(tmp_path):
+    silent = _command(tmp_path, 'silent.py', SILENT_SOLVER)
+    outcome = asyncio.run(play_game(
+        first=silent, second=silent, score_sheet=tmp_path / 'game.txt',
+        persistent=False, move_time=0.5))
+
+    assert outcome.timeout and outcome.winner is PlayerType.SECOND
+    renju = read_csv(tmp_path / 'game.txt')
+    assert renju.finished and renju.winner is PlayerType.SECOND
+
+
+def test_startup_is_not_counted_against_first_move(tmp_path):
+    slow = _command(tmp_path, 'slow.py', SLOW_START_SOLVER)
+    dying = _command(tmp_path, 'dying.py', DYING_SOLVER)
+    outcome = asyncio.run(play_game(
+        first=slow, second=dying, score_sheet=tmp_path / 'game.txt',
+        move_time=0.5))
+
+    assert not outcome.timeout
+    assert outcome.error and outcome.winner is PlayerType.FIRST
+    assert outcome.renju.turn == 3
+
+
+def test_solver_that_never_gets_ready_is_stopped(tmp_path):
+    silent = _command(tmp_path, 'silent.py', SILENT_SOLVER)
+    with pytest.raises(MoveTimeout):
+        asyncio.run(AsyncSolverProcess.start(silent, timeout=0.5))
+
+
+def test_solver_without_ready_line_loses_by_error(tmp_path):
+    not_ready = _command(tmp_path, 'not_ready.py', NOT_READY_SOLVER)
+    edge = _command(tmp_path, 'edge.py', EDGE_SOLVER)
+    with pytest.raises(ProtocolError):
+        asyncio.run(AsyncSolverProcess.start(not_ready))
+
+    outcome = asyncio.run(play_game(
+        first=not_ready, second=edge, score_sheet=tmp_path / 'game.txt',
+        move_time=5))
+    assert outcome.error and outcome.winner is PlayerType.SECOND
+    assert outcome.renju.turn == 0
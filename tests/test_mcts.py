@@ -0,0 +1,16 @@
+import pytest
+
+from game import Renju
+from mcts import MCTS
+
+
+@pytest.mark.parametrize('limits', [{'time_limit': 0},
+                                    {'max_playouts': 0}])
+def test_search_without_budget_returns_legal_move(limits):
+    renju = Renju()
+    renju.add_move((7, 7))
+    renju.add_move((7, 8))
+
+    result = MCTS(renju).search(**limits)
+    assert result.playouts == 1
+    assert renju.is_legal_move(result.move)
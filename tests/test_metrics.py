@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+from metrics import run_solver
+
+
+def test_run_solver_measures_child_cpu():
+    stdout, usage = run_solver([
+        sys.executable, '-c',
+        'sum(i * i for i in range(2_000_000)); print(7, 7)'])
+
+    assert stdout.split() == [b'7', b'7']
+    assert usage.wall > 0
+    assert usage.cpu is not None and 0 < usage.cpu <= usage.wall * 2
+
+
+def test_run_solver_reports_each_solvers_own_max_rss():
+    heavy = run_solver([sys.executable, '-c',
+                        'x = bytearray(200 * 1024 * 1024); print(7, 7)'])[1]
+    light = run_solver([sys.executable, '-c', 'print(7, 7)'])[1]
+
+    # 先に重いソルバを呼んでも、軽いソルバ自身の値が取れる
+    assert heavy.max_rss is not None and light.max_rss is not None
+    assert light.max_rss < heavy.max_rss
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'),
+                    reason='needs /proc to count open files')
+def test_run_solver_missing_command_raises_os_error():
+    fds = len(os.listdir('/proc/self/fd'))
+    with pytest.raises(OSError):
+        run_solver(['/nonexistent/solver'])
+    assert len(os.listdir('/proc/self/fd')) == fds
@@ -0,0 +1,34 @@
+import os
+import pathlib
+
+import pytest
+
+import pattern
+from pattern import build_tables, load_tables
+
+
+@pytest.fixture(scope='module')
+def tables():
+    return build_tables()
+
+
+def test_import_does_not_write_into_package():
+    package = pathlib.Path(pattern.__file__).parent
+    assert pattern.TABLE_FILE.parent != package
+    assert not (package / 'pattern_table.bin').exists()
+
+
+def test_load_tables_caches_atomically(tmp_path, tables):
+    file = tmp_path / 'cache' / 'pattern_table.bin'
+    assert load_tables(file) == tables
+
+    # 一時ファイルは残らず、次からはキャッシュを読む
+    assert os.listdir(file.parent) == [file.name]
+    assert load_tables(file) == tables
+
+
+def test_load_tables_without_writable_cache(tmp_path, tables):
+    # キャッシュディレクトリを作れなくても、作った表を使う
+    blocker = tmp_path / 'cache'
+    blocker.write_bytes(b'')
+    assert load_tables(blocker / 'pattern_table.bin') == tables
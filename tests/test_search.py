@@ -0,0 +1,27 @@
+import time
+
+import pytest
+
+from benchmark import SCORE_SHEET
+from game import Renju
+from search import Searcher
+from sheet import read_csv
+
+# 持ち時間を超えてよい幅（秒）。1 ノードと後始末にかかる時間
+MARGIN = 0.1
+
+
+@pytest.mark.parametrize('turn', [4, 10, 16, 24])
+@pytest.mark.parametrize('time_limit', [0.2, 0.5])
+def test_search_stays_within_time_limit(turn, time_limit):
+    renju = Renju()
+    for move in read_csv(SCORE_SHEET).score_sheet[:turn]:
+        renju.add_move(move.point)
+
+    start = time.perf_counter()
+    result = Searcher(renju).search(time_limit=time_limit)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed <= time_limit + MARGIN
+    assert renju.turn == turn
+    assert renju.is_legal_move(result.move)
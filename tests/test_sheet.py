@@ -0,0 +1,100 @@
+import pytest
+
+from game import Renju, NONE_MOVE, PlayerType, EndReason
+from sheet import (ScoreSheetReader, ScoreSheetWriter, dump_csv, format_row,
+                   read_csv, read_points)
+
+
+def _game():
+    renju = Renju()
+    for point in [(7, 7), (7, 8), (8, 8)]:
+        renju.add_move(point)
+    renju.pass_turn()
+    renju.add_move((9, 9))
+    return renju
+
+
+@pytest.mark.parametrize('incremental', [False, True])
+def test_writer_round_trip_with_pass(tmp_path, incremental):
+    renju = _game()
+    file = tmp_path / 'sheet.txt'
+    with ScoreSheetWriter(file, incremental=incremental) as writer:
+        writer.append(renju)
+
+    assert read_points(file)[3] == (None, None)
+    loaded = read_csv(file, trusted=True)
+    assert loaded.score_sheet[3] is NONE_MOVE
+    assert loaded.snapshot() == renju.snapshot()
+
+
+def test_writer_defaults_to_dump_csv(tmp_path):
+    renju = Renju()
+    file = tmp_path / 'sheet.txt'
+    expected = tmp_path / 'expected.txt'
+    with ScoreSheetWriter(file) as writer:
+        for point in [(7, 7), (7, 8), (8, 8)]:
+            renju.add_move(point)
+            writer.append(renju)
+            dump_csv(expected, renju)
+            assert file.read_text() == expected.read_text()
+    assert file.read_text() == '3,1:7:7,2:7:8,1:8:8\n'
+
+
+def test_reader_resumes_from_last_offset(tmp_path):
+    file = tmp_path / 'sheet.txt'
+    renju = Renju()
+    reader = ScoreSheetReader(file)
+    with ScoreSheetWriter(file, incremental=True) as writer:
+        writer.append(renju)
+        for point in [(7, 7), (7, 8), (8, 8)]:
+            renju.add_move(point)
+            writer.append(renju)
+            offset = reader.offset
+            assert reader.update().snapshot() == renju.snapshot()
+            # 前回の位置から、増えた 1 行だけを読む
+            assert reader.offset - offset == len(format_row(
+                renju.score_sheet[-1], renju.turn - 1))
+
+    assert reader.offset == file.stat().st_size
+    assert reader.update().snapshot() == renju.snapshot()
+
+
+def test_reader_keeps_partial_row_for_next_update(tmp_path):
+    file = tmp_path / 'sheet.txt'
+    file.write_text('1:7:7\n2:7')
+    reader = ScoreSheetReader(file)
+    assert reader.update().turn == 1
+    assert reader.offset == len('1:7:7\n')
+
+    with open(file, 'a') as f:
+        f.write(':8\n')
+    assert reader.update().score_sheet[-1].point == (7, 8)
+
+
+def test_reader_restarts_when_file_shrinks(tmp_path):
+    file = tmp_path / 'sheet.txt'
+    file.write_text('1:7:7\n2:7:8\n1:8:8\n')
+    reader = ScoreSheetReader(file)
+    assert reader.update().turn == 3
+
+    file.write_text('1:7:7\n')
+    assert reader.update().turn == 1
+
+
+def test_reader_reads_pass_and_result(tmp_path):
+    renju = _game()
+    renju.declare_result(PlayerType.SECOND, EndReason.TIMEOUT)
+    file = tmp_path / 'sheet.txt'
+    with ScoreSheetWriter(file, incremental=True) as writer:
+        writer.append(renju)
+
+    loaded = ScoreSheetReader(file).update()
+    assert loaded.score_sheet[3] is NONE_MOVE
+    assert loaded.snapshot() == renju.snapshot()
+
+
+def test_reader_rejects_csv_sheet(tmp_path):
+    file = tmp_path / 'sheet.txt'
+    dump_csv(file, _game())
+    with pytest.raises(ValueError):
+        ScoreSheetReader(file).update()
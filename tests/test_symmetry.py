@@ -0,0 +1,48 @@
+import pytest
+
+from book import OpeningBook, build
+from game import Renju, INVERSE_SYMMETRIES, transform_point
+from sheet import dump_csv
+
+DIRECT = [(7, 8), (8, 7), (7, 6), (6, 7)]
+DIAGONAL = [(8, 8), (6, 6), (6, 8), (8, 6)]
+
+
+@pytest.mark.parametrize('moves', [DIRECT, DIAGONAL])
+def test_equivalent_moves_share_canonical_move(moves):
+    renju = Renju()
+    renju.add_move((7, 7))
+    assert len(renju.canonical_symmetries()) == 8
+    assert len({renju.canonical_move(point) for point in moves}) == 1
+
+
+def test_canonical_move_round_trips_to_equivalent_move():
+    renju = Renju()
+    for point in [(7, 7), (7, 8)]:
+        renju.add_move(point)
+    _, symmetry = renju.canonical()
+    inverse = INVERSE_SYMMETRIES[symmetry]
+
+    # (7, 7)-(7, 8) は (7, y) の直線について対称
+    for point, mirror in [((6, 7), (8, 7)), ((6, 9), (8, 9))]:
+        assert renju.canonical_move(point) == renju.canonical_move(mirror)
+        assert transform_point(renju.canonical_move(point), inverse) in \
+            (point, mirror)
+
+
+def test_book_merges_equivalent_moves(tmp_path):
+    for k, second in enumerate(DIRECT):
+        renju = Renju()
+        renju.add_move((7, 7))
+        renju.add_move(second)
+        dump_csv(tmp_path / f'game_{k:05d}.txt', renju)
+
+    file = tmp_path / 'book.bin'
+    build([str(tmp_path)], str(file), plies=2)
+    renju = Renju()
+    renju.add_move((7, 7))
+    with OpeningBook(str(file)) as book:
+        moves = book.lookup(renju)
+    assert len(moves) == 1
+    assert moves[0].games == len(DIRECT)
+    assert moves[0].move in DIRECT
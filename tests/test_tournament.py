@@ -0,0 +1,74 @@
+import sys
+import textwrap
+
+import pytest
+
+from game import PlayerType, EndReason
+from sheet import read_csv
+from tournament import GameResult, _play, play_game, summarize
+
+# 常駐モードで最初の 1 手だけ返して終了する
+DYING_SOLVER = textwrap.dedent('''
+    import sys
+
+    print('ready', flush=True)
+    sys.stdin.readline()
+    print(7, 8, flush=True)
+''')
+
+# 盤の端に順に打つ。常駐モードでも一発起動でも動く
+EDGE_SOLVER = textwrap.dedent('''
+    import sys
+
+    MOVES = [(7, 7)] + [(0, y) for y in range(0, 15, 2)]
+
+    if sys.argv[-1] == '--persistent':
+        moves = iter(MOVES)
+        print('ready', flush=True)
+        for line in sys.stdin:
+            if line.strip() == 'end':
+                break
+            print(*next(moves), flush=True)
+    else:
+        with open(sys.argv[1]) as f:
+            turn = sum(1 for line in f if line.strip())
+        print(*MOVES[turn // 2])
+''')
+
+
+def _command(tmp_path, name, source):
+    solver = tmp_path / name
+    solver.write_text(source)
+    return f'{sys.executable} {solver}'
+
+
+@pytest.mark.parametrize('persistent', [True, False])
+@pytest.mark.parametrize('missing', ['/nonexistent/solver',
+                                     f'{sys.executable} /nonexistent.py'])
+def test_missing_solver_loses_by_error(tmp_path, persistent, missing):
+    edge = _command(tmp_path, 'edge.py', EDGE_SOLVER)
+    result = _play(0, solver_a=missing, solver_b=edge, out=tmp_path,
+                   persistent=persistent, incremental=True)
+
+    assert result.error and result.winner_name() == 'B'
+    renju = read_csv(tmp_path / 'game_00000.txt')
+    assert renju.winner is PlayerType.SECOND
+    assert renju.reason is EndReason.ERROR
+
+
+def test_solver_exiting_mid_game_loses_by_error(tmp_path):
+    edge = _command(tmp_path, 'edge.py', EDGE_SOLVER)
+    dying = _command(tmp_path, 'dying.py', DYING_SOLVER)
+    renju, winner, forbidden, error = play_game(
+        first=edge, second=dying, score_sheet=tmp_path / 'game.txt')
+
+    assert error and not forbidden and winner is PlayerType.FIRST
+    assert renju.turn == 3
+
+
+def test_summary_shows_timeouts_only_when_asked():
+    results = [GameResult(index=0, black='A', winner=PlayerType.FIRST,
+                          forbidden=False, error=False, turns=9)]
+    assert 'timeouts' not in summarize(results, 1.0)
+    assert 'timeouts       : A=0 B=0' in summarize(results, 1.0,
+                                                    timeouts=True)